@@ -0,0 +1,481 @@
+# Long-lived local backtest service
+#
+# 1. Keeping validated price series in memory, loaded once from a file (or sent inline) under a name
+# 2. Answering backtest requests (strategy, periods, fee) concurrently with asyncio, one JSON object per line,
+#    over a Unix socket or a localhost TCP port
+# 3. Running the indicator and trade calculations on a process pool; every worker keeps an IndicatorBank,
+#    so the moving averages of a series are computed once per worker and reused by later requests.
+#    The prices of each series are placed in shared memory when it is loaded, so a request only sends
+#    the name of the block and its settings, never the price array
+# 4. Remembering finished results, and sharing one calculation between identical requests arriving together
+# 5. A small blocking client for scripts and notebooks
+#
+# Protocol: each request is a JSON object on one line with an 'op' and an optional 'id' echoed in the response:
+#   {"id": 1, "op": "load", "name": "SPY", "path": "SPY_2016_2021.xlsx"}
+#   {"id": 2, "op": "backtest", "dataset": "SPY", "strategy": "SMA", "short_period": 12, "fee": 0.00125}
+# Responses are {"id": ..., "ok": true, "result": {...}} or {"id": ..., "ok": false, "error": "..."}.
+# Other ops: "datasets", "drop" (with "name"), "ping" and "shutdown".
+#
+# Command line:
+#   python backtest_server.py --socket /tmp/stockcalc.sock --load SPY=SPY_2016_2021.xlsx
+#   python backtest_server.py --port 8765 --workers 4
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import stat
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from indicator_bank import IndicatorBank, fingerprint
+from indicators import ema_array
+from kernels import find_trade_events
+from lazy_imports import lazy_module
+
+pd = lazy_module('pandas')
+
+BACKTEST_DEFAULTS = {
+    'strategy': 'EMA',
+    'short_period': 12,
+    'long_period': 26,
+    'signal_period': 9,
+    'fee': 0.00125,
+    'trades': True,
+}
+STREAM_LIMIT = 64 * 1024 ** 2  # Longest request line, large enough for inline price series
+WORKER_ATTACHED = 16  # Price blocks a worker keeps attached, the least recently used are closed beyond it
+
+_WORKER = {}
+
+def _to_json(value):
+    """
+    Dates as ISO strings, NumPy numbers as Python numbers.
+    """
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value.item() if isinstance(value, np.generic) else value
+
+def _init_worker():
+    _WORKER['bank'] = IndicatorBank()
+
+def _attach_prices(shm_name, n_rows):
+    """
+    Prices of a loaded series from its shared memory block, attached once per worker process.
+    :return: Read-only float64 array backed by the shared block
+    """
+    attached = _WORKER.setdefault('attached', OrderedDict())
+    if shm_name in attached:
+        attached.move_to_end(shm_name)
+        return attached[shm_name][1]
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    prices = np.ndarray((n_rows,), dtype=np.float64, buffer=shm.buf)
+    prices.flags.writeable = False
+    attached[shm_name] = (shm, prices)
+    while len(attached) > WORKER_ATTACHED:
+        _, (old_shm, old_prices) = attached.popitem(last=False)
+        del old_prices  # The array must go before its block can be closed
+        old_shm.close()
+    return prices
+
+def _share_prices(prices):
+    """
+    Copies a price array into a new shared memory block.
+    :return: (SharedMemory, array backed by the block)
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(prices.nbytes, 1))
+    shared = np.ndarray(prices.shape, dtype=np.float64, buffer=shm.buf)
+    shared[:] = prices
+    return shm, shared
+
+def _release_prices(dataset):
+    """
+    Frees the shared memory block of a dataset. Workers still attached keep their mapping until they let it go.
+    """
+    shm = dataset.pop('shm', None)
+    if shm is not None:
+        dataset['prices'] = np.array(dataset['prices'])  # Own copy, the block's buffer goes away
+        shm.unlink()
+        try:
+            shm.close()
+        except BufferError:
+            pass  # A request still holds the old array: the mapping is freed with it
+
+def _remove_stale_socket(path):
+    """
+    Removes a Unix socket left at path by a server that did not shut down cleanly.
+    Anything else at that path is never removed.
+    :raises FileExistsError: If path exists and is not a socket
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket.")
+    os.remove(path)
+
+def _load_dataset(path, date_col=None, price_col=None, fill_dates=True):
+    """
+    Imports and validates one price file, in a worker process.
+    :return: Prepared DataFrame
+    """
+    from data_loader import import_stock_file, validate_and_prepare_data, fill_missing_dates
+    df = validate_and_prepare_data(import_stock_file(path), date_col, price_col, verbose=False)
+    if df.empty:
+        raise ValueError("No valid price rows.")
+    return fill_missing_dates(df) if fill_dates else df
+
+def _inline_dataset(prices, dates=None):
+    """
+    Checks a price series sent inline like validate_and_prepare_data checks a file, rejecting what it would drop.
+    :param prices: List of prices
+    :param dates: Optional list of dates, one per price, in increasing order
+    :return: DataFrame with a 'price' column, indexed by date if dates are given
+    """
+    try:
+        prices = np.asarray(prices, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError("Inline prices must be numbers.")
+    if prices.ndim != 1 or len(prices) == 0:
+        raise ValueError("No valid price rows.")
+    if not np.isfinite(prices).all():
+        raise ValueError("Inline prices must not contain NaN or infinite values.")
+
+    index = None
+    if dates is not None:
+        if np.ndim(dates) != 1 or len(dates) != len(prices):
+            raise ValueError(f"Expected one date per price ({len(prices)}).")
+        index = pd.DatetimeIndex(pd.to_datetime(dates), name='date')
+        if index.hasnans or not index.is_monotonic_increasing:
+            raise ValueError("Inline dates must be valid and in increasing order.")
+    return pd.DataFrame({'price': prices}, index=index)
+
+def _run_backtest_task(key, shm_name, n_rows, strategy, short_period, long_period, signal_period, fee):
+    """
+    Indicators, trades and profits of one parameter set, in a worker process.
+    Same values as run_backtest: the moving averages come from the worker's IndicatorBank.
+    :param key: Fingerprint of prices, used as the cache key of the moving averages
+    :param shm_name: Name of the shared memory block holding the prices (see _attach_prices)
+    :param n_rows: Number of prices in the block
+    :return: Dictionary with the trade events (rows, actions, entry_prices, trade_ids), profit and buy_hold
+    """
+    from trading_strategy import calculate_trade_profit
+
+    prices = _attach_prices(shm_name, n_rows)
+    bank = _WORKER.get('bank')
+    if bank is None:
+        bank = _WORKER['bank'] = IndicatorBank()
+    mas = bank.get_many(prices, strategy, [short_period, long_period], key=key)
+    macd = mas[short_period] - mas[long_period]
+    hist = macd - ema_array(macd, signal_period)
+
+    rows, actions, entry_prices, trade_ids = find_trade_events(hist, prices)
+    trades = pd.DataFrame({'action': actions, 'price': prices[rows]})
+    profit, buy_hold = calculate_trade_profit(trades, pd.DataFrame({'price': prices[[0, -1]]}), fee=fee)
+    return {'rows': rows, 'actions': actions, 'entry_prices': entry_prices, 'trade_ids': trade_ids,
+            'profit': float(profit), 'buy_hold': float(buy_hold)}
+
+class BacktestServer:
+    """
+    Holds the loaded price series and answers requests (see the protocol above).
+    :param max_workers: Number of worker processes, 0 runs the calculations in the event loop's thread
+    :param max_results: Number of finished results remembered (least recently used are dropped)
+    """
+    def __init__(self, max_workers=None, max_results=1024):
+        self.max_workers = max_workers
+        self.max_results = max_results
+        self.datasets = {}
+        self.results = OrderedDict()
+        self._running = {}
+        self._pool = None
+        self._server = None
+        self._stopped = None
+        self.address = None
+
+    async def start(self, path=None, host='127.0.0.1', port=0):
+        """
+        Starts listening on a Unix socket (path) or on a TCP port (port 0 picks a free one).
+        :return: The address listened on: the socket path, or (host, port)
+        """
+        if self.max_workers != 0:
+            if os.name == 'posix':
+                # Workers share the server's resource tracker, so the price blocks they attach are only freed
+                # by the server (a worker with a tracker of its own would unlink them when it exits)
+                resource_tracker.ensure_running()
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+        self._stopped = asyncio.Event()
+        if path is not None:
+            _remove_stale_socket(path)
+            self._server = await asyncio.start_unix_server(self._handle_connection, path, limit=STREAM_LIMIT)
+            self.address = path
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port, limit=STREAM_LIMIT)
+            self.address = self._server.sockets[0].getsockname()[:2]
+        return self.address
+
+    async def wait_closed(self):
+        await self._stopped.wait()
+        await self.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if isinstance(self.address, str):
+            _remove_stale_socket(self.address)
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        for dataset in self.datasets.values():
+            _release_prices(dataset)
+
+    async def _run(self, func, *args):
+        if self._pool is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Reads requests from one client and answers each one as soon as it is done (possibly out of order).
+        """
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(line):
+            response = await self.handle_line(line)
+            async with write_lock:
+                writer.write((json.dumps(response, default=str) + '\n').encode())
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.create_task(answer(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_line(self, line):
+        """
+        Answers one request line, never raises.
+        :return: Response dictionary
+        """
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            return {'id': None, 'ok': False, 'error': f"Invalid JSON: {e}"}
+        try:
+            return {'id': request.get('id'), 'ok': True, 'result': await self.handle(request)}
+        except Exception as e:
+            return {'id': request.get('id'), 'ok': False, 'error': f"{type(e).__name__}: {e}"}
+
+    async def handle(self, request):
+        """
+        Runs one request.
+        :return: Result dictionary of the op
+        """
+        op = request.get('op')
+        if op == 'backtest':
+            return await self.backtest(request)
+        if op == 'load':
+            return await self.load(request)
+        if op == 'datasets':
+            return {name: self._describe(name, dataset['df']) for name, dataset in self.datasets.items()}
+        if op == 'drop':
+            dataset = self.datasets.pop(request['name'], None)
+            if dataset is not None:
+                _release_prices(dataset)
+            return {'dropped': dataset is not None}
+        if op == 'ping':
+            return {'pong': True, 'datasets': len(self.datasets), 'results': len(self.results)}
+        if op == 'shutdown':
+            self._stopped.set()
+            return {'stopping': True}
+        raise ValueError(f"Unknown op: {op}")
+
+    def _describe(self, name, df):
+        return {'name': name, 'rows': len(df), 'start': _to_json(df.index[0]), 'end': _to_json(df.index[-1])}
+
+    async def load(self, request):
+        """
+        Loads a price series under a name, from a file ('path') or inline ('prices' and optional 'dates').
+        """
+        name = request['name']
+        if 'path' in request:
+            df = await self._run(_load_dataset, request['path'], request.get('date_col'), request.get('price_col'),
+                                 request.get('fill_dates', True))
+        elif 'prices' in request:
+            df = _inline_dataset(request['prices'], request.get('dates'))
+        else:
+            raise ValueError("A load request needs a 'path' or 'prices'.")
+        description = self._describe(name, df)
+
+        # Registered only once valid, so a failed load leaves the server as it was
+        shm, prices = _share_prices(df['price'].to_numpy(dtype=float))
+        previous = self.datasets.get(name)
+        self.datasets[name] = {'df': df, 'prices': prices, 'shm': shm, 'key': fingerprint(prices)}
+        if previous is not None:
+            _release_prices(previous)
+        return description
+
+    async def backtest(self, request):
+        """
+        Backtests a loaded series with one parameter set.
+        :return: profit, buy_hold, n_trades, the trades (unless 'trades' is false), whether the result
+                 was remembered ('cached') and the seconds spent
+        """
+        start = time.perf_counter()
+        unknown = set(request) - set(BACKTEST_DEFAULTS) - {'id', 'op', 'dataset'}
+        if unknown:
+            raise ValueError(f"Unknown backtest settings: {sorted(unknown)}")
+        params = {**BACKTEST_DEFAULTS, **request}
+        if params['dataset'] not in self.datasets:
+            raise KeyError(f"Dataset not loaded: {params['dataset']}")
+        dataset = self.datasets[params['dataset']]
+        strategy = params['strategy'].upper()
+        if strategy not in ['EMA', 'SMA']:
+            raise ValueError(f"Unsupported strategy: {strategy}. Use 'EMA' or 'SMA'.")
+        settings = (strategy, int(params['short_period']), int(params['long_period']), int(params['signal_period']),
+                    float(params['fee']))
+
+        key = (dataset['key'],) + settings
+        cached = key in self.results
+        if cached:
+            self.results.move_to_end(key)
+            result = self.results[key]
+        else:
+            # Identical requests arriving together wait for the same calculation
+            if key not in self._running:
+                self._running[key] = asyncio.ensure_future(
+                    self._run(_run_backtest_task, dataset['key'], dataset['shm'].name, len(dataset['prices']),
+                              *settings))
+            try:
+                result = await asyncio.shield(self._running[key])
+            finally:
+                self._running.pop(key, None)
+            self.results[key] = result
+            while len(self.results) > self.max_results:
+                self.results.popitem(last=False)
+
+        response = {'profit': result['profit'], 'buy_hold': result['buy_hold'], 'n_trades': len(result['rows']),
+                    'cached': cached}
+        if params['trades']:
+            dates = dataset['df'].index[result['rows']]
+            response['trades'] = [
+                {'date': _to_json(date), 'action': action,
+                 'price': float(dataset['prices'][row]), 'entry_price': entry_price, 'trade_id': trade_id}
+                for row, date, action, entry_price, trade_id in zip(result['rows'], dates, result['actions'],
+                                                                     result['entry_prices'], result['trade_ids'])
+            ]
+        response['seconds'] = time.perf_counter() - start
+        return response
+
+def run_server(path=None, host='127.0.0.1', port=8765, max_workers=None, preload=None, ready=None):
+    """
+    Runs the service until a 'shutdown' request (or Ctrl+C).
+    :param path: Unix socket path, or None to listen on host:port
+    :param preload: Dictionary of name -> file path loaded before accepting requests
+    :param ready: Optional function called with the address once the server is listening
+    """
+    async def main():
+        server = BacktestServer(max_workers)
+        try:
+            address = await server.start(path, host, port)
+            for name, filepath in (preload or {}).items():
+                info = await server.load({'name': name, 'path': filepath})
+                print(f"✅ Loaded {name}: {info['rows']} rows from {info['start']} to {info['end']}")
+            if ready is not None:
+                ready(address)
+            await server.wait_closed()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+class BacktestClient:
+    """
+    Blocking client of a BacktestServer, one request at a time.
+    :param path: Unix socket path, or None to connect to host:port
+    """
+    def __init__(self, path=None, host='127.0.0.1', port=8765, timeout=60):
+        if path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.file = self.sock.makefile('rwb')
+        self._next_id = 0
+
+    def request(self, op, **params):
+        """
+        Sends one request and waits for its response.
+        :return: The result dictionary
+        :raises RuntimeError: With the server's error message if the request failed
+        """
+        self._next_id += 1
+        self.file.write((json.dumps({'id': self._next_id, 'op': op, **params}) + '\n').encode())
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("Server closed the connection.")
+        response = json.loads(line)
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def load(self, name, path=None, **params):
+        if path is not None:
+            params['path'] = path
+        return self.request('load', name=name, **params)
+
+    def backtest(self, dataset, **params):
+        return self.request('backtest', dataset=dataset, **params)
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve backtests of in-memory price series.")
+    parser.add_argument('--socket', help="Unix socket path (default: TCP on localhost)")
+    parser.add_argument('--host', default='127.0.0.1', help="TCP host")
+    parser.add_argument('--port', type=int, default=8765, help="TCP port")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (0 runs in the server process)")
+    parser.add_argument('--load', action='append', default=[], metavar='NAME=PATH', help="Price file to preload")
+    args = parser.parse_args(argv)
+
+    preload = dict(item.split('=', 1) for item in args.load)
+    run_server(args.socket, args.host, args.port, args.workers, preload,
+               ready=lambda address: print(f"📡 Listening on {address}"))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# Functions for backtesting a whole universe of symbols in one run
+#
+# 1. Turning a universe (files, a wide panel or a long panel) into one price frame per symbol
+# 2. Running load, indicators, trades and profit for each symbol on a worker pool
+# 3. Combining every symbol's trades into one trade log and one summary row per symbol
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from data_loader import import_stock_file, validate_and_prepare_data, fill_missing_dates
+from trading_strategy import run_backtest
+
+SYMBOL_CANDIDATES = ['symbol', 'ticker']
+SUMMARY_COLUMNS = ['symbol', 'rows', 'start', 'end', 'n_trades', 'profit', 'buy_hold', 'error']
+
+def split_universe(universe, date_col=None, price_col=None, symbol_col=None):
+    """
+    Splits a universe into (symbol, source) pairs, where source is a file path or a prepared price frame.
+    Accepted universes:
+    - dict of symbol -> file path
+    - list of file paths (the file name without extension is used as the symbol)
+    - wide DataFrame with a datetime index and one price column per symbol
+    - long DataFrame with symbol, date and price columns
+    :return: List of (symbol, source) tuples
+    """
+    if isinstance(universe, dict):
+        return list(universe.items())
+
+    if not isinstance(universe, pd.DataFrame):
+        return [(os.path.splitext(os.path.basename(path))[0], path) for path in universe]
+
+    if symbol_col is None:
+        symbol_col = next((col for col in universe.columns if str(col).lower() in SYMBOL_CANDIDATES), None)
+
+    # Long panel: one row per (symbol, date)
+    if symbol_col is not None:
+        pairs = []
+        for symbol, group in universe.groupby(symbol_col, sort=True):
+            prepared = validate_and_prepare_data(group.drop(columns=symbol_col), date_col, price_col, verbose=False)
+            pairs.append((symbol, prepared))
+        return pairs
+
+    # Wide panel: one column per symbol, leading gaps are dropped so each symbol starts at its first price
+    if not isinstance(universe.index, pd.DatetimeIndex):
+        raise ValueError("Wide panels need a datetime index with one price column per symbol.")
+    universe = universe.sort_index()
+    return [(symbol, pd.to_numeric(universe[symbol], errors='coerce').dropna().to_frame('price'))
+            for symbol in universe.columns]
+
+def _backtest_symbol(job):
+    """
+    Runs the full pipeline for one symbol and never raises, so one bad symbol does not stop the batch.
+    :param job: Tuple (symbol, source, options)
+    :return: Tuple (trades DataFrame or None, summary dictionary)
+    """
+    symbol, source, options = job
+    summary = dict.fromkeys(SUMMARY_COLUMNS)
+    summary.update(symbol=symbol, rows=0, n_trades=0)
+    try:
+        if isinstance(source, pd.DataFrame):
+            df = source
+        else:
+            df = validate_and_prepare_data(import_stock_file(source), options['date_col'],
+                                           options['price_col'], verbose=False)
+        if df.empty:
+            raise ValueError("No valid price rows.")
+        if options['fill_dates']:
+            df = fill_missing_dates(df)
+
+        df, trades, profit, buy_hold = run_backtest(df, options['strategy'], options['short_period'],
+                                                    options['long_period'], options['signal_period'],
+                                                    options['fee'], annotate=False)
+    except Exception as e:
+        summary['error'] = f"{type(e).__name__}: {e}"
+        return None, summary
+
+    trades.insert(0, 'symbol', symbol)
+    summary.update(rows=len(df), start=df.index[0], end=df.index[-1], n_trades=len(trades),
+                   profit=profit, buy_hold=buy_hold)
+    return trades, summary
+
+def run_universe(universe, strategy='EMA', short_period=12, long_period=26, signal_period=9, fee=0.00125,
+                 fill_dates=True, date_col=None, price_col=None, symbol_col=None, max_workers=None, chunksize=None):
+    """
+    Backtests every symbol of a universe on a process pool.
+    :param universe: Files or panel, see split_universe for the accepted layouts
+    :param strategy: 'EMA' or 'SMA'
+    :param fee: Transaction fee for selling
+    :param fill_dates: Forward-fill missing dates for each symbol before the indicators, as in main.ipynb
+    :param max_workers: Number of worker processes, 0 runs everything in the current process
+    :param chunksize: Number of symbols sent to a worker at a time
+    :return: (trade_log, summary) where trade_log has all trades with a 'symbol' column
+             and summary has one row per symbol with profit, buy-hold and any error
+    """
+    options = {
+        'strategy': strategy.upper(),
+        'short_period': short_period,
+        'long_period': long_period,
+        'signal_period': signal_period,
+        'fee': fee,
+        'fill_dates': fill_dates,
+        'date_col': date_col,
+        'price_col': price_col,
+    }
+    jobs = [(symbol, source, options) for symbol, source in split_universe(universe, date_col, price_col, symbol_col)]
+
+    if max_workers == 0:
+        results = [_backtest_symbol(job) for job in jobs]
+    else:
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if chunksize is None:
+            chunksize = max(1, len(jobs) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_backtest_symbol, jobs, chunksize=chunksize))
+
+    trade_frames = [trades for trades, _ in results if trades is not None]
+    if trade_frames:
+        trade_log = pd.concat(trade_frames, ignore_index=True)
+    else:
+        trade_log = pd.DataFrame(columns=['symbol', 'action', 'price', 'entry_price', 'trade_id', 'date'])
+
+    summary = pd.DataFrame([row for _, row in results], columns=SUMMARY_COLUMNS)
+    summary['excess_profit'] = summary['profit'] - summary['buy_hold']
+    return trade_log, summary
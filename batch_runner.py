@@ -0,0 +1,263 @@
+# Headless batch runner for backtest jobs
+#
+# 1. Reading a job file (.json list, .json with "defaults" and "jobs", or .jsonl with one job per line)
+# 2. Running each job (load, indicators, trades, profit and optional exports) without any prompt
+# 3. Retrying failed jobs, and running the jobs on a bounded process pool
+# 4. Recording every finished job in a progress file, so an interrupted batch resumes where it stopped
+#
+# A job is a dictionary, only 'input' is required:
+#   {"id": "spy-ema", "input": "SPY_2016_2021.xlsx", "strategy": "EMA", "short_period": 12, "long_period": 26,
+#    "signal_period": 9, "fee": 0.00125, "export": "outputs/spy_ema.parquet", "trades_export": "outputs/spy_trades.csv"}
+#
+# Command line:
+#   python batch_runner.py jobs.jsonl --progress outputs/progress.jsonl --workers 8 --retries 2
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from data_loader import import_stock_file, validate_and_prepare_data, fill_missing_dates, export_stock_file
+from lazy_imports import lazy_module
+from trading_strategy import run_backtest
+
+pd = lazy_module('pandas')
+
+JOB_DEFAULTS = {
+    'strategy': 'EMA',
+    'short_period': 12,
+    'long_period': 26,
+    'signal_period': 9,
+    'fee': 0.00125,
+    'fill_dates': True,
+    'date_col': None,
+    'price_col': None,
+    'export': None,
+    'trades_export': None,
+    'overwrite': True,
+    'cache_dir': None,
+    'result_cache': None,
+}
+
+def job_id(job):
+    """
+    Identifier of a job: its 'id', or a hash of its settings so it stays the same between runs.
+    """
+    if job.get('id') is not None:
+        return str(job['id'])
+    settings = json.dumps({k: v for k, v in job.items() if k != 'id'}, sort_keys=True, default=str)
+    return hashlib.sha1(settings.encode()).hexdigest()[:12]
+
+def load_jobs(filepath):
+    """
+    Reads the jobs of a job file and fills in the default settings.
+    :param filepath: .jsonl file with one job per line, or .json file with a list of jobs
+                     or a dictionary {"defaults": {...}, "jobs": [...]}
+    :return: List of job dictionaries, each with an 'id'
+    """
+    with open(filepath) as f:
+        if os.path.splitext(filepath)[1].lower() == '.jsonl':
+            data = [json.loads(line) for line in f if line.strip()]
+        else:
+            data = json.load(f)
+
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get('defaults', {})
+        data = data['jobs']
+    return prepare_jobs(data, defaults)
+
+def prepare_jobs(jobs, defaults=None):
+    """
+    Fills in the default settings of each job and checks the settings.
+    :return: List of complete job dictionaries, each with an 'id'
+    """
+    prepared = []
+    seen = set()
+    for job in jobs:
+        if 'input' not in job:
+            raise ValueError(f"Job has no 'input' file: {job}")
+        unknown = set(job) - set(JOB_DEFAULTS) - {'id', 'input'}
+        if unknown:
+            raise ValueError(f"Unknown job settings: {sorted(unknown)}")
+        full = {**JOB_DEFAULTS, **(defaults or {}), **job}
+        full['id'] = job_id({**(defaults or {}), **job})
+        if full['id'] in seen:
+            raise ValueError(f"Duplicate job id: {full['id']}")
+        seen.add(full['id'])
+        prepared.append(full)
+    return prepared
+
+def run_job(job):
+    """
+    Runs one job from file to profit, never prompting.
+    :return: Result dictionary with id, rows, n_trades, profit, buy_hold and the export paths
+    """
+    if job['cache_dir'] is not None:
+        from data_cache import load_stock_file
+        df = load_stock_file(job['input'], job['date_col'], job['price_col'], cache_dir=job['cache_dir'],
+                             verbose=False)
+    else:
+        df = validate_and_prepare_data(import_stock_file(job['input']), job['date_col'], job['price_col'],
+                                       verbose=False)
+    if df.empty:
+        raise ValueError("No valid price rows.")
+    if job['fill_dates']:
+        df = fill_missing_dates(df)
+
+    settings = (df, job['strategy'], job['short_period'], job['long_period'], job['signal_period'], job['fee'])
+    if job['result_cache'] is not None:
+        from result_cache import cached_backtest
+        df, trades, profit, buy_hold = cached_backtest(*settings, annotate=job['export'] is not None,
+                                                       cache_dir=job['result_cache'])
+    else:
+        df, trades, profit, buy_hold = run_backtest(*settings, annotate=job['export'] is not None)
+
+    exports = {}
+    if job['export'] is not None:
+        exports['export'] = export_stock_file(df, job['export'], overwrite=job['overwrite'])
+    if job['trades_export'] is not None:
+        exports['trades_export'] = export_stock_file(trades, job['trades_export'], overwrite=job['overwrite'])
+
+    return {'rows': len(df), 'n_trades': len(trades), 'profit': float(profit), 'buy_hold': float(buy_hold),
+            **exports}
+
+def _run_with_retries(job, retries, retry_delay):
+    """
+    Runs a job, retrying it after a failure, and never raises.
+    :return: Progress record with id, status ('ok' or 'failed'), attempts, seconds, error and the job result
+    """
+    start = time.perf_counter()
+    error = None
+    for attempt in range(1, retries + 2):
+        try:
+            result = run_job(job)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempt <= retries:
+                time.sleep(retry_delay * attempt)
+            continue
+        return {'id': job['id'], 'status': 'ok', 'attempts': attempt,
+                'seconds': time.perf_counter() - start, 'error': None, **result}
+    return {'id': job['id'], 'status': 'failed', 'attempts': retries + 1,
+            'seconds': time.perf_counter() - start, 'error': error}
+
+def read_progress(progress_path):
+    """
+    Reads the records of a progress file, the latest record of each job wins.
+    :return: Dictionary of job id -> record
+    """
+    records = {}
+    if progress_path is None or not os.path.exists(progress_path):
+        return records
+    with open(progress_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Line cut short by an interruption
+            records[record['id']] = record
+    return records
+
+def _append_progress(progress_file, record):
+    if progress_file is not None:
+        progress_file.write(json.dumps(record, default=str) + '\n')
+        progress_file.flush()
+        os.fsync(progress_file.fileno())
+
+def run_batch(jobs, progress_path=None, max_workers=None, retries=2, retry_delay=1.0, resume=True, verbose=True):
+    """
+    Runs many jobs unattended.
+    At most 2 jobs per worker are queued at a time, so memory stays bounded for very long job lists.
+    :param jobs: List of job dictionaries (see prepare_jobs), or the path of a job file
+    :param progress_path: JSON lines file where each finished job is recorded
+    :param max_workers: Number of worker processes, 0 runs everything in the current process
+    :param retries: Number of extra attempts for a failing job
+    :param retry_delay: Seconds to wait before a retry (multiplied by the attempt number)
+    :param resume: Skip the jobs already recorded as 'ok' in the progress file
+    :return: DataFrame with one row per job (including jobs completed in earlier runs)
+    """
+    jobs = load_jobs(jobs) if isinstance(jobs, str) else prepare_jobs(jobs)
+    done = {job_id: r for job_id, r in read_progress(progress_path).items() if r['status'] == 'ok'} if resume else {}
+    pending = [job for job in jobs if job['id'] not in done]
+    if verbose and done:
+        print(f"Resuming: {len(jobs) - len(pending)} of {len(jobs)} jobs already done.")
+
+    records = dict(done)
+    if progress_path is not None and os.path.dirname(progress_path):
+        os.makedirs(os.path.dirname(progress_path), exist_ok=True)
+    progress_file = open(progress_path, 'a') if progress_path is not None else None
+
+    def finish(record):
+        records[record['id']] = record
+        _append_progress(progress_file, record)
+        if verbose:
+            status = '✅' if record['status'] == 'ok' else '❌'
+            print(f"{status} {record['id']} ({len(records)}/{len(jobs)})")
+
+    try:
+        if max_workers == 0:
+            for job in pending:
+                finish(_run_with_retries(job, retries, retry_delay))
+        else:
+            if max_workers is None:
+                max_workers = os.cpu_count() or 1
+            queue = iter(pending)
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                running = set()
+                while True:
+                    for job in queue:
+                        running.add(pool.submit(_run_with_retries, job, retries, retry_delay))
+                        if len(running) >= 2 * max_workers:
+                            break
+                    if not running:
+                        break
+                    finished, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        finish(future.result())
+    finally:
+        if progress_file is not None:
+            progress_file.close()
+
+    order = {job['id']: i for i, job in enumerate(jobs)}
+    results = pd.DataFrame([records[job['id']] for job in jobs if job['id'] in records])
+    if not results.empty:
+        results = results.sort_values('id', key=lambda ids: ids.map(order)).reset_index(drop=True)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run backtest jobs from a job file without prompting.")
+    parser.add_argument('jobs', help="Job file (.json or .jsonl)")
+    parser.add_argument('--progress', help="Progress file (.jsonl), used to resume an interrupted batch")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (0 runs in this process)")
+    parser.add_argument('--retries', type=int, default=2, help="Extra attempts for a failing job")
+    parser.add_argument('--retry-delay', type=float, default=1.0, help="Seconds before a retry")
+    parser.add_argument('--no-resume', action='store_true', help="Run every job again")
+    parser.add_argument('--cache-dir', help="Cache validated input files in this folder (see data_cache)")
+    parser.add_argument('--result-cache',
+                        help="Reuse the backtest results of unchanged jobs from this folder (see result_cache)")
+    parser.add_argument('--summary', help="Write the results table to this file (.csv, .xlsx, ...)")
+    args = parser.parse_args(argv)
+
+    jobs = load_jobs(args.jobs)
+    if args.cache_dir is not None:
+        for job in jobs:
+            job['cache_dir'] = job['cache_dir'] or args.cache_dir
+    if args.result_cache is not None:
+        for job in jobs:
+            job['result_cache'] = job['result_cache'] or args.result_cache
+    results = run_batch(jobs, args.progress, args.workers, args.retries, args.retry_delay, resume=not args.no_resume)
+
+    failed = int((results['status'] != 'ok').sum()) if not results.empty else 0
+    print(f"\n📊 {len(results) - failed} jobs done, {failed} failed.")
+    if args.summary:
+        export_stock_file(results, args.summary, overwrite=True)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+# Benchmark suite for every stage of the pipeline
+#
+# 1. Generating synthetic price series of any size (1e3 up to 1e8 rows)
+# 2. Timing each stage separately and measuring its peak memory
+# 3. Saving the results as JSON, and comparing them with a stored baseline to catch regressions
+#
+# Usage:
+#   python benchmarks/bench_pipeline.py --sizes 1e3 1e4 1e5 --output bench_results.json
+#   python benchmarks/bench_pipeline.py --sizes 1e5 --baseline benchmarks/baseline.json --threshold 0.25
+# The script exits with status 1 when a stage is slower than the baseline by more than the threshold.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from data_loader import import_stock_file, validate_and_prepare_data, fill_missing_dates, export_stock_file
+from indicators import calc_sma, calc_ema, calc_macd, calc_macd9, compute_histogram
+from trading_strategy import identify_trades, get_executed_trades, calculate_trade_profit
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+START_DATE = '1700-01-01'
+MAX_DAILY_ROWS = int(np.busday_count(START_DATE, '2262-04-11'))  # Business days left before pandas' last timestamp
+
+STAGES = [
+    'import_stock_file',
+    'validate_and_prepare_data',
+    'fill_missing_dates',
+    'calc_sma',
+    'calc_ema',
+    'calc_macd',
+    'calc_macd9',
+    'compute_histogram',
+    'identify_trades',
+    'get_executed_trades',
+    'calculate_trade_profit',
+    'export_stock_file',
+]
+
+def make_raw_prices(rows, seed=0):
+    """
+    Creates a raw price table like an imported file: 'Date' strings and a 'Close' random walk.
+    Daily dates (with weekends missing) are used while they fit, minute bars beyond that
+    (filled with the 'sessions' calendar of fill_missing_dates).
+    :param rows: Number of rows
+    :return: DataFrame with 'Date' and 'Close' columns
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, rows))
+    # Dates as offsets from the start, never one Timedelta spanning the whole range (limited to about 292 years)
+    if rows <= MAX_DAILY_ROWS:
+        dates = pd.DatetimeIndex(np.busday_offset(np.datetime64(START_DATE, 'D'), np.arange(rows), roll='forward'))
+    else:
+        dates = pd.DatetimeIndex(np.datetime64(START_DATE, 'm') + np.arange(rows))
+    return pd.DataFrame({'Date': dates.strftime('%Y-%m-%d %H:%M'), 'Close': np.round(close, 4)})
+
+def _prepare_inputs(rows, workdir):
+    """
+    Builds the input of every stage once, so each stage is timed on its own.
+    """
+    raw = make_raw_prices(rows)
+    csv_path = os.path.join(workdir, f'prices_{rows}.csv')
+    raw.to_csv(csv_path, index=False)
+
+    prepared = validate_and_prepare_data(raw, verbose=False)
+    daily = rows <= MAX_DAILY_ROWS
+    df = fill_missing_dates(prepared) if daily else fill_missing_dates(prepared, freq='min', calendar='sessions')
+    df = calc_ema(df, 12)
+    df = calc_ema(df, 26)
+    df = calc_macd(df)
+    df = calc_macd9(df, macd_key='MACD_EMA')
+    df = compute_histogram(df, macd_key='MACD_EMA')
+    annotated = identify_trades(df.copy())
+    trades = get_executed_trades(annotated)
+    return {'raw': raw, 'csv_path': csv_path, 'prepared': prepared, 'daily': daily,
+            'df': df, 'annotated': annotated, 'trades': trades, 'workdir': workdir}
+
+def _stage_function(stage, inputs):
+    """
+    Returns a zero-argument function running one stage on the prepared inputs.
+    """
+    df = inputs['df']
+    if stage == 'import_stock_file':
+        return lambda: import_stock_file(inputs['csv_path'])
+    if stage == 'validate_and_prepare_data':
+        return lambda: validate_and_prepare_data(inputs['raw'], verbose=False)
+    if stage == 'fill_missing_dates':
+        if not inputs['daily']:
+            return lambda: fill_missing_dates(inputs['prepared'], freq='min', calendar='sessions')
+        return lambda: fill_missing_dates(inputs['prepared'])
+    if stage == 'calc_sma':
+        return lambda: calc_sma(df, 26)
+    if stage == 'calc_ema':
+        return lambda: calc_ema(df, 26)
+    if stage == 'calc_macd':
+        return lambda: calc_macd(df)
+    if stage == 'calc_macd9':
+        return lambda: calc_macd9(df, macd_key='MACD_EMA')
+    if stage == 'compute_histogram':
+        return lambda: compute_histogram(df, macd_key='MACD_EMA')
+    if stage == 'identify_trades':
+        frame = df[['price', 'Histogram_EMA']]
+        return lambda: identify_trades(frame.copy())
+    if stage == 'get_executed_trades':
+        return lambda: get_executed_trades(inputs['annotated'])
+    if stage == 'calculate_trade_profit':
+        return lambda: calculate_trade_profit(inputs['trades'], inputs['annotated'])
+    if stage == 'export_stock_file':
+        path = os.path.join(inputs['workdir'], 'export.csv')
+        def export():
+            with contextlib.redirect_stdout(io.StringIO()):
+                export_stock_file(inputs['annotated'], path, overwrite=True)
+        return export
+    raise ValueError(f"Unknown stage: {stage}")
+
+def measure(func, repeat=3, memory=True):
+    """
+    Times a function (best of repeat runs) and measures its peak Python/NumPy memory in one extra run.
+    :return: (seconds, peak_bytes or None)
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+def run_benchmarks(sizes=DEFAULT_SIZES, stages=STAGES, repeat=3, memory=True, quiet=False):
+    """
+    Runs every stage for every size.
+    :return: Dictionary with 'meta' (machine and library versions) and 'results' (one record per stage and size)
+    """
+    results = []
+    for rows in sizes:
+        rows = int(rows)
+        with tempfile.TemporaryDirectory() as workdir:
+            inputs = _prepare_inputs(rows, workdir)
+            for stage in stages:
+                seconds, peak = measure(_stage_function(stage, inputs), repeat, memory)
+                record = {
+                    'stage': stage,
+                    'rows': rows,
+                    'seconds': seconds,
+                    'rows_per_sec': rows / seconds if seconds > 0 else None,
+                    'peak_mb': peak / 1024 ** 2 if peak is not None else None,
+                }
+                results.append(record)
+                if not quiet:
+                    peak_text = f"{record['peak_mb']:10.1f} MB" if peak is not None else ''
+                    print(f"{stage:<28}{rows:>12,} rows {seconds:10.4f} s {peak_text}")
+
+    meta = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'repeat': repeat,
+    }
+    return {'meta': meta, 'results': results}
+
+def compare_to_baseline(report, baseline, threshold=0.25, memory_threshold=None):
+    """
+    Finds stages that got slower (or used more memory) than the baseline by more than the threshold.
+    Stages or sizes missing from the baseline are ignored.
+    :param threshold: Allowed relative slowdown, 0.25 means 25% slower
+    :param memory_threshold: Allowed relative increase of peak memory, None to not check memory
+    :return: List of regression records
+    """
+    base = {(r['stage'], r['rows']): r for r in baseline['results']}
+    regressions = []
+    for record in report['results']:
+        old = base.get((record['stage'], record['rows']))
+        if old is None:
+            continue
+        if record['seconds'] > old['seconds'] * (1 + threshold):
+            regressions.append({'stage': record['stage'], 'rows': record['rows'], 'metric': 'seconds',
+                                'baseline': old['seconds'], 'current': record['seconds']})
+        if (memory_threshold is not None and record['peak_mb'] is not None and old.get('peak_mb') is not None
+                and record['peak_mb'] > old['peak_mb'] * (1 + memory_threshold)):
+            regressions.append({'stage': record['stage'], 'rows': record['rows'], 'metric': 'peak_mb',
+                                'baseline': old['peak_mb'], 'current': record['peak_mb']})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the stock pipeline.")
+    parser.add_argument('--sizes', nargs='+', type=float, default=DEFAULT_SIZES,
+                        help="Row counts to test, e.g. 1e3 1e5 1e8")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage (best is kept)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip peak memory measurement")
+    parser.add_argument('--output', default='bench_results.json', help="Where to write the JSON results")
+    parser.add_argument('--baseline', help="Baseline JSON to compare with")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument('--memory-threshold', type=float, default=None, help="Allowed relative memory increase")
+    parser.add_argument('--save-baseline', action='store_true', help="Also write the results to --baseline")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.stages, args.repeat, memory=not args.no_memory)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written: {args.output}")
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Baseline saved: {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.threshold, args.memory_threshold)
+        for r in regressions:
+            print(f"📉 {r['stage']} ({r['rows']:,} rows) {r['metric']}: {r['baseline']:.4f} -> {r['current']:.4f}")
+        if regressions:
+            return 1
+        print("✅ No regressions against the baseline.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# Functions for running the strategy on CSV price files larger than memory
+#
+# 1. Reading the CSV in chunks and validating each chunk with validate_and_prepare_data
+# 2. Filling missing dates across chunk boundaries
+# 3. Calculating SMA/EMA, MACD, MACD9, Histogram and trades with state carried from one chunk to the next
+# 4. Writing the annotated rows out (CSV or Parquet) as each chunk is finished, so memory stays bounded
+# 5. Collecting the (sparse) trades and comparing the profit with buy-hold at the end
+
+import os
+
+import pandas as pd
+
+from data_loader import validate_and_prepare_data, fill_missing_dates, StockFileWriter
+from incremental_indicators import IncrementalStrategy
+from trading_strategy import calculate_trade_profit
+
+TRADE_COLUMNS = ['trade_action', 'trade_price', 'entry_price', 'trade_id']
+
+def _typed_annotations(df):
+    """
+    Gives the trade annotation columns fixed dtypes, so every block written has the same schema.
+    Rows without a trade stay empty, as with the object columns of identify_trades.
+    """
+    df = df.copy()
+    df['trade_action'] = df['trade_action'].astype('string')
+    df['trade_price'] = df['trade_price'].astype(float)
+    df['entry_price'] = df['entry_price'].astype(float)
+    df['trade_id'] = df['trade_id'].astype('Int64')
+    return df
+
+def run_chunked_pipeline(filepath, output_path, method='EMA', short_period=12, long_period=26, signal_period=9,
+                         fee=0.00125, chunksize=500_000, date_col=None, price_col=None, fill_dates=False,
+                         compression=None):
+    """
+    Runs indicators, trade identification and profit calculation on a CSV file one chunk at a time.
+    The annotated rows are the same as with validate_and_prepare_data + calc_macd_histogram + identify_trades
+    on the whole file, but only one chunk is held in memory.
+    The file must already be sorted by date, because the chunks cannot be sorted against each other.
+    :param filepath: Path to the input CSV file
+    :param output_path: Path to the output .csv or .parquet file, written progressively (overwritten if it exists)
+    :param method: 'EMA' or 'SMA'
+    :param fee: Transaction fee for selling
+    :param chunksize: Number of rows read at a time
+    :param fill_dates: Forward-fill missing dates like fill_missing_dates
+    :param compression: Optional compression of the output, e.g. 'gzip' for CSV or 'zstd' for Parquet
+    :return: (trades DataFrame as from get_executed_trades, buy_sell_profit, buy_hold_profit)
+    """
+    if os.path.splitext(filepath)[1].lower() != '.csv':
+        raise ValueError("Chunked mode only supports .csv input files.")
+
+    strategy = IncrementalStrategy(method, short_period, long_period, signal_period)
+    trades = []
+    first_row = None
+    pending = None  # Last annotated row, held back until we know whether it is the final row
+    last_date = None
+
+    with StockFileWriter(output_path, overwrite=True, compression=compression) as writer:
+        for raw in pd.read_csv(filepath, chunksize=chunksize):
+            chunk = validate_and_prepare_data(raw, date_col, price_col, verbose=False)
+            if chunk.empty:
+                continue
+            if last_date is not None and chunk.index[0] < last_date:
+                raise ValueError("Input file must be sorted by date for chunked processing.")
+
+            # Fill the gap between the previous chunk and this one as well
+            if fill_dates:
+                if pending is not None:
+                    chunk = fill_missing_dates(pd.concat([pending[chunk.columns], chunk])).iloc[1:]
+                else:
+                    chunk = fill_missing_dates(chunk)
+            last_date = chunk.index[-1]
+
+            columns = strategy.update_array(chunk['price'].to_numpy())
+            for col, values in columns.items():
+                chunk[col] = values
+            if first_row is None:
+                first_row = chunk.iloc[:1]
+
+            traded = chunk[chunk['trade_action'].notna()]
+            trades.extend(zip(traded.index, traded['trade_action'], traded['trade_price'],
+                              traded['entry_price'], traded['trade_id']))
+
+            if pending is not None:
+                chunk = pd.concat([pending, chunk])
+            writer.write(_typed_annotations(chunk.iloc[:-1]))
+            pending = chunk.iloc[-1:].copy()
+
+        if pending is None:
+            raise ValueError("No valid price rows found.")
+
+        # Close the open position on the final row, like identify_trades
+        forced = strategy.close_position()
+        if forced is not None:
+            final_date = pending.index[0]
+            if trades and trades[-1][0] == final_date:
+                trades.pop()
+            for col in TRADE_COLUMNS:
+                pending[col] = pending[col].astype(object)
+                pending.loc[final_date, col] = forced[col]
+            trades.append((final_date, forced['trade_action'], forced['trade_price'],
+                           forced['entry_price'], forced['trade_id']))
+        writer.write(_typed_annotations(pending))
+
+    trades = pd.DataFrame(trades, columns=['date', 'action', 'price', 'entry_price', 'trade_id'])
+    trades = trades[['action', 'price', 'entry_price', 'trade_id', 'date']]
+
+    # Buy-hold only needs the first and last prices
+    ends = pd.concat([first_row[['price']], pending[['price']]])
+    profit, buy_hold = calculate_trade_profit(trades, ends, fee=fee)
+    return trades, profit, buy_hold
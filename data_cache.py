@@ -0,0 +1,226 @@
+# Functions for caching prepared stock data on disk
+#
+# 1. Loading a stock file through the cache: parsed and validated once, then read back from binary columns
+# 2. Checking cache entries against the file path, modification time and content hash
+# 3. Evicting the least recently used entries when the cache grows past its size limit
+# 4. Invalidating the entry of one file, or the whole cache
+#
+# Each entry is a folder with one .npy file per column (plus the date index) and a meta.json file.
+# The .npy files can be memory-mapped, so later loads skip Excel/CSV parsing, date coercion and sorting.
+# Text columns are stored as JSON and nothing is ever unpickled, so a shared cache folder cannot run code on load.
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import import_stock_file, validate_and_prepare_data
+
+DEFAULT_CACHE_DIR = os.environ.get('STOCKCALC_CACHE_DIR',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'stockcalc', 'data'))
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+def file_content_hash(filepath, block_size=1024 * 1024):
+    """
+    Computes the SHA-256 hash of a file's bytes.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _entry_dir(filepath, date_col, price_col, cache_dir):
+    """
+    Returns the cache folder for a file and column mapping.
+    """
+    key = json.dumps([os.path.abspath(filepath), date_col, price_col])
+    return os.path.join(cache_dir, hashlib.sha256(key.encode()).hexdigest()[:32])
+
+def _read_meta(entry):
+    try:
+        with open(os.path.join(entry, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(entry, meta):
+    # Own temporary file per writer, so concurrent hits on the same entry never share one
+    fd, tmp_path = tempfile.mkstemp(dir=entry, prefix='.tmp-meta-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(entry, 'meta.json'))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def tz_to_meta(tz):
+    """
+    Time zone of the index as stored in meta.json: its name, or its UTC offset in minutes for a fixed offset.
+    :raises TypeError: For a time zone that can be neither named nor stored as a fixed offset
+    """
+    if tz is None:
+        return None
+    name = getattr(tz, 'zone', None) or getattr(tz, 'key', None)  # pytz / zoneinfo
+    if name is None and str(tz) == 'UTC':
+        name = 'UTC'
+    if name is not None:
+        return name
+    offset = tz.utcoffset(None)
+    if offset is None:
+        raise TypeError(f"Cannot store time zone {tz!r} in the cache.")
+    return {'utc_offset_minutes': offset.total_seconds() / 60}
+
+def tz_from_meta(tz):
+    """
+    Time zone stored by tz_to_meta, as a name or a datetime.timezone.
+    """
+    if isinstance(tz, dict):
+        return datetime.timezone(datetime.timedelta(minutes=tz['utc_offset_minutes']))
+    return tz
+
+def _save_entry(df, entry, meta):
+    """
+    Writes a prepared DataFrame into a new cache folder, swapping it in only once it is complete.
+    """
+    parent = os.path.dirname(entry)
+    os.makedirs(parent, exist_ok=True)
+    tmp_entry = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    try:
+        # Dates are stored as UTC for a tz-aware index, the time zone goes in meta.json
+        np.save(os.path.join(tmp_entry, 'index.npy'), df.index.values.astype('datetime64[ns]'))
+        columns = []
+        for i, col in enumerate(df.columns):
+            values = df[col].to_numpy()
+            if values.dtype == object:
+                # Text columns go to JSON, so loading an entry never unpickles anything
+                with open(os.path.join(tmp_entry, f'col{i}.json'), 'w') as f:
+                    json.dump(values.tolist(), f)
+                columns.append({'name': col, 'file': f'col{i}.json', 'object': True})
+            else:
+                np.save(os.path.join(tmp_entry, f'col{i}.npy'), values, allow_pickle=False)
+                columns.append({'name': col, 'file': f'col{i}.npy', 'object': False})
+        meta = dict(meta, columns=columns, index_name=df.index.name, tz=tz_to_meta(getattr(df.index, 'tz', None)))
+        _write_meta(tmp_entry, meta)
+        if os.path.exists(entry):
+            shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp_entry, entry)
+    except Exception:
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        raise
+
+def _load_entry(entry, meta, mmap):
+    """
+    Rebuilds the prepared DataFrame from a cache folder.
+    Numeric columns are memory-mapped (read-only) when mmap is True.
+    """
+    mmap_mode = 'r' if mmap else None
+    # np.asarray keeps the memory map but gives pandas a plain ndarray view
+    index = pd.DatetimeIndex(np.asarray(np.load(os.path.join(entry, 'index.npy'), mmap_mode=mmap_mode)),
+                             name=meta['index_name'])
+    if meta['tz'] is not None:
+        index = index.tz_localize('UTC').tz_convert(tz_from_meta(meta['tz']))
+    data = {}
+    for col in meta['columns']:
+        path = os.path.join(entry, col['file'])
+        if col['object']:
+            with open(path) as f:
+                data[col['name']] = np.array(json.load(f), dtype=object)
+        else:
+            data[col['name']] = np.asarray(np.load(path, mmap_mode=mmap_mode, allow_pickle=False))
+    return pd.DataFrame(data, index=index, copy=not mmap)
+
+def cache_size(cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Returns the total size in bytes of all cache entries.
+    """
+    total = 0
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def evict_cache(max_bytes=DEFAULT_MAX_BYTES, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Removes the least recently used entries until the cache is at most max_bytes.
+    :return: Number of entries removed
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    entries = []
+    total = 0
+    for name in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, name)
+        if name.startswith('.tmp-') or not os.path.isdir(entry):
+            continue
+        size = cache_size(entry)
+        meta = _read_meta(entry) or {}
+        entries.append((meta.get('last_used', 0), size, entry))
+        total += size
+
+    removed = 0
+    for _, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
+
+def invalidate_cache(filepath=None, date_col=None, price_col=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Removes the cache entry of one file (with the given column mapping), or the whole cache if no file is given.
+    """
+    if filepath is None:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    else:
+        shutil.rmtree(_entry_dir(filepath, date_col, price_col, cache_dir), ignore_errors=True)
+
+def load_stock_file(filepath, date_col=None, price_col=None, cache_dir=DEFAULT_CACHE_DIR,
+                    max_bytes=DEFAULT_MAX_BYTES, mmap=False, verbose=True):
+    """
+    Loads a stock file already validated, using the cache when the file has not changed.
+    Same result as validate_and_prepare_data(import_stock_file(filepath), date_col, price_col).
+    An entry is reused when the path, modification time and size match, or when the file was only
+    touched and its content hash still matches.
+    :param filepath: Path to the file
+    :param cache_dir: Folder holding the cache entries
+    :param max_bytes: Size limit of the cache, older entries are evicted after a new one is written
+    :param mmap: Memory-map the numeric columns instead of reading them into memory (they are then read-only)
+    :return: Cleaned DataFrame with datetime index
+    """
+    stat = os.stat(filepath)
+    entry = _entry_dir(filepath, date_col, price_col, cache_dir)
+    meta = _read_meta(entry)
+
+    if meta is not None:
+        same_stat = meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size
+        if same_stat or meta['content_hash'] == file_content_hash(filepath):
+            meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size, last_used=time.time())
+            _write_meta(entry, meta)
+            return _load_entry(entry, meta, mmap)
+
+    # Cache miss: parse and validate once, then store the result
+    df = validate_and_prepare_data(import_stock_file(filepath), date_col, price_col, verbose=verbose)
+    meta = {
+        'path': os.path.abspath(filepath),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'content_hash': file_content_hash(filepath),
+        'last_used': time.time(),
+    }
+    try:
+        _save_entry(df, entry, meta)
+    except TypeError:
+        return df  # A column holds values JSON cannot store (e.g. Python objects): not cached
+    evict_cache(max_bytes, cache_dir)
+    return df
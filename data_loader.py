@@ -2,11 +2,23 @@
 # 
 # 1. Select the file and format you want to use
 # 2. Importing the data into a Pandas DataFrame and validating it, ensuring data is in correct format
-# 3. Filling in missing dates (forward fill) for non-trading days like weekends
+#    (one file, or a whole folder of files loaded concurrently)
+# 3. Filling in missing dates (forward fill) for non-trading days like weekends, or only for real trading sessions
+#    (business days, or the days in the data) with daily, hourly or minute bars
 # 4. Exporting the DataFrame with the added column into a new file
+#    (CSV/Excel, or Parquet/Feather/pickle; in the background or in blocks for large frames)
 
-import pandas as pd
+import glob
+import gzip
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+from lazy_imports import lazy_module
+
+pd = lazy_module('pandas')  # Loaded on the first import/export, openpyxl only when Excel is read or written
 
 def import_stock_file(filepath):
     """
@@ -26,12 +38,13 @@ def import_stock_file(filepath):
     
     return df
 
-def validate_and_prepare_data(df, date_col=None, price_col=None):
+def validate_and_prepare_data(df, date_col=None, price_col=None, verbose=True):
     """
     Validates and prepares the stock data DataFrame for analysis.
     :param df: Raw DataFrame
     :param date_col: Name of the column containing dates
     :param price_col: Name of the column containing prices
+    :param verbose: Print which columns were mapped (turn off for batch runs)
     :return: Cleaned DataFrame with datetime index
     """
     df = df.copy()
@@ -64,54 +77,397 @@ def validate_and_prepare_data(df, date_col=None, price_col=None):
     df.dropna(subset=['price'], inplace=True)
 
     # Let user know what columns were mapped
-    print(f"Using '{date_col}' as date column and '{price_col}' as price column.")
+    if verbose:
+        print(f"Using '{date_col}' as date column and '{price_col}' as price column.")
 
     return df
 
-def fill_missing_dates(df, price_col='price'):
+STOCK_FILE_FORMATS = ['.csv', '.xls', '.xlsx']
+
+def _load_one(filepath, date_col=None, price_col=None):
+    """
+    Imports and validates one file for load_stock_files, never raises.
+    :return: (DataFrame or None, error message or None)
+    """
+    try:
+        return validate_and_prepare_data(import_stock_file(filepath), date_col, price_col, verbose=False), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def find_stock_files(source):
+    """
+    Lists the stock files of a directory (CSV, XLS, XLSX), a glob pattern or a list of paths.
+    :return: Sorted list of paths
+    """
+    if isinstance(source, (list, tuple)):
+        return list(source)
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source)
+                      if os.path.splitext(name)[1].lower() in STOCK_FILE_FORMATS)
+    return sorted(glob.glob(source))
+
+def load_stock_files(source, date_col=None, price_col=None, panel=False, max_threads=None, max_processes=None):
+    """
+    Imports and validates many stock files concurrently: CSV files on threads (mostly waiting on I/O),
+    Excel files on processes (openpyxl parsing is CPU bound).
+    Each file goes through validate_and_prepare_data with column auto-detection.
+    A file that fails is reported in the errors and does not stop the others.
+    :param source: Directory, glob pattern (e.g. 'data/*.csv') or list of paths
+    :param panel: Return one wide DataFrame of prices (one column per file) instead of a dictionary
+    :param max_threads: Number of threads for CSV files
+    :param max_processes: Number of processes for Excel files
+    :return: (frames, errors) where frames is a dictionary of name -> prepared DataFrame (or the price panel)
+             and errors a dictionary of name -> error message. The name is the file name without extension,
+             with its extension when two files share a name, or the path as given when two folders do.
+    """
+    paths = find_stock_files(source)
+    names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    if len(set(names)) < len(names):
+        names = [os.path.basename(path) for path in paths]  # Same name with different extensions
+    if len(set(names)) < len(names):
+        names = list(paths)  # Same file name in different folders
+    if len(set(names)) < len(names):
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        raise ValueError(f"Files listed more than once: {duplicates}")
+
+    excel = [i for i, path in enumerate(paths) if os.path.splitext(path)[1].lower() in ['.xls', '.xlsx']]
+    others = [i for i in range(len(paths)) if i not in set(excel)]
+
+    futures = {}
+    with ThreadPoolExecutor(max_workers=max_threads) as threads:
+        for i in others:
+            futures[i] = threads.submit(_load_one, paths[i], date_col, price_col)
+        if len(excel) > 1:
+            with ProcessPoolExecutor(max_workers=max_processes) as processes:
+                for i in excel:
+                    futures[i] = processes.submit(_load_one, paths[i], date_col, price_col)
+                results = {i: futures[i].result() for i in excel}
+        else:
+            results = {i: _load_one(paths[i], date_col, price_col) for i in excel}
+        results.update({i: futures[i].result() for i in others})
+
+    frames, errors = {}, {}
+    for i, name in enumerate(names):
+        df, error = results[i]
+        if error is None:
+            frames[name] = df
+        else:
+            errors[name] = error
+
+    if panel:
+        frames = pd.concat({name: df['price'] for name, df in frames.items()}, axis=1) if frames else pd.DataFrame()
+    return frames, errors
+
+CALENDARS = ['all', 'business', 'sessions']
+
+def _time_of_day(value):
+    """
+    Time since midnight of a 'HH:MM[:SS]' string or datetime.time, as a Timedelta.
+    """
+    timestamp = pd.Timestamp(f'2000-01-01 {value}')
+    return timestamp - timestamp.normalize()
+
+def _session_bars(days, freq, session_start, session_end, index):
+    """
+    Intraday bar times for each trading day: the session window if given, otherwise from the day's
+    first to its last observed bar.
+    """
+    step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+    if session_start is not None and session_end is not None:
+        bars = pd.timedelta_range(_time_of_day(session_start), _time_of_day(session_end), freq=step)
+        return pd.DatetimeIndex((days.values[:, None] + bars.values[None, :]).ravel())
+
+    # Observed first/last bar per day, then consecutive bars between them
+    day_of_bar = index.normalize()
+    first = index.to_series().groupby(day_of_bar).min().reindex(days)
+    last = index.to_series().groupby(day_of_bar).max().reindex(days)
+    first = first.fillna(days.to_series()).to_numpy()
+    counts = np.where(pd.isna(last.to_numpy()), 0, (last.to_numpy() - first) // step + 1).astype(np.int64)
+    within_day = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return pd.DatetimeIndex(np.repeat(first, counts) + within_day * step)
+
+def fill_missing_dates(df, price_col='price', freq='D', calendar='all', holidays=None,
+                       session_start=None, session_end=None):
     """
     Fills missing dates in the stock price DataFrame and forward-fills missing prices.
-    :param df: DataFrame with datetime index
+    The default fills every calendar day, weekends included. The other calendars only add real trading periods:
+    - 'business': Monday to Friday, except the given holidays
+    - 'sessions': only the days already in the data (daily data is returned as it is)
+    Intraday bars ('min', '5min', 'h', ...) are filled within each trading day only, over the session hours
+    if given or between the day's first and last bar otherwise.
+    Rows that are already in the data are always kept.
+    :param df: DataFrame with datetime index (session times and days of a time zone aware index are local times)
     :param price_col: Name of the price column
+    :param freq: Bar frequency, 'D' for daily data
+    :param calendar: 'all' (default, every day), 'business' or 'sessions'
+    :param holidays: Dates to leave out with the 'business' calendar
+    :param session_start: Start of the trading session for intraday bars, e.g. '09:30'
+    :param session_end: Time of the last intraday bar, e.g. '16:00'
     :return: DataFrame with filled dates
     """
-    df = df.asfreq('D')  # daily frequency (includes weekends)
+    if calendar not in CALENDARS:
+        raise ValueError(f"Unsupported calendar: {calendar}. Use one of {CALENDARS}.")
+    offset = pd.tseries.frequencies.to_offset(freq)
+    intraday = isinstance(offset, pd.offsets.Tick) and pd.Timedelta(offset) < pd.Timedelta('1D')
+    if calendar == 'all' and not intraday:
+        grid = pd.date_range(df.index[0], df.index[-1], freq=freq) if len(df) else None
+        if grid is None or df.index.isin(grid).all():
+            df = df.asfreq(freq)  # daily frequency (includes weekends)
+        else:
+            df = df.reindex(grid.union(df.index).rename(df.index.name))  # asfreq would drop the rows off the grid
+        df[price_col] = df[price_col].ffill()
+        return df
+    if df.empty or (calendar == 'sessions' and not intraday):
+        return df.copy()
+
+    # Trading days, then the bars in each of them, on the local wall clock of a time zone aware index
+    tz = df.index.tz
+    index = df.index.tz_localize(None) if tz is not None else df.index
+    if calendar == 'all':
+        days = pd.date_range(index[0].normalize(), index[-1].normalize(), freq='D')
+    elif calendar == 'business':
+        days = pd.bdate_range(index[0].normalize(), index[-1].normalize(), freq='C',
+                              holidays=list(holidays) if holidays is not None else [])
+    else:
+        days = pd.DatetimeIndex(index.normalize().unique())
+    target = _session_bars(days, freq, session_start, session_end, index) if intraday else days
+    if tz is not None:
+        # Bars that do not exist or repeat on a daylight saving change are dropped (rows in the data are kept)
+        target = target.tz_localize(tz, ambiguous='NaT', nonexistent='NaT').dropna()
+
+    target = target[(target >= df.index[0]) & (target <= df.index[-1])].union(df.index)
+    df = df.reindex(target.rename(df.index.name))
     df[price_col] = df[price_col].ffill()
     return df
 
-def export_stock_file(df, filepath, overwrite=False):
+EXPORT_FORMATS = ['.csv', '.xlsx', '.parquet', '.feather', '.pkl']
+STREAM_FORMATS = ['.csv', '.parquet']
+
+# Single background thread so exports are written one after another, in the order they were requested
+_export_executor = None
+_export_lock = threading.Lock()
+_reserved_paths = set()
+_pending_exports = []
+
+def _check_export_format(filepath, formats=EXPORT_FORMATS):
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext not in formats:
+        raise ValueError(f"Unsupported export format: {ext}. Use {', '.join(formats)}.")
+    return ext
+
+def _ensure_folder(filepath):
+    folder = os.path.dirname(filepath)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder, exist_ok=True)
+        print(f"📁 Created folder: {folder}")
+
+def _next_version_path(filepath, reserved=()):
+    """
+    Returns filepath, or the first free versioned name (base_1.ext, base_2.ext, ...) if it already exists.
+    The folder is scanned once instead of checking each candidate name on disk.
+    """
+    folder = os.path.dirname(filepath)
+    base, ext = os.path.splitext(filepath)
+    try:
+        with os.scandir(folder or '.') as entries:
+            existing = {entry.name for entry in entries}
+    except FileNotFoundError:
+        existing = set()
+    existing.update(os.path.basename(path) for path in reserved if os.path.dirname(path) == folder)
+
+    version = 0
+    new_filepath = filepath
+    while os.path.basename(new_filepath) in existing:
+        version += 1
+        new_filepath = f"{base}_{version}{ext}"
+    return new_filepath
+
+def _resolve_export_path(filepath, overwrite, formats=EXPORT_FORMATS):
+    """
+    Validates the format, creates the parent folder and picks the versioned path to write to.
+    """
+    _check_export_format(filepath, formats)
+    _ensure_folder(filepath)
+    if overwrite:
+        return filepath
+    with _export_lock:
+        return _next_version_path(filepath, _reserved_paths)
+
+def _write_frame(df, filepath, compression=None):
+    """
+    Writes a DataFrame in the format given by the file extension, keeping the index.
+    Parquet and Feather need the optional pyarrow package.
     """
-    Exports the DataFrame to a CSV or Excel file.
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext == '.csv':
+        df.to_csv(filepath, index=True, compression=compression)
+    elif ext == '.xlsx':
+        df.to_excel(filepath, index=True)
+    elif ext == '.parquet':
+        df.to_parquet(filepath, index=True, compression=compression or 'snappy')
+    elif ext == '.feather':
+        # Feather only stores columns, so the index is written as a column
+        df.reset_index().to_feather(filepath, compression=compression)
+    else:  # .pkl
+        df.to_pickle(filepath, compression=compression or 'infer')
+
+def export_stock_file(df, filepath, overwrite=False, compression=None):
+    """
+    Exports the DataFrame to a CSV, Excel, Parquet, Feather or pickle file.
     If the file already exists, automatically appends a version number (_1, _2, etc.).
     
     :param df: DataFrame to export
-    :param filepath: Desired filename (with .csv or .xlsx)
+    :param filepath: Desired filename (with .csv, .xlsx, .parquet, .feather or .pkl)
+    :param overwrite: Overwrite the file instead of creating a new version
+    :param compression: Optional compression, e.g. 'gzip' for CSV, 'zstd' for Parquet/Feather
+    :return: Path the data was written to
     """
-    base, ext = os.path.splitext(filepath)
-    ext = ext.lower()
+    new_filepath = _resolve_export_path(filepath, overwrite)
+    _write_frame(df, new_filepath, compression)
+    print(f"✅ Data exported: {new_filepath}")
+    return new_filepath
 
-    # Validate supported formats
-    if ext not in ['.csv', '.xlsx']:
-        raise ValueError(f"Unsupported export format: {ext}. Use .csv or .xlsx.")
+def export_stock_file_async(df, filepath, overwrite=False, compression=None, copy=True):
+    """
+    Exports the DataFrame on a background thread, so the next backtest can start while the file is written.
+    The output is the same as export_stock_file, and the versioned path is picked straight away,
+    so exports requested one after another never get the same name.
+    :param copy: Export a copy of df, so later changes to df do not reach the file (set False if df is not changed)
+    :return: concurrent.futures.Future whose result is the path written to
+    """
+    global _export_executor
+    if copy:
+        df = df.copy()
 
-    # Ensure parent folder exists
-    folder = os.path.dirname(filepath)
-    if folder and not os.path.exists(folder):
-        os.makedirs(folder)
-        print(f"📁 Created folder: {folder}")
-        
-    # Version control: check if file exists
-    if not overwrite:
-        version = 0
-        new_filepath = filepath
-        while os.path.exists(new_filepath):
-            version += 1
-            new_filepath = f"{base}_{version}{ext}"
-
-    # Export based on file type
-    if ext == '.csv':
-        df.to_csv(new_filepath, index=True)
-    else:  # .xlsx
-        df.to_excel(new_filepath, index=True)
+    with _export_lock:
+        _check_export_format(filepath)
+        _ensure_folder(filepath)
+        new_filepath = filepath if overwrite else _next_version_path(filepath, _reserved_paths)
+        _reserved_paths.add(new_filepath)
+        if _export_executor is None:
+            _export_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stock-export')
 
-    print(f"✅ Data exported: {new_filepath}")
\ No newline at end of file
+    def write():
+        try:
+            _write_frame(df, new_filepath, compression)
+            print(f"✅ Data exported: {new_filepath}")
+            return new_filepath
+        finally:
+            with _export_lock:
+                _reserved_paths.discard(new_filepath)
+
+    with _export_lock:
+        future = _export_executor.submit(write)
+        _pending_exports.append(future)
+    return future
+
+def wait_for_exports():
+    """
+    Blocks until every background export has been written, raising the first export error if any.
+    :return: List of paths written
+    """
+    paths = []
+    while True:
+        with _export_lock:
+            if not _pending_exports:
+                return paths
+            future = _pending_exports.pop(0)
+        paths.append(future.result())  # Outside the lock, the export takes it when it finishes
+
+CSV_COMPRESSIONS = ['gzip', 'bz2', 'xz', 'zstd']
+
+def _csv_opener(compression):
+    """
+    Function opening a compressed text stream for StockFileWriter, or None if the compression is not supported.
+    """
+    if compression == 'gzip':
+        return gzip.open
+    if compression == 'bz2':
+        import bz2
+        return bz2.open
+    if compression == 'xz':
+        import lzma
+        return lzma.open
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            return None
+        return zstandard.open
+    return None
+
+class StockFileWriter:
+    """
+    Writes a large DataFrame to one CSV or Parquet file in blocks, so it never has to be in memory at once.
+    Example:
+        with StockFileWriter("outputs/final_data.parquet") as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+    def __init__(self, filepath, overwrite=False, compression=None):
+        ext = os.path.splitext(filepath)[1].lower()
+        if ext == '.csv' and compression is not None and _csv_opener(compression) is None:
+            raise ValueError(f"Unsupported CSV compression: {compression}. "
+                             f"Use one of {CSV_COMPRESSIONS} ('zstd' needs the zstandard package).")
+        self.filepath = _resolve_export_path(filepath, overwrite, STREAM_FORMATS)
+        self.ext = os.path.splitext(self.filepath)[1].lower()
+        self.compression = compression
+        self.rows = 0
+        self._parquet_writer = None
+        self._csv_file = None
+
+    def write(self, df):
+        """
+        Appends a block of rows (same columns every time) to the file.
+        """
+        if self.ext == '.csv':
+            if self._csv_file is None:
+                # Compressed CSV streams are kept open so the blocks end up in one compressed file
+                if self.compression is not None:
+                    self._csv_file = _csv_opener(self.compression)(self.filepath, 'wt', newline='')
+                else:
+                    self._csv_file = open(self.filepath, 'w', newline='')
+                df.to_csv(self._csv_file, index=True, header=True)
+            else:
+                df.to_csv(self._csv_file, index=True, header=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=True)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.filepath, table.schema,
+                                                        compression=self.compression or 'snappy')
+            self._parquet_writer.write_table(table.cast(self._parquet_writer.schema))
+        self.rows += len(df)
+
+    def _close_files(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def close(self):
+        self._close_files()
+        print(f"✅ Data exported: {self.filepath}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._close_files()
+        return False
+
+def export_stock_chunks(chunks, filepath, overwrite=False, compression=None):
+    """
+    Exports an iterable of DataFrames (e.g. from pd.read_csv(chunksize=...)) into one CSV or Parquet file.
+    :return: Path the data was written to
+    """
+    with StockFileWriter(filepath, overwrite, compression) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    return writer.filepath
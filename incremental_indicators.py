@@ -0,0 +1,366 @@
+# Stateful indicators for updating data as time goes on
+#
+# 1. Rolling SMA that keeps its window and a compensated running sum (NaN values are counted apart)
+# 2. Seeded EMA (SMA seed, then EMA) matching calc_ema and calc_macd9
+# 3. MACD line, Signal Line (MACD9) and Histogram for one method (SMA or EMA)
+# 4. Trade signals using the same BUY/SELL rules as identify_trades
+# 5. Strategy object combining all of the above, with snapshot/restore so a process can restart
+#    without replaying the price history
+#
+# Each new bar is processed in constant time, and the values match the batch functions bar for bar.
+# Blocks of bars can also be passed to update_array, which uses the vectorized pandas/NumPy paths
+# while carrying the state across block boundaries.
+
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from kernels import rolling_mean, rolling_mean_state
+from trading_strategy import find_trade_events
+
+NAN = float('nan')
+
+def _nan_to_none(value):
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+def _none_to_nan(value):
+    return NAN if value is None else value
+
+class RollingSMA:
+    """
+    Simple Moving Average over the last n values, same as calc_sma to the last bit.
+    Keeps the compensated running sum of kernels.rolling_mean, which skips NaN values,
+    so the SMA recovers once a NaN has left the window.
+    """
+    def __init__(self, period):
+        self.period = period
+        self.state = rolling_mean_state()
+
+    def update(self, value):
+        """
+        Adds a new value and returns the SMA, or NaN until the window is full.
+        """
+        return float(rolling_mean([value], self.period, self.state)[0])
+
+    def update_array(self, values):
+        """
+        Adds a block of values and returns the SMA for each of them as an array.
+        """
+        return rolling_mean(values, self.period, self.state)
+
+    def snapshot(self):
+        # NaN is stored as None so the snapshot is plain JSON
+        state = {key: _nan_to_none(value) for key, value in self.state.items() if key != 'window'}
+        return {'period': self.period, 'window': [_nan_to_none(v) for v in self.state['window']], **state}
+
+    @classmethod
+    def from_snapshot(cls, state):
+        sma = cls(state['period'])
+        window = [_none_to_nan(v) for v in state['window']]
+        sma.state.update({key: state[key] for key in sma.state if key != 'window'}, window=window)
+        return sma
+
+class SeededEMA:
+    """
+    EMA seeded with the SMA of the first n values, same as calc_ema and calc_macd9.
+    Values before the seed are NaN. Missing values are treated the way pandas ewm(adjust=False) treats them,
+    so a stream that starts with NaN (like the MACD line) also matches.
+    """
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.count = 0
+        self.seed_values = []
+        self.value = NAN
+        self.old_weight = 1.0
+
+    def update(self, value):
+        """
+        Adds a new value and returns the EMA, or NaN during the warm-up period.
+        """
+        self.count += 1
+
+        # Warm-up: collect the first n values for the SMA seed
+        if self.count <= self.period:
+            self.seed_values.append(value)
+            if self.count < self.period:
+                return NAN
+            # Same NumPy sum as the seed of calc_ema (indicators._mean_skipna), so the values match to the last bit
+            seed = np.asarray(self.seed_values, dtype=float)
+            valid = ~np.isnan(seed)
+            self.value = float(np.where(valid, seed, 0).sum() / valid.sum()) if valid.any() else NAN
+            self.seed_values = []
+            return self.value
+
+        # Same recursion as pandas ewm(adjust=False, ignore_na=False)
+        is_observation = not math.isnan(value)
+        if not math.isnan(self.value):
+            self.old_weight *= 1 - self.alpha
+            if is_observation:
+                if self.value != value:
+                    self.value = (self.old_weight * self.value + self.alpha * value) / (self.old_weight + self.alpha)
+                self.old_weight = 1.0
+        elif is_observation:
+            self.value = value
+        return self.value
+
+    def update_array(self, values):
+        """
+        Adds a block of values and returns the EMA for each of them as an array.
+        The block continues the pandas ewm from the carried value, so it gives the same result as one long series.
+        """
+        values = np.asarray(values, dtype=float)
+        out = np.empty(len(values))
+
+        # Warm-up values, and a weight decayed by trailing NaNs, go through the per-bar path
+        i = 0
+        while i < len(values) and (self.count < self.period or self.old_weight != 1.0):
+            out[i] = self.update(values[i])
+            i += 1
+
+        rest = values[i:]
+        if len(rest):
+            seeded = np.concatenate(([self.value], rest))
+            out[i:] = pd.Series(seeded).ewm(span=self.period, adjust=False).mean().to_numpy()[1:]
+            self.count += len(rest)
+
+            # Carry the weight decay of trailing NaNs the same way the per-bar path does
+            was_valid = not math.isnan(self.value)
+            self.value = float(out[-1])
+            if not math.isnan(self.value):
+                observed = np.flatnonzero(~np.isnan(rest))
+                trailing = len(rest) - 1 - observed[-1] if len(observed) else len(rest)
+                if len(observed):
+                    self.old_weight = 1.0
+                if len(observed) or was_valid:
+                    for _ in range(trailing):
+                        self.old_weight *= 1 - self.alpha
+        return out
+
+    def snapshot(self):
+        return {'period': self.period, 'count': self.count,
+                'seed_values': [_nan_to_none(v) for v in self.seed_values],
+                'value': _nan_to_none(self.value), 'old_weight': self.old_weight}
+
+    @classmethod
+    def from_snapshot(cls, state):
+        ema = cls(state['period'])
+        ema.count = state['count']
+        ema.seed_values = [_none_to_nan(v) for v in state['seed_values']]
+        ema.value = _none_to_nan(state['value'])
+        ema.old_weight = state['old_weight']
+        return ema
+
+class MACDIndicator:
+    """
+    MA short/long, MACD line, Signal Line and Histogram for one method, same as calc_macd_histogram.
+    """
+    def __init__(self, method='EMA', short_period=12, long_period=26, signal_period=9):
+        self.method = method.upper()
+        if self.method not in ['EMA', 'SMA']:
+            raise ValueError(f"Unsupported method: {method}. Use 'EMA' or 'SMA'.")
+        ma_class = SeededEMA if self.method == 'EMA' else RollingSMA
+        self.short_period = short_period
+        self.long_period = long_period
+        self.short_ma = ma_class(short_period)
+        self.long_ma = ma_class(long_period)
+        self.signal = SeededEMA(signal_period)
+
+    def update(self, price):
+        """
+        Adds a new price and returns the indicator values under the same column names as the batch functions.
+        """
+        short_val = self.short_ma.update(price)
+        long_val = self.long_ma.update(price)
+        macd = short_val - long_val
+        macd9 = self.signal.update(macd)
+        return {
+            f'{self.method}{self.short_period}': short_val,
+            f'{self.method}{self.long_period}': long_val,
+            f'MACD_{self.method}': macd,
+            f'MACD9_{self.method}': macd9,
+            f'Histogram_{self.method}': macd - macd9,
+        }
+
+    def update_array(self, prices):
+        """
+        Adds a block of prices and returns a dictionary of indicator arrays, same keys as update.
+        """
+        short_val = self.short_ma.update_array(prices)
+        long_val = self.long_ma.update_array(prices)
+        macd = short_val - long_val
+        macd9 = self.signal.update_array(macd)
+        return {
+            f'{self.method}{self.short_period}': short_val,
+            f'{self.method}{self.long_period}': long_val,
+            f'MACD_{self.method}': macd,
+            f'MACD9_{self.method}': macd9,
+            f'Histogram_{self.method}': macd - macd9,
+        }
+
+    def snapshot(self):
+        return {'method': self.method, 'short_period': self.short_period, 'long_period': self.long_period,
+                'short_ma': self.short_ma.snapshot(), 'long_ma': self.long_ma.snapshot(),
+                'signal': self.signal.snapshot()}
+
+    @classmethod
+    def from_snapshot(cls, state):
+        macd = cls(state['method'], state['short_period'], state['long_period'], state['signal']['period'])
+        ma_class = SeededEMA if macd.method == 'EMA' else RollingSMA
+        macd.short_ma = ma_class.from_snapshot(state['short_ma'])
+        macd.long_ma = ma_class.from_snapshot(state['long_ma'])
+        macd.signal = SeededEMA.from_snapshot(state['signal'])
+        return macd
+
+class TradeSignal:
+    """
+    BUY/SELL rules of identify_trades applied one bar at a time.
+    A BUY happens when the histogram crosses above 0, and a SELL when it crosses below 0
+    while price * 0.99875 is above the last buy price.
+    """
+    def __init__(self):
+        self.prev_hist = NAN
+        self.action = 'BUY'
+        self.last_buy_price = None
+        self.trade_id = 0
+
+    def update(self, price, hist):
+        """
+        Checks the new histogram value for a crossover.
+        :return: Dictionary with trade_action, trade_price, entry_price and trade_id, or None if no trade
+        """
+        prev = self.prev_hist
+        self.prev_hist = hist
+        if math.isnan(prev) or math.isnan(hist):
+            return None
+
+        if self.action == 'BUY' and prev < 0 and hist > 0:
+            self.last_buy_price = price
+            self.action = 'SELL'
+            return {'trade_action': 'BUY', 'trade_price': price, 'entry_price': price, 'trade_id': self.trade_id}
+
+        if self.action == 'SELL' and prev > 0 and hist < 0 and (price * 0.99875) > self.last_buy_price:
+            trade = {'trade_action': 'SELL', 'trade_price': price, 'entry_price': self.last_buy_price,
+                     'trade_id': self.trade_id}
+            self.action = 'BUY'
+            self.trade_id += 1
+            return trade
+        return None
+
+    def update_array(self, prices, hist):
+        """
+        Checks a block of bars for crossovers with the identify_trades engine, carrying the state.
+        :return: Tuple of lists (rows, actions, entry_prices, trade_ids), rows are positions within the block
+        """
+        state = {'prev_hist': self.prev_hist, 'action': self.action, 'last_buy_price': self.last_buy_price,
+                 'trade_id': self.trade_id}
+        events = find_trade_events(np.asarray(hist, dtype=float), np.asarray(prices, dtype=float), state,
+                                   close_position=False)
+        self.prev_hist = state['prev_hist']
+        self.action = state['action']
+        self.last_buy_price = state['last_buy_price']
+        self.trade_id = state['trade_id']
+        return events
+
+    def close_position(self, price):
+        """
+        Sells an open position at the given price, like identify_trades does on the last row.
+        The state is left unchanged, so updates can continue afterwards.
+        :return: SELL trade dictionary, or None if there is no open position
+        """
+        if self.action != 'SELL' or self.last_buy_price is None:
+            return None
+        return {'trade_action': 'SELL', 'trade_price': price, 'entry_price': self.last_buy_price,
+                'trade_id': self.trade_id}
+
+    def snapshot(self):
+        return {'prev_hist': _nan_to_none(self.prev_hist), 'action': self.action,
+                'last_buy_price': self.last_buy_price, 'trade_id': self.trade_id}
+
+    @classmethod
+    def from_snapshot(cls, state):
+        signal = cls()
+        signal.prev_hist = _none_to_nan(state['prev_hist'])
+        signal.action = state['action']
+        signal.last_buy_price = state['last_buy_price']
+        signal.trade_id = state['trade_id']
+        return signal
+
+class IncrementalStrategy:
+    """
+    MACD indicators and trade signals for a live price stream.
+    Example:
+        strategy = IncrementalStrategy('EMA')
+        row = strategy.update(431.2)    # {'price': 431.2, 'EMA12': ..., 'Histogram_EMA': ..., 'trade_action': None, ...}
+        state = strategy.snapshot()     # save, then later IncrementalStrategy.from_snapshot(state)
+    """
+    def __init__(self, method='EMA', short_period=12, long_period=26, signal_period=9):
+        self.macd = MACDIndicator(method, short_period, long_period, signal_period)
+        self.signal = TradeSignal()
+        self.last_price = None
+
+    def update(self, price):
+        """
+        Adds a new bar.
+        :return: Dictionary with the price, indicator values and trade annotation columns for this bar
+        """
+        price = float(price)
+        row = {'price': price}
+        row.update(self.macd.update(price))
+        trade = self.signal.update(price, row[f'Histogram_{self.macd.method}'])
+        row.update(trade or {'trade_action': None, 'trade_price': None, 'entry_price': None, 'trade_id': None})
+        self.last_price = price
+        return row
+
+    def update_many(self, prices):
+        """
+        Adds a small batch of bars in order.
+        :return: List of row dictionaries, one per bar
+        """
+        return [self.update(price) for price in prices]
+
+    def update_array(self, prices):
+        """
+        Adds a block of bars with the vectorized paths.
+        :return: Dictionary of column arrays: price, indicator values and the trade annotation columns
+                 (object arrays with None where there is no trade, like identify_trades)
+        """
+        prices = np.asarray(prices, dtype=float)
+        columns = {'price': prices}
+        columns.update(self.macd.update_array(prices))
+        rows, actions, entry_prices, trade_ids = self.signal.update_array(prices, columns[f'Histogram_{self.macd.method}'])
+
+        for col in ['trade_action', 'trade_price', 'entry_price', 'trade_id']:
+            columns[col] = np.full(len(prices), None, dtype=object)
+        columns['trade_action'][rows] = actions
+        columns['trade_price'][rows] = prices[rows]
+        columns['entry_price'][rows] = entry_prices
+        columns['trade_id'][rows] = trade_ids
+
+        if len(prices):
+            self.last_price = float(prices[-1])
+        return columns
+
+    def close_position(self):
+        """
+        Returns the forced SELL at the last price if a position is open (see TradeSignal.close_position).
+        """
+        if self.last_price is None:
+            return None
+        return self.signal.close_position(self.last_price)
+
+    def snapshot(self):
+        """
+        Returns the full state as plain Python values (JSON-serialisable, NaN stored as None).
+        """
+        return {'macd': self.macd.snapshot(), 'signal': self.signal.snapshot(), 'last_price': self.last_price}
+
+    @classmethod
+    def from_snapshot(cls, state):
+        strategy = cls.__new__(cls)
+        strategy.macd = MACDIndicator.from_snapshot(state['macd'])
+        strategy.signal = TradeSignal.from_snapshot(state['signal'])
+        strategy.last_price = state['last_price']
+        return strategy
@@ -0,0 +1,103 @@
+# Functions for computing only the indicator columns that are needed
+#
+# 1. Parsing requested column names (SMA12, EMA26, MACD_EMA, MACD9_SMA, Histogram_EMA, ...) into steps
+# 2. Building the dependency graph so inputs shared by several outputs are computed once
+# 3. Evaluating the steps on arrays, releasing intermediates as soon as no later step needs them
+# 4. Writing only the requested columns to the DataFrame
+#
+# Example: compute_indicators(df, ['Histogram_EMA', 'Histogram_SMA']) adds just those two columns,
+# while the EMA/SMA 12 and 26, MACD and MACD9 arrays only live as long as they are needed.
+
+import re
+from collections import Counter
+
+from indicators import sma_array, ema_array
+
+NAME_PATTERN = re.compile(r'^(?:(SMA|EMA)(\d+)|(MACD|MACD9|Histogram)_(SMA|EMA))$')
+PRICE_NODE = '__price__'
+
+def _dependencies(name, short_period, long_period):
+    """
+    Returns the list of inputs needed to compute one indicator column.
+    """
+    match = NAME_PATTERN.match(name)
+    if match is None:
+        raise ValueError(f"Unknown indicator column: {name}")
+    ma_method, _, kind, method = match.groups()
+
+    if ma_method is not None:
+        return [PRICE_NODE]
+    if kind == 'MACD':
+        return [f'{method}{short_period}', f'{method}{long_period}']
+    if kind == 'MACD9':
+        return [f'MACD_{method}']
+    return [f'MACD_{method}', f'MACD9_{method}']
+
+def build_indicator_graph(outputs, short_period=12, long_period=26):
+    """
+    Builds the steps needed for the requested columns, each step appearing once and after its inputs.
+    :param outputs: List of requested column names
+    :return: List of (column name, list of input names) in evaluation order
+    """
+    steps = []
+    seen = set()
+
+    def visit(name):
+        if name in seen or name == PRICE_NODE:
+            return
+        deps = _dependencies(name, short_period, long_period)
+        for dep in deps:
+            visit(dep)
+        seen.add(name)
+        steps.append((name, deps))
+
+    for name in outputs:
+        visit(name)
+    return steps
+
+def _evaluate(name, inputs, signal_period):
+    """
+    Computes one step from its input arrays.
+    """
+    if name.startswith('SMA'):
+        return sma_array(inputs[0], int(name[3:]))
+    if name.startswith('EMA'):
+        return ema_array(inputs[0], int(name[3:]))
+    if name.startswith('MACD9_'):
+        return ema_array(inputs[0], signal_period)
+    # MACD = MA short - MA long, Histogram = MACD - MACD9
+    return inputs[0] - inputs[1]
+
+def compute_indicators(df, outputs, short_period=12, long_period=26, signal_period=9, price_col='price'):
+    """
+    Computes the requested indicator columns, sharing common inputs and skipping everything else.
+    Gives the same values as calling calc_sma/calc_ema, calc_macd, calc_macd9 and compute_histogram by hand.
+    :param df: Pandas DataFrame with a price column
+    :param outputs: List of column names to add, e.g. ['Histogram_EMA', 'Histogram_SMA']
+    :param short_period: n of the short MA used by MACD, default value 12
+    :param long_period: n of the long MA used by MACD, default value 26
+    :param signal_period: n of the Signal Line EMA, default value 9
+    :param price_col: The name of the column containing the prices in DataFrame df
+    :return: DataFrame with only the requested columns added
+    """
+    steps = build_indicator_graph(outputs, short_period, long_period)
+    requested = set(outputs)
+
+    # Number of later steps still reading each value
+    readers = Counter(dep for _, deps in steps for dep in deps)
+    values = {PRICE_NODE: df[price_col].to_numpy(dtype=float)}
+
+    for name, deps in steps:
+        values[name] = _evaluate(name, [values[dep] for dep in deps], signal_period)
+
+        # Release intermediates that nothing else will read
+        for dep in deps:
+            readers[dep] -= 1
+            if readers[dep] == 0:
+                del values[dep]
+
+        if name in requested:
+            df[name] = values[name]
+            if readers[name] == 0:
+                del values[name]
+    return df
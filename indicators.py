@@ -5,46 +5,134 @@
 # 3. MACD Line value
 # 4. Signal Line values, which is the EMA of the MACD Line where n=9
 # 5. MACD Histogram, which is the difference between the MACD Line and Signal Line
+# 6. Full chain from prices to MACD Histogram for one method (SMA or EMA), on a DataFrame or a plain array
+# 7. The same calculations on a dates x symbols matrix, every symbol in one vectorized call
+#
+# sma_array and ema_array do the SMA/EMA calculation on plain arrays and are shared by the functions above.
+# Given a 2-D array they hand over to sma_matrix and ema_matrix.
+# Until pandas is imported, arrays of up to KERNEL_MAX_ROWS values use the NumPy-only kernels (same values
+# to the last bit), so macd_histogram_array and the trade state machine run without loading pandas.
+
+import numpy as np
+
+from kernels import rolling_mean, ewm_mean
+from lazy_imports import lazy_module, is_loaded
+
+pd = lazy_module('pandas')
+
+KERNEL_MAX_ROWS = 200_000  # Longer series are faster with the compiled pandas routines, even counting the import
 
-import pandas as pd
+def _use_kernels(n_rows):
+    return n_rows <= KERNEL_MAX_ROWS and not is_loaded('pandas')
 
-def calc_sma(df, period, price_col='price'):
+def calc_sma(df, period, price_col='price', dtype=np.float64):
     """
     Computes the SMA for a given period
     :param df: Pandas DataFrame with columns 'date' and 'price'
     :param period: Number of days, n, for SMA calculation
+    :param dtype: np.float64 (default) or np.float32 for the new column
     :return: DataFrame with new SMA column added
     """
-    df[f'SMA{period}'] = df[price_col].rolling(window=period).mean()
+    df[f'SMA{period}'] = sma_array(df[price_col].to_numpy(), period, dtype=dtype)
     return df
 
-def calc_ema(df, period, price_col='price', output_col=None):
+def _prepare_output(values, out, inplace, dtype):
+    """
+    Picks the buffer a kernel writes into: the input itself (inplace), a given buffer, or a new one.
+    """
+    if inplace:
+        return values
+    if out is None:
+        return np.empty(len(values), dtype=dtype)
+    if len(out) != len(values):
+        raise ValueError("Output buffer must have the same length as the input values.")
+    return out
+
+def _mean_skipna(values):
+    """
+    Mean ignoring NaN, computed the same way as pandas Series.mean so results stay identical.
+    """
+    mask = np.isnan(values)
+    count = len(values) - mask.sum()
+    if count == 0:
+        return np.nan
+    return np.where(mask, 0, values).sum() / count
+
+def sma_array(values, period, out=None, dtype=np.float64, inplace=False):
+    """
+    Computes the SMA for a given period on an array of values
+    :param values: 1-D array of prices (or any values), or a 2-D dates x symbols matrix (see sma_matrix)
+    :param period: Number of days, n, for SMA calculation
+    :param out: Optional preallocated array of the same length to write the result into
+    :param dtype: np.float64 (default) or np.float32
+    :param inplace: Overwrite values with the result (values must already be a contiguous array of dtype)
+    :return: Float array of SMA values, NaN for the first (period - 1) values
+    """
+    values = np.ascontiguousarray(values, dtype=dtype)
+    if values.ndim == 2:
+        return sma_matrix(values, period, values if inplace else out, dtype)
+    if _use_kernels(len(values)):
+        sma = rolling_mean(values, period)
+    else:
+        sma = pd.Series(values, copy=False).rolling(window=period).mean().to_numpy()
+    out = _prepare_output(values, out, inplace, dtype)
+    out[:] = sma
+    return out
+
+def ema_array(values, period, out=None, dtype=np.float64, inplace=False):
+    """
+    Computes the EMA for a given period on an array of values, seeded with the SMA of the first n values
+    Works directly on a contiguous float array and lays the seeded series out in the output buffer,
+    so no seed Series, concatenation or Python list is built.
+    :param values: 1-D array of prices (or MACD values for the Signal Line), or a 2-D dates x symbols matrix
+                   (see ema_matrix, each column then starts at its first valid value)
+    :param period: Number of days, n, for EMA calculation
+    :param out: Optional preallocated array of the same length to write the result into
+    :param dtype: np.float64 (default) or np.float32
+    :param inplace: Overwrite values with the result (values must already be a contiguous array of dtype)
+    :return: Float array of EMA values, NaN for the first (period - 1) values
+    """
+    values = np.ascontiguousarray(values, dtype=dtype)
+    if values.ndim == 2:
+        return ema_matrix(values, period, out=values if inplace else out, dtype=dtype)
+
+    # Calculate first SMA value before the output (which may be values itself) is written
+    sma_val = _mean_skipna(values[:period]) if len(values) >= period else np.nan
+    out = _prepare_output(values, out, inplace, dtype)
+    if len(values) < period:
+        out[:] = np.nan
+        return out
+
+    # Seeded series in the buffer: SMA value at (period - 1), followed by the rest of the values
+    if out is not values:
+        out[period:] = values[period:]
+    out[period - 1] = sma_val
+    out[:period - 1] = np.nan
+
+    # Calculate EMA with the first value as the SMA, written back over the seeded series
+    seeded = out[period - 1:]
+    if _use_kernels(len(seeded)):
+        seeded[:] = ewm_mean(seeded, period)
+    else:
+        seeded[:] = pd.Series(seeded, copy=False).ewm(span=period, adjust=False).mean().to_numpy()
+    return out
+
+def calc_ema(df, period, price_col='price', output_col=None, dtype=np.float64):
     """
     Computes the EMA for a given period
     :param df: Pandas DataFrame with columns 'date' and 'price'
     :param period: Number of days, n, for SMA calculation
     :param price_col: The name of the column containing the prices in DataFrame df
     :param output_col: The name of the column that will store the EMA values from this function
+    :param dtype: np.float64 (default) or np.float32 for the new column
     :return: DataFrame with new EMA column added
     """
     # Default name of output column
     if output_col is None:
         output_col = f'EMA{period}'
 
-    # Calculate first SMA value
-    sma_val = df[price_col].iloc[:period].mean()
-    # Create a series containing sma_val as the first value, but with index of (period-1) which will be a date
-    ema_seed = pd.Series([sma_val], index=[df.index[period - 1]])
-    # Create a series containing the rest of the prices after the SMA value with index (period) onwards
-    remaining_prices = df[price_col].iloc[period:]
-
-    # Create series combining sma_val with the rest of the prices. The indices will be appended in order
-    seeded_series = pd.concat([ema_seed, remaining_prices])
-    # Calculate EMA with the first value as the SMA, storing it in a series with indices of dates in order
-    ema_series = seeded_series.ewm(span=period, adjust=False).mean()
-
     # Attributing the whole series to new column in the DataFrame
-    df[output_col] = [None] * (period - 1) + list(ema_series)
+    df[output_col] = ema_array(df[price_col].to_numpy(), period, dtype=dtype)
     return df
 
 def calc_macd(df, short_period=12, long_period=26, method='EMA'):
@@ -67,28 +155,19 @@ def calc_macd(df, short_period=12, long_period=26, method='EMA'):
         print(f"Error, {method}{short_key} or {method}{long_key} has not yet been calculated")
     return df
 
-def calc_macd9(df, period=9, macd_key=None):
+def calc_macd9(df, period=9, macd_key=None, dtype=np.float64):
     """
     Computes the 9-day EMA of the MACD line (MACD9 / Signal Line).
     :param df: Pandas DataFrame with columns 'date' and MACD_EMA or SMA
     :param macd_key: Name of MACD column (MACD_EMA or MACD_SMA)
+    :param dtype: np.float64 (default) or np.float32 for the new column
     """
     try:
         macd9_key = macd_key.replace("MACD", "MACD9")
     except:
         print('Column selected is not a MACD column.')
 
-    macd_sma_val = df[macd_key].iloc[:period].mean()
-
-    macd9_seed = pd.Series([macd_sma_val], index=[df.index[period-1]])
-
-    remaining_val = df[macd_key].iloc[period:]
-
-
-    seeded_series = pd.concat([macd9_seed, remaining_val])
-    macd9_series = seeded_series.ewm(span=period, adjust=False).mean()
-
-    df[macd9_key] = [None] * (period - 1) + list(macd9_series)
+    df[macd9_key] = ema_array(df[macd_key].to_numpy(), period, dtype=dtype)
     return df
 
 def compute_histogram(df, macd_key):
@@ -102,3 +181,213 @@ def compute_histogram(df, macd_key):
     df[hist_key] = df[macd_key] - df[macd9_key]
     return df
 
+
+def calc_macd_histogram(df, method='EMA', short_period=12, long_period=26, signal_period=9, price_col='price'):
+    """
+    Runs the whole indicator chain for one method: MA short/long -> MACD -> MACD9 -> Histogram
+    :param df: Pandas DataFrame with a price column
+    :param method: 'EMA' or 'SMA'
+    :param short_period: n of the short MA, default value 12
+    :param long_period: n of the long MA, default value 26
+    :param signal_period: n of the Signal Line EMA, default value 9
+    :param price_col: The name of the column containing the prices in DataFrame df
+    :return: DataFrame with MA, MACD, MACD9 and Histogram columns added
+    """
+    method = method.upper()
+    if method == 'EMA':
+        ma_func = calc_ema
+    elif method == 'SMA':
+        ma_func = calc_sma
+    else:
+        raise ValueError(f"Unsupported method: {method}. Use 'EMA' or 'SMA'.")
+
+    df = ma_func(df, short_period, price_col=price_col)
+    df = ma_func(df, long_period, price_col=price_col)
+    df = calc_macd(df, short_period, long_period, method=method)
+    df = calc_macd9(df, period=signal_period, macd_key=f'MACD_{method}')
+    df = compute_histogram(df, macd_key=f'MACD_{method}')
+    return df
+
+def macd_histogram_array(values, method='EMA', short_period=12, long_period=26, signal_period=9, dtype=np.float64):
+    """
+    Runs the whole indicator chain for one method on a 1-D array of prices, without a DataFrame.
+    Gives the same values as the columns of calc_macd_histogram.
+    :param values: 1-D array of prices
+    :param method: 'EMA' or 'SMA'
+    :return: Dictionary of arrays named like the calc_macd_histogram columns,
+             e.g. 'EMA12', 'EMA26', 'MACD_EMA', 'MACD9_EMA', 'Histogram_EMA'
+    """
+    method = method.upper()
+    if method == 'EMA':
+        ma_func = ema_array
+    elif method == 'SMA':
+        ma_func = sma_array
+    else:
+        raise ValueError(f"Unsupported method: {method}. Use 'EMA' or 'SMA'.")
+
+    short = ma_func(values, short_period, dtype=dtype)
+    long = ma_func(values, long_period, dtype=dtype)
+    macd = short - long
+    macd9 = ema_array(macd, signal_period, dtype=dtype)
+    return {
+        f'{method}{short_period}': short,
+        f'{method}{long_period}': long,
+        f'MACD_{method}': macd,
+        f'MACD9_{method}': macd9,
+        f'Histogram_{method}': macd - macd9,
+    }
+
+def first_valid_rows(values):
+    """
+    Row of the first non-NaN value in each column of a 2-D array.
+    :return: Integer array with one row number per column (the number of rows for columns with no value)
+    """
+    valid = ~np.isnan(values)
+    rows = valid.argmax(axis=0)
+    rows[~valid.any(axis=0)] = len(values)
+    return rows
+
+def _matrix_output(values, out, dtype):
+    if out is None:
+        return np.empty(values.shape, dtype=dtype)
+    if out.shape != values.shape:
+        raise ValueError("Output buffer must have the same shape as the input values.")
+    return out
+
+def sma_matrix(values, period, out=None, dtype=np.float64):
+    """
+    Computes the SMA for a given period on every column of a dates x symbols matrix in one call.
+    Each column gives the same values as sma_array on that column (NaN until period values are available).
+    :param values: 2-D array with dates on the rows and one column per symbol
+    :param period: Number of days, n, for SMA calculation
+    :param out: Optional preallocated array of the same shape to write the result into
+    :param dtype: np.float64 (default) or np.float32
+    :return: 2-D float array of SMA values
+    """
+    values = np.asarray(values, dtype=dtype)
+    sma = pd.DataFrame(values, copy=False).rolling(window=period).mean().to_numpy()
+    out = _matrix_output(values, out, dtype)
+    out[:] = sma
+    return out
+
+def _align_rows(values, origin):
+    """
+    Moves each column up so that its origin row becomes row 0, filling the end with NaN.
+    :return: (aligned array, row index of each aligned value in values, mask of aligned values inside values)
+    """
+    n_rows, n_cols = values.shape
+    rows = np.arange(n_rows)[:, None] + origin[None, :]
+    inside = rows < n_rows
+    cols = np.broadcast_to(np.arange(n_cols), rows.shape)
+    aligned = np.full(values.shape, np.nan, dtype=values.dtype)
+    aligned[inside] = values[rows[inside], cols[inside]]
+    return aligned, rows, inside
+
+def ema_matrix(values, period, origin=None, out=None, dtype=np.float64):
+    """
+    Computes the EMA for a given period on every column of a dates x symbols matrix in one call.
+    Each column is seeded with the SMA of its first n values from its own origin row, so symbols that start
+    on different dates give the same values as ema_array on the column from that date (NaN before it).
+    :param values: 2-D array with dates on the rows and one column per symbol
+    :param period: Number of days, n, for EMA calculation, or one period per column
+                   (columns sharing a period are computed together)
+    :param origin: Row where each column's series starts, the first non-NaN row of each column by default
+                   (for the Signal Line, pass the origin of the prices: the MACD starts with NaN like ema_array sees it)
+    :param out: Optional preallocated array of the same shape to write the result into
+    :param dtype: np.float64 (default) or np.float32
+    :return: 2-D float array of EMA values
+    """
+    values = np.asarray(values, dtype=dtype)
+    n_rows, n_cols = values.shape
+    origin = first_valid_rows(values) if origin is None else np.broadcast_to(np.asarray(origin, dtype=np.int64), n_cols)
+
+    if np.ndim(period):
+        periods = np.asarray(period, dtype=np.int64)
+        if periods.shape != (n_cols,):
+            raise ValueError(f"Expected one period per column ({n_cols}), got {periods.shape[0]}.")
+        out = _matrix_output(values, out, dtype)
+        for group_period in np.unique(periods).tolist():
+            cols = np.flatnonzero(periods == group_period)
+            out[:, cols] = ema_matrix(values[:, cols], group_period, origin[cols], dtype=dtype)
+        return out
+
+    # Every column starting at row 0 (the usual case) needs no realignment
+    shifted = bool(origin.any())
+    if shifted:
+        aligned, rows, inside = _align_rows(values, origin)
+    else:
+        aligned = values
+
+    result = np.full(values.shape, np.nan, dtype=dtype)
+    if n_rows >= period:
+        # Seed row: mean of the first n values of each column ignoring NaN, summed along contiguous rows
+        # of the transposed head so the rounding is the same as _mean_skipna on one column
+        head = np.ascontiguousarray(aligned[:period].T)
+        mask = np.isnan(head)
+        counts = period - mask.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            seed = np.where(counts > 0, np.where(mask, 0, head).sum(axis=1) / counts, np.nan)
+        result[period - 1] = seed
+        result[period:] = aligned[period:]
+
+        seeded = result[period - 1:]
+        if _use_kernels(len(seeded)):
+            for col in range(n_cols):
+                seeded[:, col] = ewm_mean(seeded[:, col], period)
+        else:
+            seeded[:] = pd.DataFrame(seeded, copy=False).ewm(span=period, adjust=False).mean().to_numpy()
+
+    # Columns with fewer than n values from their origin have no EMA, as with ema_array
+    result[:, n_rows - origin < period] = np.nan
+
+    out = _matrix_output(values, out, dtype)
+    if shifted:
+        out[:] = np.nan
+        cols = np.broadcast_to(np.arange(n_cols), rows.shape)
+        out[rows[inside], cols[inside]] = result[inside]
+    else:
+        out[:] = result
+    return out
+
+def macd_matrix(values, method='EMA', short_period=12, long_period=26, signal_period=9, dtype=np.float64):
+    """
+    Runs the whole indicator chain on every column of a dates x symbols matrix: MA short/long -> MACD -> MACD9 -> Histogram
+    Each column gives the same values as calc_macd_histogram on that symbol's prices from its first valid date.
+    :param values: 2-D array of prices with dates on the rows and one column per symbol
+    :param method: 'EMA' or 'SMA'
+    :return: Dictionary of 2-D arrays named like the calc_macd_histogram columns,
+             e.g. 'EMA12', 'EMA26', 'MACD_EMA', 'MACD9_EMA', 'Histogram_EMA'
+    """
+    method = method.upper()
+    values = np.asarray(values, dtype=dtype)
+    origin = first_valid_rows(values)
+    if method == 'EMA':
+        short = ema_matrix(values, short_period, origin, dtype=dtype)
+        long = ema_matrix(values, long_period, origin, dtype=dtype)
+    elif method == 'SMA':
+        short = sma_matrix(values, short_period, dtype=dtype)
+        long = sma_matrix(values, long_period, dtype=dtype)
+    else:
+        raise ValueError(f"Unsupported method: {method}. Use 'EMA' or 'SMA'.")
+
+    macd = short - long
+    macd9 = ema_matrix(macd, signal_period, origin, dtype=dtype)
+    return {
+        f'{method}{short_period}': short,
+        f'{method}{long_period}': long,
+        f'MACD_{method}': macd,
+        f'MACD9_{method}': macd9,
+        f'Histogram_{method}': macd - macd9,
+    }
+
+def calc_macd_histogram_matrix(prices, method='EMA', short_period=12, long_period=26, signal_period=9,
+                               dtype=np.float64):
+    """
+    Runs the whole indicator chain for a wide panel of prices (one column per symbol) in one vectorized pass.
+    :param prices: DataFrame with a date index and one price column per symbol (NaN before a symbol starts)
+    :param method: 'EMA' or 'SMA'
+    :return: Dictionary of DataFrames shaped like prices, named like the calc_macd_histogram columns
+    """
+    values = prices.to_numpy(dtype=dtype)
+    return {name: pd.DataFrame(result, index=prices.index, columns=prices.columns)
+            for name, result in macd_matrix(values, method, short_period, long_period, signal_period, dtype).items()}
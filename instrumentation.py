@@ -0,0 +1,292 @@
+# Instrumentation of the pipeline steps
+#
+# 1. Registering hooks (any callable taking an event dictionary) globally or for a single run
+# 2. Timing a step with the stage context manager: wall time, CPU time, rows processed and memory delta
+# 3. Capturing a sampling profile of one run with SamplingProfiler
+# 4. Collecting events in memory (EventRecorder) or appending them to a JSON lines file (JsonLinesHook)
+# 5. Aggregating events from many runs into one row per step
+#
+# When no hook is registered, stage returns a shared no-op context, so instrumented code runs at full speed.
+
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from lazy_imports import lazy_module
+
+pd = lazy_module('pandas')
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows without psutil: memory is not measured
+    resource = None
+
+_HOOKS = []
+
+def register_hook(hook):
+    """
+    Registers a hook called with every event emitted by the pipeline.
+    :param hook: Callable taking one event dictionary
+    :return: The hook, so it can be used as a decorator
+    """
+    _HOOKS.append(hook)
+    return hook
+
+def unregister_hook(hook):
+    """
+    Removes a hook registered with register_hook (does nothing if it is not registered).
+    """
+    if hook in _HOOKS:
+        _HOOKS.remove(hook)
+
+def new_run_id():
+    """
+    Short random identifier shared by all events of one run.
+    """
+    return uuid.uuid4().hex[:12]
+
+def has_hooks(hooks=None):
+    """
+    True if any hook would receive events (registered ones or the given ones).
+    """
+    return bool(hooks) or bool(_HOOKS)
+
+def _active_hooks(hooks):
+    if not hooks:
+        return _HOOKS
+    return _HOOKS + list(hooks)
+
+def emit(event, hooks=None):
+    """
+    Sends an event to the registered hooks and the given ones.
+    A failing hook is reported but does not stop the pipeline.
+    """
+    for hook in _active_hooks(hooks):
+        try:
+            hook(event)
+        except Exception as e:
+            print(f"⚠️ Instrumentation hook failed: {type(e).__name__}: {e}")
+
+def memory_usage():
+    """
+    Memory used by the process in bytes: current RSS with psutil, otherwise peak RSS from the resource module.
+    Without psutil the stage memory delta is therefore the growth of the peak, not of the current usage.
+    :return: Number of bytes, or None if neither is available
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+    return None
+
+class _NullStage:
+    """
+    Stage used when no hook is active: does nothing.
+    """
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass  # Keeps the shared instance unchanged when a step sets .rows
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    """
+    Measures one step and emits a 'stage' event when it ends.
+    """
+    def __init__(self, name, rows, hooks, run_id, fields):
+        self.name = name
+        self.rows = rows
+        self.hooks = hooks
+        self.run_id = run_id
+        self.fields = fields
+
+    def __enter__(self):
+        self.started_at = time.time()
+        self.memory_start = memory_usage()
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall_time = time.perf_counter() - self.wall_start
+        cpu_time = time.process_time() - self.cpu_start
+        memory_end = memory_usage()
+        event = {
+            'event': 'stage',
+            'stage': self.name,
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'wall_time': wall_time,
+            'cpu_time': cpu_time,
+            'rows': self.rows,
+            'memory_delta': memory_end - self.memory_start if memory_end is not None else None,
+            'error': f"{exc_type.__name__}: {exc}" if exc_type is not None else None,
+        }
+        event.update(self.fields)
+        emit(event, self.hooks)
+        return False
+
+def stage(name, rows=None, hooks=None, run_id=None, **fields):
+    """
+    Context manager measuring one step of the pipeline.
+    The rows can also be set inside the block, e.g. `with stage('find_trades') as s: ...; s.rows = len(df)`.
+    :param name: Name of the step, e.g. 'identify_trades'
+    :param rows: Number of rows processed
+    :param hooks: Extra hooks for this step only, on top of the registered ones
+    :param run_id: Identifier shared by the steps of one run
+    :param fields: Extra key/values added to the event (e.g. strategy='EMA')
+    """
+    if not has_hooks(hooks):
+        return _NULL_STAGE
+    return _Stage(name, rows, hooks, run_id, fields)
+
+class SamplingProfiler:
+    """
+    Samples the call stack of one thread at a fixed interval from a background thread.
+    Cheap enough to leave on for a whole run, and works on code that cannot be changed.
+    :param interval: Seconds between samples
+    :param thread_id: Thread to sample, the thread that starts the profiler by default
+    """
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, n=10):
+        """
+        Functions seen most often at the top of the stack.
+        :return: List of (function location, number of samples)
+        """
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack[-1]] += count
+        return leaves.most_common(n)
+
+    def to_event(self, run_id=None):
+        """
+        Profile as a structured event, with stacks collapsed to 'outer;...;inner' strings (flame graph format).
+        """
+        return {
+            'event': 'profile',
+            'run_id': run_id,
+            'interval': self.interval,
+            'samples': self.samples,
+            'stacks': {';'.join(stack): count for stack, count in self.stacks.items()},
+        }
+
+class EventRecorder:
+    """
+    Hook keeping every event in memory.
+    """
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+    def to_frame(self, event_type='stage'):
+        """
+        Events of one type as a DataFrame, one row per event.
+        """
+        return pd.DataFrame([e for e in self.events if e.get('event') == event_type])
+
+class JsonLinesHook:
+    """
+    Hook appending each event as one JSON line to a file, so runs from many processes can be aggregated later.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event, default=str)
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line + '\n')
+
+def read_events(path):
+    """
+    Reads the events written by JsonLinesHook.
+    :return: List of event dictionaries
+    """
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def summarize_events(events):
+    """
+    Aggregates stage events (e.g. from thousands of runs) into one row per step.
+    :param events: List of event dictionaries, or a DataFrame of stage events
+    :return: DataFrame indexed by stage with count, total/mean/p50/p95 wall time, mean CPU time,
+             total rows, rows per second and mean memory delta
+    """
+    df = events if isinstance(events, pd.DataFrame) else pd.DataFrame(events)
+    if df.empty:
+        return pd.DataFrame()
+    if 'event' in df.columns:
+        df = df[df['event'] == 'stage']
+    grouped = df.groupby('stage', sort=False)
+    summary = pd.DataFrame({
+        'count': grouped.size(),
+        'wall_total': grouped['wall_time'].sum(),
+        'wall_mean': grouped['wall_time'].mean(),
+        'wall_p50': grouped['wall_time'].quantile(0.5),
+        'wall_p95': grouped['wall_time'].quantile(0.95),
+        'cpu_mean': grouped['cpu_time'].mean(),
+        'rows_total': grouped['rows'].sum(),
+        'memory_delta_mean': grouped['memory_delta'].mean(),
+    })
+    summary['rows_per_sec'] = summary['rows_total'] / summary['wall_total']
+    return summary
@@ -0,0 +1,184 @@
+# NumPy-only kernels for the indicator math and the trade state machine
+#
+# 1. Rolling mean over a fixed window, the same arithmetic as pandas Series.rolling(window).mean()
+#    (running sums with Kahan compensation), so results are identical to the last bit; the running state can be
+#    carried from one block of values to the next
+# 2. Exponential weighted mean with adjust=False, the same arithmetic as pandas Series.ewm(span, adjust=False).mean()
+# 3. The BUY/SELL state machine of identify_trades on plain arrays
+#
+# Nothing here imports pandas. Short-lived workers and command line runs that only need these calculations
+# skip the pandas import entirely (see lazy_imports). The loops run in Python, so for very long series the
+# compiled pandas routines are faster once pandas is loaded (indicators picks between the two).
+
+import math
+
+import numpy as np
+
+def rolling_mean_state():
+    """
+    Empty state of rolling_mean, for running it over a stream of blocks.
+    """
+    return {'window': [], 'nobs': 0, 'neg_ct': 0, 'same_count': 0, 'sum': 0.0, 'comp_add': 0.0,
+            'comp_remove': 0.0, 'prev_value': None}
+
+def rolling_mean(values, period, state=None):
+    """
+    Mean of each window of period values, NaN until a window is full or when it contains NaN.
+    The sum skips NaN values (counting them apart), so a window recovers once a NaN has left it.
+    :param values: 1-D array of values
+    :param period: Window length
+    :param state: Optional state from rolling_mean_state, carried over from a previous block of values and
+                  updated in place, so blocks give the same results as one long series
+    :return: float64 array
+    """
+    values = np.asarray(values, dtype=np.float64).tolist()
+    if state is None:
+        state = rolling_mean_state()
+    n_carried = len(state['window'])
+    combined = state['window'] + values
+    n = len(values)
+    out = [math.nan] * n
+    nobs, neg_ct, same_count = state['nobs'], state['neg_ct'], state['same_count']
+    sum_x, comp_add, comp_remove = state['sum'], state['comp_add'], state['comp_remove']
+    prev_value = state['prev_value']
+    if prev_value is None:
+        prev_value = values[0] if n else math.nan
+
+    for i in range(n_carried, n_carried + n):
+        # Value leaving the window (the carried window holds the last values that entered it)
+        if i >= period:
+            val = combined[i - period]
+            if val == val:
+                nobs -= 1
+                y = -val - comp_remove
+                t = sum_x + y
+                comp_remove = t - sum_x - y
+                sum_x = t
+                if math.copysign(1.0, val) < 0:
+                    neg_ct -= 1
+
+        # Value entering the window
+        val = combined[i]
+        if val == val:
+            nobs += 1
+            y = val - comp_add
+            t = sum_x + y
+            comp_add = t - sum_x - y
+            sum_x = t
+            if math.copysign(1.0, val) < 0:
+                neg_ct += 1
+            same_count = same_count + 1 if val == prev_value else 1
+            prev_value = val
+
+        if nobs >= period:
+            result = sum_x / nobs
+            if same_count >= nobs:
+                result = prev_value  # Constant window, avoids rounding noise
+            elif neg_ct == 0 and result < 0:
+                result = 0.0
+            elif neg_ct == nobs and result > 0:
+                result = 0.0
+            out[i - n_carried] = result
+
+    state.update(window=combined[-period:], nobs=nobs, neg_ct=neg_ct, same_count=same_count, sum=sum_x,
+                 comp_add=comp_add, comp_remove=comp_remove, prev_value=prev_value)
+    return np.array(out, dtype=np.float64)
+
+def ewm_mean(values, span):
+    """
+    Exponential weighted mean with alpha = 2 / (span + 1), starting at the first non-NaN value (adjust=False).
+    Missing values keep the previous mean and give the next value more weight, as in pandas.
+    :param values: 1-D array of values
+    :param span: Span of the EMA, n
+    :return: float64 array
+    """
+    values = np.asarray(values, dtype=np.float64).tolist()
+    n = len(values)
+    out = [math.nan] * n
+    if not n:
+        return np.array(out, dtype=np.float64)
+
+    alpha = 1. / (1. + (span - 1) / 2)
+    old_wt_factor = 1. - alpha
+    weighted = values[0]
+    old_wt = 1.
+    out[0] = weighted
+
+    for i in range(1, n):
+        cur = values[i]
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if cur == cur:
+                if weighted != cur:
+                    weighted = old_wt * weighted + alpha * cur
+                    weighted /= (old_wt + alpha)
+                old_wt = 1.
+        elif cur == cur:
+            weighted = cur
+        out[i] = weighted
+    return np.array(out, dtype=np.float64)
+
+def find_trade_events(hist, prices, state=None, close_position=True):
+    """
+    Resolves the BUY/SELL state machine of identify_trades on NumPy arrays.
+    Histogram zero-crossings are found in bulk, then a single pass over the crossings applies
+    the sell guard (price * 0.99875 > last buy price) and the forced SELL on the last row.
+    :param hist: 1-D float array of MACD histogram values (NaN where missing)
+    :param prices: 1-D array of prices aligned with hist
+    :param state: Optional dictionary with 'prev_hist', 'action', 'last_buy_price' and 'trade_id' carried over
+                  from a previous block of rows. It is updated in place, so blocks can be processed one after another.
+    :param close_position: Force a SELL on the last row if a position is still open
+    :return: Tuple of lists (rows, actions, entry_prices, trade_ids) in row order
+    """
+    if state is None:
+        state = {'prev_hist': np.nan, 'action': 'BUY', 'last_buy_price': None, 'trade_id': 0}
+
+    # The first row is compared with the histogram value carried over from before this block
+    prev = np.concatenate(([state['prev_hist']], hist[:-1]))
+    curr = hist
+
+    # Comparisons against NaN are False, so rows with missing data never cross
+    ups = (prev < 0) & (curr > 0)
+    downs = (prev > 0) & (curr < 0)
+    crossings = np.flatnonzero(ups | downs)
+
+    is_up = ups[crossings].tolist()
+    crossing_prices = prices[crossings].tolist()
+    guard_prices = (prices[crossings] * 0.99875).tolist()
+
+    rows, actions, entry_prices, trade_ids = [], [], [], []
+    action = state['action']
+    last_buy_price = state['last_buy_price']
+    trade_id = state['trade_id']
+
+    for row, up, price, guard in zip(crossings.tolist(), is_up, crossing_prices, guard_prices):
+        if action == 'BUY' and up:
+            rows.append(row)
+            actions.append('BUY')
+            entry_prices.append(price)
+            trade_ids.append(trade_id)
+            last_buy_price = price
+            action = 'SELL'
+        elif action == 'SELL' and not up and guard > last_buy_price:
+            rows.append(row)
+            actions.append('SELL')
+            entry_prices.append(last_buy_price)
+            trade_ids.append(trade_id)
+            action = 'BUY'
+            trade_id += 1
+
+    if len(hist):
+        state['prev_hist'] = float(hist[-1])
+    state.update(action=action, last_buy_price=last_buy_price, trade_id=trade_id)
+
+    # Close the open position on the last row, replacing a BUY made on that same row
+    if close_position and action == 'SELL' and last_buy_price is not None and len(hist):
+        final_row = len(hist) - 1
+        if rows and rows[-1] == final_row:
+            del rows[-1], actions[-1], entry_prices[-1], trade_ids[-1]
+        rows.append(final_row)
+        actions.append('SELL')
+        entry_prices.append(last_buy_price)
+        trade_ids.append(trade_id)
+
+    return rows, actions, entry_prices, trade_ids
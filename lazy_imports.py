@@ -0,0 +1,51 @@
+# Deferred imports of heavy libraries
+#
+# 1. A module proxy that imports the real module on first attribute access (pd.DataFrame, pd.read_csv, ...)
+# 2. Checking whether a module has been imported yet
+#
+# Modules on the hot path use `pd = lazy_module('pandas')` instead of `import pandas as pd`, so importing them
+# (or starting a short-lived worker) does not pay for pandas until a DataFrame is actually needed.
+
+import importlib
+import sys
+import types
+
+class LazyModule(types.ModuleType):
+    """
+    Stands in for a module until one of its attributes is used, then imports it and forwards to it.
+    :param name: Full module name, e.g. 'pandas'
+    """
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+def lazy_module(name):
+    """
+    Returns the module if it is already imported, otherwise a proxy that imports it on first use.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+def is_loaded(name):
+    """
+    True if the module has been imported in this process (by any code, not only through a proxy).
+    """
+    return name in sys.modules
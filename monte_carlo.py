@@ -0,0 +1,164 @@
+# Functions for Monte Carlo / bootstrap robustness runs of the MACD histogram strategy
+#
+# 1. Simulating price paths from one price series: block bootstrap of its daily log returns,
+#    or geometric Brownian motion with the same drift and volatility
+# 2. Holding a batch of paths as one 2-D array (paths x time) and computing SMA/EMA, MACD, MACD9 and
+#    Histogram for every path at once with the matrix functions of indicators
+# 3. Running the BUY/SELL state machine of identify_trades one time step at a time across all paths
+# 4. Processing the paths in batches so memory stays bounded, and returning the distributions
+#    of strategy profit against buy-hold profit
+
+import numpy as np
+import pandas as pd
+
+from indicators import macd_matrix
+
+SIMULATIONS = ['bootstrap', 'gbm']
+
+def _log_returns(prices):
+    prices = np.asarray(prices, dtype=float)
+    prices = prices[~np.isnan(prices)]
+    if len(prices) < 2:
+        raise ValueError("Need at least 2 prices to simulate paths.")
+    return prices[0], np.diff(np.log(prices))
+
+def simulate_paths(prices, n_paths, length=None, simulation='bootstrap', block_size=1, rng=None):
+    """
+    Simulates price paths that start at the first price of a series.
+    :param prices: 1-D array of historical prices
+    :param n_paths: Number of paths
+    :param length: Number of prices per path, same as the series by default
+    :param simulation: 'bootstrap' to resample the daily log returns in blocks of block_size days,
+                       'gbm' for geometric Brownian motion with the drift and volatility of the returns
+    :param block_size: Length of the resampled return blocks (keeps short-term autocorrelation)
+    :param rng: np.random.Generator, or a seed
+    :return: Float array of shape (n_paths, length)
+    """
+    rng = np.random.default_rng(rng)
+    start, returns = _log_returns(prices)
+    if length is None:
+        length = len(returns) + 1
+    steps = length - 1
+
+    if simulation == 'bootstrap':
+        block_size = max(1, min(block_size, len(returns)))
+        n_blocks = -(-steps // block_size)
+        starts = rng.integers(0, len(returns) - block_size + 1, size=(n_paths, n_blocks))
+        index = (starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :steps]
+        steps_drawn = returns[index]
+    elif simulation == 'gbm':
+        steps_drawn = rng.normal(returns.mean(), returns.std(ddof=1), size=(n_paths, steps))
+    else:
+        raise ValueError(f"Unsupported simulation: {simulation}. Use one of {SIMULATIONS}.")
+
+    paths = np.empty((n_paths, length))
+    paths[:, 0] = 0
+    np.cumsum(steps_drawn, axis=1, out=paths[:, 1:])
+    np.exp(paths, out=paths)
+    paths *= start
+    return paths
+
+def histogram_paths(paths, method='EMA', short_period=12, long_period=26, signal_period=9):
+    """
+    Computes the MACD histogram of every path at once.
+    :param paths: Float array of shape (n_paths, length)
+    :param method: 'EMA' or 'SMA' for the short and long moving averages (the signal line is always an EMA)
+    :return: Float array of shape (length, n_paths), time on the first axis
+    """
+    prices = np.asarray(paths, dtype=float).T  # (time x paths) view, each path is one column
+    return macd_matrix(prices, method, short_period, long_period, signal_period)[f'Histogram_{method.upper()}']
+
+def trade_paths(paths, hist, fee=0.00125):
+    """
+    Runs the trade state machine of identify_trades on every path, one time step at a time,
+    and prices the trades like calculate_trade_profit.
+    :param paths: Float array of shape (n_paths, length)
+    :param hist: Histogram array of shape (length, n_paths), as from histogram_paths
+    :param fee: Transaction fee for selling
+    :return: Dictionary of arrays with one value per path: 'profit', 'buy_hold', 'n_trades'
+             (BUY and SELL rows, like len(trades) of run_backtest)
+    """
+    prices = np.ascontiguousarray(np.asarray(paths, dtype=float).T)
+    hist = np.ascontiguousarray(hist)
+    length, n_paths = prices.shape
+
+    holding = np.zeros(n_paths, dtype=bool)
+    last_buy = np.zeros(n_paths)
+    profit = np.zeros(n_paths)
+    n_trades = np.zeros(n_paths, dtype=np.int64)
+
+    # Rows before the last one: crossings of the histogram (comparisons with NaN are False)
+    for t in range(1, length - 1):
+        prev = hist[t - 1]
+        curr = hist[t]
+        price = prices[t]
+
+        buy = ~holding & (prev < 0) & (curr > 0)
+        sell = holding & (prev > 0) & (curr < 0) & (price * 0.99875 > last_buy)
+
+        if buy.any():
+            last_buy[buy] = price[buy]
+            profit[buy] -= np.round(price[buy], 2)
+        if sell.any():
+            profit[sell] += np.round(price[sell] * (1 - fee), 2)
+        n_trades += buy | sell
+        holding ^= buy | sell
+
+    # Last row: open positions are sold. A BUY on the last row is replaced by a SELL row,
+    # which calculate_trade_profit then skips, so it adds a trade row but no profit.
+    last = prices[-1]
+    profit[holding] += np.round(last[holding] * (1 - fee), 2)
+    n_trades += holding | (~holding & (hist[-2] < 0) & (hist[-1] > 0))
+
+    buy_hold = np.round(last * (1 - fee) - prices[0], 2)
+    return {'profit': profit, 'buy_hold': buy_hold, 'n_trades': n_trades}
+
+def run_monte_carlo(df, n_paths=10_000, batch_size=1_000, simulation='bootstrap', block_size=1, length=None,
+                    method='EMA', short_period=12, long_period=26, signal_period=9, fee=0.00125,
+                    price_col='price', seed=None):
+    """
+    Backtests the MACD histogram strategy on many simulated price paths.
+    Paths are generated and processed batch_size at a time, so memory use does not grow with n_paths.
+    :param df: DataFrame with a price column to simulate from
+    :param n_paths: Number of simulated paths
+    :param batch_size: Number of paths held in memory at a time
+    :param simulation: 'bootstrap' or 'gbm', see simulate_paths
+    :param fee: Transaction fee for selling
+    :param seed: Seed for reproducible paths (with the same batch_size)
+    :return: (results, summary)
+             results: one row per path with profit, buy_hold, excess_profit and n_trades
+             summary: distribution of profit, buy_hold and excess_profit (mean, std and percentiles)
+    """
+    prices = df[price_col].to_numpy(dtype=float)
+    n_batches = -(-n_paths // batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_batches)
+
+    batches = []
+    for i, batch_seed in enumerate(seeds):
+        size = min(batch_size, n_paths - i * batch_size)
+        paths = simulate_paths(prices, size, length, simulation, block_size, np.random.default_rng(batch_seed))
+        hist = histogram_paths(paths, method, short_period, long_period, signal_period)
+        batches.append(pd.DataFrame(trade_paths(paths, hist, fee)))
+
+    results = pd.concat(batches, ignore_index=True)
+    results['excess_profit'] = results['profit'] - results['buy_hold']
+    results.index.name = 'path'
+    return results, summarize_distribution(results)
+
+def summarize_distribution(results, percentiles=(5, 25, 50, 75, 95)):
+    """
+    Summarizes the Monte Carlo results.
+    :param results: Results table from run_monte_carlo
+    :return: DataFrame with one row per measure (profit, buy_hold, excess_profit) and columns
+             mean, std, the percentiles and the share of paths where the strategy beat buy-hold
+    """
+    rows = {}
+    for col in ['profit', 'buy_hold', 'excess_profit']:
+        values = results[col].to_numpy()
+        row = {'mean': values.mean(), 'std': values.std(ddof=1) if len(values) > 1 else np.nan}
+        for q, value in zip(percentiles, np.percentile(values, percentiles)):
+            row[f'p{q}'] = value
+        rows[col] = row
+    summary = pd.DataFrame(rows).T
+    summary['beat_buy_hold'] = (results['excess_profit'] > 0).mean()
+    return summary
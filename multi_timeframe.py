@@ -0,0 +1,139 @@
+# Functions for MACD histograms on higher timeframes (weekly, monthly, ...) next to the base series
+#
+# 1. Numbering the weeks, months, quarters and years of the base dates, all from one conversion of the index
+#    (on the local calendar of a time zone aware index)
+# 2. Building the bars of every timeframe from the base prices (close = last price of the period). A final
+#    period that is still running is left out, so its bar never changes once more data arrives
+# 3. Computing the MA, MACD, MACD9 and Histogram chain on the bars of each timeframe
+# 4. Aligning each timeframe back onto the base rows with one np.take, without lookahead:
+#    a row sees the last bar completed on or before it, so a week's value appears on its last trading day
+# 5. Checking where the histograms of all timeframes agree (all above or all below zero)
+#
+# Only the aligned histogram columns are added to the DataFrame, the frame is never resampled or copied.
+
+import numpy as np
+
+from indicators import macd_histogram_array
+from lazy_imports import lazy_module
+
+pd = lazy_module('pandas')
+
+TIMEFRAMES = ['W', 'M', 'Q', 'Y']
+
+def period_codes(index, timeframes=('W', 'M')):
+    """
+    Period number of every date for each timeframe. Codes only grow along a sorted index.
+    Weeks run Monday to Sunday, the other periods follow the calendar (the local one for a time zone aware index).
+    :param index: Sorted DatetimeIndex (daily or intraday)
+    :param timeframes: Iterable of 'W', 'M', 'Q' or 'Y'
+    :return: Dictionary of timeframe -> int64 array
+    """
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)  # Local wall time, not UTC
+    months = np.asarray(index.values, dtype='datetime64[M]').astype(np.int64)
+    codes = {}
+    for timeframe in timeframes:
+        if timeframe == 'W':
+            days = np.asarray(index.values, dtype='datetime64[D]').astype(np.int64)
+            codes['W'] = (days + 3) // 7  # 1970-01-01 was a Thursday
+        elif timeframe == 'M':
+            codes['M'] = months
+        elif timeframe == 'Q':
+            codes['Q'] = months // 3
+        elif timeframe == 'Y':
+            codes['Y'] = months // 12
+        else:
+            raise ValueError(f"Unsupported timeframe: {timeframe}. Use one of {TIMEFRAMES}.")
+    return codes
+
+def aggregate_bars(df, timeframes=('W', 'M'), price_col='price'):
+    """
+    Builds the bars of each timeframe from the base price series.
+    The last period only makes a bar once it is over: when the next business day after the last date
+    (taken as closed) starts a new period. Otherwise its rows are left without a bar of their own.
+    :param df: DataFrame with a sorted date index and a price column
+    :return: Dictionary of timeframe -> dictionary with
+             'close': last price of each completed bar, 'end_rows': base row of each bar's last price,
+             'bar_of_row': bar number of every base row
+    """
+    prices = df[price_col].to_numpy(dtype=float)
+    codes_by_timeframe = period_codes(df.index, timeframes)
+    if len(df):
+        last_day = df.index[-1].tz_localize(None) if df.index.tz is not None else df.index[-1]
+        next_day = np.busday_offset(np.datetime64(last_day, 'D'), 1, roll='backward')
+        next_codes = period_codes(pd.DatetimeIndex([next_day]), timeframes)
+
+    bars = {}
+    for timeframe, codes in codes_by_timeframe.items():
+        is_end = np.ones(len(codes), dtype=bool)
+        is_end[:-1] = codes[1:] != codes[:-1]
+        if len(codes) and next_codes[timeframe][0] == codes[-1]:
+            is_end[-1] = False  # Period still running: no bar yet
+        end_rows = np.flatnonzero(is_end)
+        bars[timeframe] = {
+            'close': prices[end_rows],
+            'end_rows': end_rows,
+            'bar_of_row': np.cumsum(is_end) - is_end,  # Bars finished before the row = its own bar number
+        }
+    return bars
+
+def align_to_base(bar_values, bar_of_row, end_rows):
+    """
+    Places bar values on the base rows using only completed bars.
+    A row gets the value of its own bar on the bar's last row, and the previous bar's value before that.
+    :param bar_values: One value per bar
+    :param bar_of_row: Bar number of every base row, from aggregate_bars
+    :param end_rows: Base row of each bar's last price, from aggregate_bars
+    :return: Float array with one value per base row (NaN before the first bar is complete)
+    """
+    is_end = np.zeros(len(bar_of_row), dtype=bool)
+    is_end[end_rows] = True
+    completed = bar_of_row - ~is_end  # Last completed bar on or before each row, -1 if none
+    padded = np.concatenate(([np.nan], np.asarray(bar_values, dtype=float)))
+    return np.take(padded, completed + 1)
+
+def multi_timeframe_histograms(df, timeframes=('W', 'M'), method='EMA', short_period=12, long_period=26,
+                               signal_period=9, price_col='price'):
+    """
+    MACD histogram of the base series and of each higher timeframe, aligned on the base rows.
+    The base histogram is the same as calc_macd_histogram's, each timeframe's is the histogram of its bars
+    (as if the series had been resampled to the last price of each period).
+    :param df: DataFrame with a sorted date index and a price column
+    :param timeframes: Iterable of 'W', 'M', 'Q' or 'Y'
+    :param method: 'EMA' or 'SMA'
+    :return: Dictionary of timeframe -> float array of the base length, with the base series under 'base'
+    """
+    prices = df[price_col].to_numpy(dtype=float)
+    hist_key = f'Histogram_{method.upper()}'
+    histograms = {'base': macd_histogram_array(prices, method, short_period, long_period, signal_period)[hist_key]}
+    for timeframe, bar in aggregate_bars(df, timeframes, price_col).items():
+        bar_hist = macd_histogram_array(bar['close'], method, short_period, long_period, signal_period)[hist_key]
+        histograms[timeframe] = align_to_base(bar_hist, bar['bar_of_row'], bar['end_rows'])
+    return histograms
+
+def add_timeframe_histograms(df, timeframes=('W', 'M'), method='EMA', short_period=12, long_period=26,
+                             signal_period=9, price_col='price'):
+    """
+    Adds the aligned histogram of each higher timeframe to the DataFrame, e.g. 'Histogram_EMA_W', 'Histogram_EMA_M'.
+    The base histogram is left to calc_macd_histogram.
+    :return: DataFrame with the new columns added
+    """
+    histograms = multi_timeframe_histograms(df, timeframes, method, short_period, long_period, signal_period,
+                                            price_col)
+    for timeframe in timeframes:
+        df[f'Histogram_{method.upper()}_{timeframe}'] = histograms[timeframe]
+    return df
+
+def timeframe_agreement(histograms):
+    """
+    Where the histograms of all timeframes point the same way.
+    :param histograms: Dictionary of aligned histogram arrays (as from multi_timeframe_histograms), or a list of them
+    :return: int8 array: 1 where all are above zero, -1 where all are below zero, 0 otherwise (including NaN)
+    """
+    if isinstance(histograms, dict):
+        histograms = list(histograms.values())
+    stacked = np.vstack(histograms)
+    agreement = np.zeros(stacked.shape[1], dtype=np.int8)
+    agreement[(stacked > 0).all(axis=0)] = 1
+    agreement[(stacked < 0).all(axis=0)] = -1
+    return agreement
@@ -0,0 +1,146 @@
+# Functions for sweeping strategy parameters over a process pool
+#
+# 1. Building the grid of (method, short, long, signal, fee) combinations
+# 2. Sharing the price series with the worker processes once through shared memory (also used by walk_forward)
+# 3. Running the indicator chain, trade identification and profit calculation for each combination
+# 4. Collecting the results into one table ranked by profit
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from indicator_bank import IndicatorBank, fingerprint
+from indicators import calc_macd, calc_macd9, compute_histogram
+from trading_strategy import find_trades, get_executed_trades, calculate_trade_profit
+
+# Per-process state set up by _init_worker: the shared price frame and its shared memory handle
+_WORKER = {}
+
+def build_parameter_grid(short_periods=(12,), long_periods=(26,), signal_periods=(9,), methods=('EMA', 'SMA')):
+    """
+    Builds the list of indicator parameter sets to test.
+    Combinations where the short period is not shorter than the long period are skipped.
+    :return: List of tuples (method, short_period, long_period, signal_period)
+    """
+    grid = []
+    for method, short, long, signal in itertools.product(methods, short_periods, long_periods, signal_periods):
+        if short < long:
+            grid.append((method.upper(), short, long, signal))
+    return grid
+
+def _init_worker(shm_name, shape, dtype):
+    """
+    Attaches a worker process to the shared price array and wraps it in a DataFrame once.
+    Each worker also gets an indicator bank keyed by the fingerprint of the prices.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    prices = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _WORKER['shm'] = shm
+    _WORKER['frame'] = pd.DataFrame({'price': prices}, copy=False)
+    _WORKER['bank'] = IndicatorBank()
+    _WORKER['key'] = fingerprint(prices)
+
+def histogram_frame(method, short, long, signal):
+    """
+    Calculates MACD, MACD9 and Histogram for one parameter set on the worker's price series.
+    For functions run by map_over_prices (e.g. the walk_forward tasks), inside a worker process.
+    Moving averages come from the worker's indicator bank, so later tasks with the same period reuse them
+    while the memory they take stays bounded.
+    :return: DataFrame with 'price' and the indicator columns of the method
+    """
+    prices = _WORKER['frame']['price'].to_numpy()
+    averages = _WORKER['bank'].get_many(prices, method, (short, long), key=_WORKER['key'])
+
+    work = pd.DataFrame({'price': prices, f'{method}{short}': averages[short], f'{method}{long}': averages[long]})
+    work = calc_macd(work, short, long, method=method)
+    work = calc_macd9(work, period=signal, macd_key=f'MACD_{method}')
+    return compute_histogram(work, macd_key=f'MACD_{method}')
+
+def _run_parameter_set(task):
+    """
+    Runs one indicator parameter set and evaluates it for every fee.
+    :param task: Tuple (method, short_period, long_period, signal_period, fees)
+    :return: List of result dictionaries, one per fee
+    """
+    method, short, long, signal, fees = task
+    work = histogram_frame(method, short, long, signal)
+    trades = get_executed_trades(find_trades(work, hist_col=f'Histogram_{method}'))
+
+    results = []
+    for fee in fees:
+        profit, buy_hold = calculate_trade_profit(trades, work, fee=fee)
+        results.append({
+            'method': method,
+            'short_period': short,
+            'long_period': long,
+            'signal_period': signal,
+            'fee': fee,
+            'profit': profit,
+            'buy_hold': buy_hold,
+            'n_trades': len(trades),
+        })
+    return results
+
+def map_over_prices(func, tasks, prices, max_workers=None, chunksize=None):
+    """
+    Runs func on every task in worker processes that share one price array.
+    The prices are placed in shared memory once, and each worker wraps them in a frame (see _init_worker).
+    :param func: Module-level function taking one task, reading the prices with histogram_frame
+    :param prices: 1-D float array of prices
+    :param max_workers: Number of worker processes, 0 runs everything in the current process
+    :param chunksize: Number of tasks sent to a worker at a time
+    :return: List of results in task order
+    """
+    prices = np.ascontiguousarray(prices, dtype=float)
+    shm = shared_memory.SharedMemory(create=True, size=max(prices.nbytes, 1))
+    try:
+        np.ndarray(prices.shape, dtype=prices.dtype, buffer=shm.buf)[:] = prices
+        init_args = (shm.name, prices.shape, prices.dtype)
+
+        if max_workers == 0:
+            _init_worker(*init_args)
+            try:
+                return [func(task) for task in tasks]
+            finally:
+                worker_shm = _WORKER.pop('shm')
+                _WORKER.clear()
+                worker_shm.close()
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if chunksize is None:
+            chunksize = max(1, len(tasks) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=init_args) as pool:
+            return list(pool.map(func, tasks, chunksize=chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
+
+def sweep_parameters(df, short_periods=(12,), long_periods=(26,), signal_periods=(9,), fees=(0.00125,),
+                     methods=('EMA', 'SMA'), price_col='price', max_workers=None, chunksize=None):
+    """
+    Backtests every combination of MACD periods, fees and methods on one price series.
+    The prices are placed in shared memory once, so tasks only carry their parameters.
+    Fees do not change the trades, so each indicator parameter set is run once and priced for every fee.
+    :param df: DataFrame with a price column (indicators are calculated by the sweep)
+    :param max_workers: Number of worker processes, 0 runs everything in the current process
+    :param chunksize: Number of parameter sets sent to a worker at a time
+    :return: DataFrame ranked by profit, with profit and buy-hold columns as from calculate_trade_profit
+    """
+    grid = build_parameter_grid(short_periods, long_periods, signal_periods, methods)
+    if not grid:
+        raise ValueError("Parameter grid is empty. Short periods must be shorter than long periods.")
+    tasks = [(method, short, long, signal, tuple(fees)) for method, short, long, signal in grid]
+
+    prices = df[price_col].to_numpy(dtype=float)
+    chunks = map_over_prices(_run_parameter_set, tasks, prices, max_workers, chunksize)
+
+    results = pd.DataFrame([row for chunk in chunks for row in chunk])
+    results['excess_profit'] = results['profit'] - results['buy_hold']
+    results = results.sort_values('profit', ascending=False, kind='stable').reset_index(drop=True)
+    results.insert(0, 'rank', np.arange(1, len(results) + 1))
+    return results
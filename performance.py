@@ -0,0 +1,128 @@
+# Functions for measuring the performance of the trading strategy
+#
+# 1. Building the position series (holding one share or not) from the trades
+# 2. Building the daily equity curve: cash from the trade legs (with fees and rounding as in calculate_trade_profit)
+#    plus the value of the open position
+# 3. Calculating drawdown, return statistics (Sharpe, volatility), exposure and the trade-level PnL table
+#
+# Everything comes from array operations over the price series and the (small) trades table, no row loops.
+# The final equity is the buy-sell profit of calculate_trade_profit.
+
+import numpy as np
+import pandas as pd
+
+from trading_strategy import get_executed_trades, trade_legs
+
+def _trade_rows(trades, df):
+    """
+    Row position in df of every trade, from its date.
+    """
+    rows = df.index.get_indexer(pd.Index(trades['date']))
+    if (rows < 0).any():
+        raise ValueError("Some trade dates are not in the price DataFrame.")
+    return rows
+
+def equity_curve(df, trades=None, fee=0.00125):
+    """
+    Builds the daily position and equity of the strategy, holding one share at a time.
+    :param df: DataFrame with a 'price' column, annotated by identify_trades if trades is not given
+    :param trades: Trades table as from get_executed_trades, or None to take it from the annotations of df
+    :param fee: Transaction fee for selling
+    :return: DataFrame indexed like df with columns:
+             position (1 while holding), cash (sum of the trade legs so far), equity (cash + open position value),
+             drawdown (equity below its running maximum)
+    """
+    if trades is None:
+        trades = get_executed_trades(df)
+    prices = df['price'].to_numpy(dtype=float)
+    rows = _trade_rows(trades, df)
+    legs, counted = trade_legs(trades, fee)
+    is_buy = (trades['action'].to_numpy() == 'BUY')
+
+    # Position changes on every counted leg: +1 after a BUY, -1 after its SELL
+    change = np.zeros(len(prices))
+    np.add.at(change, rows[counted], np.where(is_buy[counted], 1, -1))
+    position = np.cumsum(change)
+
+    # Running cash in trade order, then carried forward to each row from the last leg made on or before it
+    cash_at_trade = np.cumsum(legs[counted])
+    leg_index = np.searchsorted(rows[counted], np.arange(len(prices)), side='right') - 1
+    if len(cash_at_trade):
+        cash = np.where(leg_index >= 0, cash_at_trade[np.maximum(leg_index, 0)], 0.0)
+    else:
+        cash = np.zeros(len(prices))
+
+    equity = cash + position * prices
+    drawdown = equity - np.maximum.accumulate(equity)
+    return pd.DataFrame({'position': position.astype(np.int8), 'cash': cash, 'equity': equity,
+                         'drawdown': drawdown}, index=df.index)
+
+def trade_pnl(df, trades=None, fee=0.00125):
+    """
+    Trade-level PnL table: one row per completed BUY/SELL round trip.
+    :param df: DataFrame with a 'price' column, annotated by identify_trades if trades is not given
+    :param trades: Trades table as from get_executed_trades, or None to take it from the annotations of df
+    :param fee: Transaction fee for selling
+    :return: DataFrame with trade_id, entry_date, exit_date, entry_price, exit_price, bars_held, pnl and return
+    """
+    if trades is None:
+        trades = get_executed_trades(df)
+    rows = _trade_rows(trades, df)
+    legs, counted = trade_legs(trades, fee)
+    is_buy = (trades['action'].to_numpy() == 'BUY')
+
+    # Each counted SELL closes the BUY just before it
+    sells = np.flatnonzero(counted & ~is_buy)
+    buys = np.flatnonzero(is_buy)
+    entries = buys[np.searchsorted(buys, sells) - 1]
+
+    prices = trades['price'].to_numpy(dtype=float)
+    pnl = legs[sells] + legs[entries]
+    return pd.DataFrame({
+        'trade_id': trades['trade_id'].to_numpy()[sells],
+        'entry_date': df.index[rows[entries]],
+        'exit_date': df.index[rows[sells]],
+        'entry_price': prices[entries],
+        'exit_price': prices[sells],
+        'bars_held': rows[sells] - rows[entries],
+        'pnl': pnl,
+        'return': pnl / -legs[entries],
+    })
+
+def performance_summary(df, trades=None, fee=0.00125, periods_per_year=252):
+    """
+    Summary statistics of the strategy, from one equity curve and one trade table.
+    Returns are taken on a capital equal to the first price (what buy-hold invests).
+    :param df: DataFrame with a 'price' column, annotated by identify_trades if trades is not given
+    :param trades: Trades table as from get_executed_trades, or None to take it from the annotations of df
+    :param fee: Transaction fee for selling
+    :param periods_per_year: Rows per year for annualising (252 trading days, 365 after fill_missing_dates)
+    :return: (summary dictionary, equity curve DataFrame, trade PnL DataFrame)
+    """
+    if trades is None:
+        trades = get_executed_trades(df)
+    curve = equity_curve(df, trades, fee)
+    pnl = trade_pnl(df, trades, fee)
+
+    prices = df['price'].to_numpy(dtype=float)
+    capital = prices[0]
+    value = capital + curve['equity'].to_numpy()
+    returns = np.diff(value) / value[:-1]
+    std = returns.std(ddof=1) if len(returns) > 1 else np.nan
+    running_max = np.maximum.accumulate(value)
+
+    summary = {
+        'profit': curve['equity'].iloc[-1],
+        'buy_hold': round(((prices[-1] * (1 - fee)) - prices[0]), 2),
+        'total_return': value[-1] / capital - 1,
+        'max_drawdown': curve['drawdown'].min(),
+        'max_drawdown_pct': (value / running_max - 1).min(),
+        'volatility': std * np.sqrt(periods_per_year),
+        'sharpe': returns.mean() / std * np.sqrt(periods_per_year) if std and std > 0 else np.nan,
+        'exposure': curve['position'].mean(),
+        'n_trades': len(pnl),
+        'win_rate': (pnl['pnl'] > 0).mean() if len(pnl) else np.nan,
+        'avg_trade_pnl': pnl['pnl'].mean() if len(pnl) else np.nan,
+        'avg_bars_held': pnl['bars_held'].mean() if len(pnl) else np.nan,
+    }
+    return summary, curve, pnl
@@ -0,0 +1,258 @@
+# Functions for caching complete backtest results on disk
+#
+# 1. Keying a result by a hash of the input data (every column and the dates) plus the strategy, periods and fee
+# 2. Storing the annotated DataFrame, the executed trades and the profits of run_backtest in one .npz file:
+#    numeric columns as arrays, text and trade annotation columns as JSON. The file is written to a temporary
+#    file and renamed so readers never see half an entry
+# 3. Evicting entries not used for max_age seconds, then the least recently used ones past max_bytes
+# 4. Sharing one cache folder between many processes: writes and evictions hold a lock file,
+#    reads need no lock and treat a vanished or unreadable entry as a miss
+#
+# The modification time of an entry file is its last use, so a hit only touches the file.
+# Entries are loaded with allow_pickle=False, so a shared cache folder cannot run code on load (as in data_cache).
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+
+from indicator_bank import fingerprint
+from lazy_imports import lazy_module
+from trading_strategy import run_backtest
+
+pd = lazy_module('pandas')
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_CACHE_DIR = os.environ.get('STOCKCALC_RESULT_CACHE_DIR',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'stockcalc', 'results'))
+DEFAULT_MAX_BYTES = 1024 ** 3  # 1 GB
+DEFAULT_MAX_AGE = 30 * 24 * 3600  # 30 days
+CACHE_VERSION = 2  # Bump when the strategy logic changes, so older results are not reused
+
+class _CacheLock:
+    """
+    Exclusive lock on the cache folder, held by one process (and thread) at a time.
+    """
+    def __init__(self, cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, '.lock')
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'a+')
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        return False
+
+def result_key(df, strategy='EMA', short_period=12, long_period=26, signal_period=9, fee=0.00125, annotate=True):
+    """
+    Cache key of a backtest: hash of the input DataFrame (values, column names and index) and the settings.
+    :return: Hex string
+    """
+    data = fingerprint(pd.util.hash_pandas_object(df, index=True).to_numpy())
+    settings = repr((CACHE_VERSION, list(map(str, df.columns)), strategy.upper(), short_period, long_period,
+                     signal_period, float(fee), bool(annotate)))
+    return hashlib.blake2b(f'{data}{settings}'.encode(), digest_size=16).hexdigest()
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f'{key}.npz')
+
+def _values_to_entry(values, name, arrays):
+    """
+    Stores the values of one column or index: as an array in arrays, or inline as JSON for object values.
+    :return: JSON description of the values
+    :raises TypeError: For values that cannot be stored without pickling
+    """
+    from data_cache import tz_to_meta
+
+    tz = getattr(values.dtype, 'tz', None)
+    if tz is not None:
+        arrays[name] = values.to_numpy(dtype='datetime64[ns]')  # UTC, the time zone goes in the description
+        return {'array': name, 'tz': tz_to_meta(tz)}
+    if values.dtype == object:
+        items = values.tolist()
+        json.dumps(items, allow_nan=False)  # TypeError/ValueError for values JSON cannot hold
+        return {'items': items}
+    if not isinstance(values.dtype, np.dtype):
+        raise TypeError(f"Cannot store {values.dtype} values in the result cache.")
+    arrays[name] = values.to_numpy()
+    return {'array': name}
+
+def _values_from_entry(desc, arrays):
+    from data_cache import tz_from_meta
+
+    if 'items' in desc:
+        # Floats come back as np.float64, the type identify_trades stores in its object columns
+        return np.array([np.float64(v) if isinstance(v, float) else v for v in desc['items']], dtype=object)
+    values = arrays[desc['array']]
+    if 'tz' in desc:
+        return pd.DatetimeIndex(values).tz_localize('UTC').tz_convert(tz_from_meta(desc['tz']))
+    return values
+
+def _frame_to_entry(df, prefix, arrays):
+    """
+    Stores a DataFrame as arrays plus a JSON description of its columns and index.
+    """
+    index = df.index
+    if isinstance(index, pd.RangeIndex):
+        index_desc = {'range': [index.start, index.stop, index.step]}
+    else:
+        index_desc = _values_to_entry(index, f'{prefix}_index', arrays)
+        index_desc['freq'] = getattr(index, 'freqstr', None)
+    index_desc['name'] = index.name
+    columns = [dict(_values_to_entry(df[col], f'{prefix}_{i}', arrays), name=col)
+               for i, col in enumerate(df.columns)]
+    return {'index': index_desc, 'columns': columns}
+
+def _frame_from_entry(desc, arrays):
+    index_desc = desc['index']
+    if 'range' in index_desc:
+        index = pd.RangeIndex(*index_desc['range'], name=index_desc['name'])
+    else:
+        index = pd.Index(_values_from_entry(index_desc, arrays), name=index_desc['name'])
+        if index_desc['freq'] is not None:
+            index = pd.DatetimeIndex(index, freq=index_desc['freq'])
+    data = {col['name']: _values_from_entry(col, arrays) for col in desc['columns']}
+    return pd.DataFrame(data, index=index, columns=[col['name'] for col in desc['columns']])
+
+def _scalar_to_entry(value):
+    return {'value': float(value) if isinstance(value, np.floating) else value,
+            'numpy': isinstance(value, np.floating)}
+
+def _scalar_from_entry(desc):
+    return np.float64(desc['value']) if desc['numpy'] else desc['value']
+
+def _read_entry(path):
+    """
+    Reads a cache entry and marks it as used. Nothing is unpickled.
+    :return: Entry dictionary, or None if it does not exist or cannot be read
+    """
+    try:
+        with np.load(path, allow_pickle=False) as stored:
+            arrays = {name: stored[name] for name in stored.files}
+        meta = json.loads(arrays.pop('meta').tobytes().decode())
+        entry = {'df': _frame_from_entry(meta['df'], arrays), 'trades': _frame_from_entry(meta['trades'], arrays),
+                 'profit': _scalar_from_entry(meta['profit']), 'buy_hold': _scalar_from_entry(meta['buy_hold'])}
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError, zipfile.BadZipFile):
+        return None  # Written by another version, damaged, or holding pickled objects: recompute and overwrite it
+    return entry
+
+def _write_entry(path, entry, cache_dir):
+    """
+    Writes a cache entry to a temporary file and renames it into place.
+    :raises TypeError: If the result holds values that cannot be stored without pickling
+    """
+    arrays = {}
+    meta = {'df': _frame_to_entry(entry['df'], 'df', arrays),
+            'trades': _frame_to_entry(entry['trades'], 'trades', arrays),
+            'profit': _scalar_to_entry(entry['profit']), 'buy_hold': _scalar_to_entry(entry['buy_hold'])}
+    arrays['meta'] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def evict_results(max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Removes the entries not used for max_age seconds, then the least recently used entries
+    until the cache is at most max_bytes.
+    :param max_age: Seconds since last use, None for no age limit
+    :return: Number of entries removed
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    with _CacheLock(cache_dir):
+        now = time.time()
+        entries = []
+        for name in os.listdir(cache_dir):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        removed = 0
+        total = sum(size for _, size, _ in entries)
+        for last_used, size, path in sorted(entries):
+            expired = max_age is not None and now - last_used > max_age
+            if not expired and total <= max_bytes:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+    return removed
+
+def clear_results(cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Removes every entry of the cache.
+    :return: Number of entries removed
+    """
+    return evict_results(max_bytes=-1, max_age=None, cache_dir=cache_dir)
+
+def cached_backtest(df, strategy='EMA', short_period=12, long_period=26, signal_period=9, fee=0.00125,
+                    annotate=True, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+    """
+    Same as run_backtest, returning the stored result when the same data and settings were run before.
+    On a hit df is left unchanged and the returned DataFrame is the stored copy (run_backtest adds the columns to df).
+    :param df: DataFrame with a 'price' column
+    :param strategy: 'EMA' or 'SMA'
+    :param fee: Transaction fee for selling
+    :param cache_dir: Folder holding the cache entries, shared safely between processes
+    :param max_bytes: Size limit of the cache, checked after a new entry is written
+    :param max_age: Seconds an entry is kept without being used, None for no age limit
+    :return: (DataFrame with indicators, trades DataFrame, buy_sell_profit, buy_hold_profit)
+    """
+    key = result_key(df, strategy, short_period, long_period, signal_period, fee, annotate)
+    path = _entry_path(key, cache_dir)
+
+    entry = _read_entry(path)
+    if entry is not None:
+        return entry['df'], entry['trades'], entry['profit'], entry['buy_hold']
+
+    df, trades, profit, buy_hold = run_backtest(df, strategy, short_period, long_period, signal_period, fee,
+                                                annotate=annotate)
+    entry = {'df': df, 'trades': trades, 'profit': profit, 'buy_hold': buy_hold}
+    try:
+        with _CacheLock(cache_dir):
+            _write_entry(path, entry, cache_dir)
+    except (TypeError, ValueError):
+        return df, trades, profit, buy_hold  # A column holds values that need pickling: not cached
+    evict_results(max_bytes, max_age, cache_dir)
+    return df, trades, profit, buy_hold
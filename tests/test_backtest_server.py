@@ -0,0 +1,161 @@
+import sys
+import os
+import asyncio
+import queue
+import socket
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from multiprocessing import shared_memory
+from backtest_server import run_server, BacktestClient, BacktestServer
+from data_loader import import_stock_file, validate_and_prepare_data, fill_missing_dates
+from trading_strategy import run_backtest
+
+def write_price_csv(path, periods=400, seed=3):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2020-01-01', periods=periods)
+    pd.DataFrame({'Date': dates, 'Close': 100 + np.cumsum(rng.normal(0, 1, periods))}).to_csv(path, index=False)
+
+def start_server(**kwargs):
+    addresses = queue.Queue()
+    thread = threading.Thread(target=run_server, kwargs=dict(kwargs, ready=addresses.put), daemon=True)
+    thread.start()
+    return addresses.get(timeout=30), thread
+
+@pytest.fixture
+def socket_path():
+    folder = tempfile.mkdtemp(prefix='bt-')  # Short path, Unix socket paths are limited to ~100 characters
+    yield os.path.join(folder, 'server.sock')
+    shutil.rmtree(folder, ignore_errors=True)
+
+# ---------- TEST: backtest over a Unix socket ----------
+def test_server_backtest_matches_run_backtest(tmp_path, socket_path):
+    csv = tmp_path / 'prices.csv'
+    write_price_csv(csv)
+    address, thread = start_server(path=socket_path, max_workers=2)
+
+    with BacktestClient(address) as client:
+        assert client.load('SPY', str(csv))['rows'] == 400
+        first = client.backtest('SPY', strategy='SMA', fee=0.002)
+        second = client.backtest('SPY', strategy='SMA', fee=0.002)
+        with pytest.raises(RuntimeError, match='Dataset not loaded'):
+            client.backtest('QQQ')
+        assert client.request('ping')['pong']  # Still serving after a failed request
+        client.request('shutdown')
+    thread.join(timeout=30)
+
+    df = fill_missing_dates(validate_and_prepare_data(import_stock_file(str(csv)), verbose=False))
+    _, trades, profit, buy_hold = run_backtest(df, 'SMA', fee=0.002)
+    assert (first['profit'], first['buy_hold'], first['n_trades']) == (profit, buy_hold, len(trades))
+    assert [t['action'] for t in first['trades']] == trades['action'].tolist()
+    assert [t['date'] for t in first['trades']] == [d.isoformat() for d in trades['date']]
+    assert not first['cached'] and second['cached']
+    assert second['profit'] == first['profit']
+    assert not os.path.exists(socket_path)
+
+# ---------- TEST: concurrent requests over TCP ----------
+def test_server_concurrent_requests_tcp():
+    prices = (100 + np.cumsum(np.random.default_rng(5).normal(0, 1, 300))).tolist()
+    (host, port), thread = start_server(port=0, max_workers=2)
+
+    with BacktestClient(host=host, port=port) as client:
+        client.load('inline', prices=prices)
+
+    def request(params):
+        with BacktestClient(host=host, port=port) as client:
+            return client.backtest('inline', trades=False, **params)
+
+    grid = [{'strategy': method, 'short_period': short} for method in ['EMA', 'SMA'] for short in [5, 8, 12]] * 2
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(request, grid))
+
+    with BacktestClient(host=host, port=port) as client:
+        client.request('shutdown')
+    thread.join(timeout=30)
+
+    for params, result in zip(grid, results):
+        df = pd.DataFrame({'price': prices})
+        _, _, profit, buy_hold = run_backtest(df, params['strategy'], short_period=params['short_period'])
+        assert (result['profit'], result['buy_hold']) == (profit, buy_hold)
+        assert 'trades' not in result
+
+# ---------- TEST: invalid inline loads ----------
+def test_server_rejects_invalid_inline_loads():
+    (host, port), thread = start_server(port=0, max_workers=1)
+
+    with BacktestClient(host=host, port=port) as client:
+        client.load('good', prices=[1.0, 2.0, 3.0], dates=['2024-01-01', '2024-01-02', '2024-01-03'])
+        invalid = [
+            {'prices': []},
+            {'prices': [1.0, None, 3.0]},
+            {'prices': [1.0, 'x']},
+            {'prices': [1.0, 2.0], 'dates': ['2024-01-02', '2024-01-01']},
+            {'prices': [1.0, 2.0], 'dates': ['2024-01-01']},
+        ]
+        for params in invalid:
+            with pytest.raises(RuntimeError):
+                client.load('bad', **params)
+        # Nothing half-registered: listing the datasets still works
+        datasets = client.request('datasets')
+        client.request('shutdown')
+    thread.join(timeout=30)
+
+    assert list(datasets) == ['good']
+    assert datasets['good'] == {'name': 'good', 'rows': 3, 'start': '2024-01-01T00:00:00', 'end': '2024-01-03T00:00:00'}
+
+# ---------- TEST: prices sent once ----------
+def test_prices_shared_once_per_dataset():
+    prices = (100 + np.cumsum(np.random.default_rng(7).normal(0, 1, 300))).tolist()
+    server = BacktestServer(max_workers=0)
+    calls = []
+    run = server._run
+
+    async def recording_run(func, *args):
+        calls.append(args)
+        return await run(func, *args)
+    server._run = recording_run
+
+    async def session():
+        await server.load({'name': 'inline', 'prices': prices})
+        shm_name = server.datasets['inline']['shm'].name
+        results = [await server.backtest({'dataset': 'inline', 'short_period': short, 'trades': False})
+                   for short in (5, 8)]
+        await server.handle({'op': 'drop', 'name': 'inline'})
+        return shm_name, results
+
+    shm_name, results = asyncio.run(session())
+    # Each request only carries the block name and the settings
+    assert calls and all(not isinstance(arg, (np.ndarray, list)) for args in calls for arg in args)
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=shm_name)  # Freed by the drop
+    for short, result in zip((5, 8), results):
+        _, _, profit, buy_hold = run_backtest(pd.DataFrame({'price': prices}), short_period=short)
+        assert (result['profit'], result['buy_hold']) == (profit, buy_hold)
+
+# ---------- TEST: socket path ----------
+def test_server_never_removes_a_regular_file(socket_path):
+    with open(socket_path, 'w') as f:
+        f.write('keep me')
+    with pytest.raises(FileExistsError):
+        run_server(path=socket_path, max_workers=0)
+    with open(socket_path) as f:
+        assert f.read() == 'keep me'
+
+def test_server_replaces_stale_socket(socket_path):
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(socket_path)
+    stale.close()  # Bound but nobody listening, as after a crash
+
+    address, thread = start_server(path=socket_path, max_workers=0)
+    with BacktestClient(address) as client:
+        assert client.request('ping')['pong']
+        client.request('shutdown')
+    thread.join(timeout=30)
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,69 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from batch_backtest import split_universe, run_universe
+from data_loader import fill_missing_dates
+from trading_strategy import run_backtest
+
+# Helper to create a wide panel with one column per symbol
+def create_wide_panel(symbols=('AAA', 'BBB', 'CCC'), periods=200):
+    rng = np.random.default_rng(3)
+    index = pd.date_range('2024-01-01', periods=periods)
+    data = {symbol: 100 + np.cumsum(rng.normal(0, 1, periods)) for symbol in symbols}
+    return pd.DataFrame(data, index=index)
+
+# ---------- TEST: split_universe ----------
+def test_split_universe_long_panel():
+    wide = create_wide_panel()
+    long = wide.rename_axis('Date').reset_index().melt(id_vars='Date', var_name='Ticker', value_name='Close')
+    pairs = split_universe(long)
+
+    assert [symbol for symbol, _ in pairs] == ['AAA', 'BBB', 'CCC']
+    pd.testing.assert_series_equal(pairs[1][1]['price'], wide['BBB'], check_names=False, check_freq=False)
+
+def test_split_universe_file_list_uses_file_names():
+    pairs = split_universe(['data/SPY.csv', 'QQQ.xlsx'])
+    assert pairs == [('SPY', 'data/SPY.csv'), ('QQQ', 'QQQ.xlsx')]
+
+# ---------- TEST: run_universe ----------
+@pytest.mark.parametrize('max_workers', [0, 2])
+def test_run_universe_matches_single_symbol_runs(max_workers):
+    wide = create_wide_panel()
+    wide.iloc[:20, 2] = np.nan  # CCC starts trading later
+    trade_log, summary = run_universe(wide, strategy='SMA', max_workers=max_workers)
+
+    assert summary['symbol'].tolist() == ['AAA', 'BBB', 'CCC']
+    assert summary['error'].isna().all()
+    for symbol in wide.columns:
+        df = fill_missing_dates(wide[symbol].dropna().to_frame('price'))
+        _, trades, profit, buy_hold = run_backtest(df, 'SMA')
+        row = summary[summary['symbol'] == symbol].iloc[0]
+        assert row['profit'] == profit
+        assert row['buy_hold'] == buy_hold
+        assert (trade_log['symbol'] == symbol).sum() == len(trades)
+
+def test_run_universe_reports_bad_files(tmp_path):
+    good = tmp_path / "GOOD.csv"
+    prices = 100 + np.sin(np.arange(120) / 5) * 10
+    pd.DataFrame({'date': pd.date_range('2024-01-01', periods=120), 'price': prices}).to_csv(good, index=False)
+    bad = tmp_path / "BAD.txt"
+    bad.write_text("not a price file")
+
+    trade_log, summary = run_universe([str(good), str(bad)], max_workers=0)
+
+    summary = summary.set_index('symbol')
+    assert pd.isna(summary.loc['GOOD', 'error'])
+    assert summary.loc['GOOD', 'n_trades'] > 0
+    assert 'Unsupported file format' in summary.loc['BAD', 'error']
+    assert set(trade_log['symbol']) == {'GOOD'}
+
+def test_run_universe_empty():
+    trade_log, summary = run_universe([], max_workers=0)
+    assert trade_log.empty and summary.empty
+    assert list(summary.columns) == ['symbol', 'rows', 'start', 'end', 'n_trades', 'profit', 'buy_hold', 'error',
+                                     'excess_profit']
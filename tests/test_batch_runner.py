@@ -0,0 +1,115 @@
+import sys
+import os
+import json
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+import batch_runner
+from batch_runner import load_jobs, prepare_jobs, run_batch, read_progress, main
+from data_loader import import_stock_file, validate_and_prepare_data, fill_missing_dates
+from trading_strategy import run_backtest, run_trading_strategy
+
+def write_price_csv(path, periods=300, seed=1):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2020-01-01', periods=periods)
+    pd.DataFrame({'Date': dates, 'Close': 100 + np.cumsum(rng.normal(0, 1, periods))}).to_csv(path, index=False)
+
+# ---------- TEST: load_jobs ----------
+def test_load_jobs_json_and_jsonl(tmp_path):
+    jsonl = tmp_path / 'jobs.jsonl'
+    jsonl.write_text('{"input": "a.csv"}\n\n{"input": "a.csv", "strategy": "SMA", "id": "b"}\n')
+    jobs = load_jobs(str(jsonl))
+    assert [job['strategy'] for job in jobs] == ['EMA', 'SMA']
+    assert jobs[1]['id'] == 'b'
+    assert jobs[0]['id'] == load_jobs(str(jsonl))[0]['id']  # Stable between runs
+
+    spec = tmp_path / 'jobs.json'
+    spec.write_text(json.dumps({'defaults': {'fee': 0.002}, 'jobs': [{'input': 'a.csv'}, {'input': 'b.csv'}]}))
+    assert [job['fee'] for job in load_jobs(str(spec))] == [0.002, 0.002]
+
+    with pytest.raises(ValueError):
+        prepare_jobs([{'input': 'a.csv', 'periods': 3}])
+    with pytest.raises(ValueError):
+        prepare_jobs([{'input': 'a.csv'}, {'input': 'a.csv'}])
+
+# ---------- TEST: run_batch ----------
+def test_run_batch_matches_run_backtest(tmp_path):
+    path = tmp_path / 'prices.csv'
+    write_price_csv(path)
+    jobs = [{'id': 'ema', 'input': str(path), 'trades_export': str(tmp_path / 'out' / 'trades.csv')},
+            {'id': 'sma', 'input': str(path), 'strategy': 'SMA', 'fee': 0.002,
+             'export': str(tmp_path / 'out' / 'sma.csv')}]
+    results = run_batch(jobs, max_workers=2, verbose=False)
+    assert results['id'].tolist() == ['ema', 'sma']
+    assert (results['status'] == 'ok').all()
+
+    df = fill_missing_dates(validate_and_prepare_data(import_stock_file(str(path)), verbose=False))
+    _, trades, profit, buy_hold = run_backtest(df.copy(), 'SMA', fee=0.002)
+    assert results.loc[1, 'profit'] == profit
+    assert results.loc[1, 'buy_hold'] == buy_hold
+    assert results.loc[1, 'n_trades'] == len(trades)
+    assert os.path.exists(tmp_path / 'out' / 'trades.csv')
+    assert 'trade_action' in pd.read_csv(tmp_path / 'out' / 'sma.csv').columns
+
+def test_run_batch_result_cache(tmp_path, monkeypatch):
+    path = tmp_path / 'prices.csv'
+    write_price_csv(path)
+    jobs = [{'id': 'ema', 'input': str(path), 'result_cache': str(tmp_path / 'results')}]
+    first = run_batch(jobs, max_workers=0, verbose=False)
+
+    import result_cache
+    monkeypatch.setattr(result_cache, 'run_backtest', lambda *args, **kwargs: pytest.fail("recomputed"))
+    second = run_batch(jobs, max_workers=0, verbose=False)
+    assert second.loc[0, 'status'] == 'ok'
+    assert second.loc[0, 'profit'] == first.loc[0, 'profit']
+
+# ---------- TEST: retries and resume ----------
+def test_failures_are_retried_and_resumed(tmp_path):
+    path = tmp_path / 'prices.csv'
+    write_price_csv(path)
+    progress = str(tmp_path / 'progress.jsonl')
+    jobs = [{'id': 'good', 'input': str(path)}, {'id': 'bad', 'input': str(tmp_path / 'missing.csv')}]
+
+    results = run_batch(jobs, progress, max_workers=0, retries=1, retry_delay=0, verbose=False)
+    assert results.set_index('id')['status'].to_dict() == {'good': 'ok', 'bad': 'failed'}
+    assert results.set_index('id').loc['bad', 'attempts'] == 2
+
+    # The missing file appears: only the failed job runs again
+    write_price_csv(tmp_path / 'missing.csv')
+    calls = []
+    original = batch_runner.run_job
+    batch_runner.run_job = lambda job: calls.append(job['id']) or original(job)
+    try:
+        results = run_batch(jobs, progress, max_workers=0, retry_delay=0, verbose=False)
+    finally:
+        batch_runner.run_job = original
+    assert calls == ['bad']
+    assert (results['status'] == 'ok').all()
+    assert read_progress(progress)['bad']['status'] == 'ok'
+
+# ---------- TEST: command line ----------
+def test_main_exit_code(tmp_path):
+    path = tmp_path / 'prices.csv'
+    write_price_csv(path)
+    job_file = tmp_path / 'jobs.jsonl'
+    job_file.write_text(json.dumps({'input': str(path)}) + '\n')
+    summary = tmp_path / 'summary.csv'
+    assert main([str(job_file), '--workers', '0', '--summary', str(summary)]) == 0
+    assert pd.read_csv(summary)['status'].tolist() == ['ok']
+
+    job_file.write_text(json.dumps({'input': str(tmp_path / 'nope.csv')}) + '\n')
+    assert main([str(job_file), '--workers', '0', '--retries', '0']) == 1
+
+# ---------- TEST: run_trading_strategy without prompt ----------
+def test_run_trading_strategy_with_strategy(tmp_path, monkeypatch):
+    monkeypatch.setattr('builtins.input', lambda prompt: pytest.fail("Prompted"))
+    path = tmp_path / 'prices.csv'
+    write_price_csv(path)
+    df = validate_and_prepare_data(import_stock_file(str(path)), verbose=False)
+    trades = run_trading_strategy(df, strategy='sma')
+    assert not trades.empty
+    with pytest.raises(ValueError):
+        run_trading_strategy(df, strategy='WMA')
@@ -0,0 +1,59 @@
+import sys
+import os
+import json
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+from benchmarks.bench_pipeline import make_raw_prices, run_benchmarks, compare_to_baseline, main, STAGES, MAX_DAILY_ROWS
+
+# ---------- TEST: make_raw_prices ----------
+def test_make_raw_prices():
+    raw = make_raw_prices(500)
+    assert list(raw.columns) == ['Date', 'Close']
+    assert len(raw) == 500
+
+def test_make_raw_prices_past_daily_cap():
+    # Daily dates up to the cap (past the ~76k rows a single pandas Timedelta allows), minute bars beyond it
+    daily = pd.to_datetime(make_raw_prices(MAX_DAILY_ROWS)['Date'])
+    assert daily.is_monotonic_increasing and daily.is_unique
+    assert (daily.dt.dayofweek < 5).all()
+
+    minutes = pd.to_datetime(make_raw_prices(MAX_DAILY_ROWS + 1)['Date'])
+    assert len(minutes) == MAX_DAILY_ROWS + 1
+    assert (minutes.diff().iloc[1:] == pd.Timedelta('1min')).all()
+
+# ---------- TEST: run_benchmarks ----------
+def test_run_benchmarks_every_stage():
+    report = run_benchmarks(sizes=[300], repeat=1, quiet=True)
+    stages = [r['stage'] for r in report['results']]
+    assert stages == STAGES
+    for record in report['results']:
+        assert record['rows'] == 300
+        assert record['seconds'] >= 0
+        assert record['peak_mb'] is not None
+    assert 'pandas' in report['meta']
+
+# ---------- TEST: compare_to_baseline ----------
+def test_compare_to_baseline():
+    baseline = {'results': [{'stage': 'calc_ema', 'rows': 1000, 'seconds': 1.0, 'peak_mb': 10.0}]}
+    report = {'results': [{'stage': 'calc_ema', 'rows': 1000, 'seconds': 1.2, 'peak_mb': 20.0},
+                          {'stage': 'calc_sma', 'rows': 1000, 'seconds': 9.0, 'peak_mb': 1.0}]}
+    assert compare_to_baseline(report, baseline, threshold=0.25) == []
+
+    regressions = compare_to_baseline(report, baseline, threshold=0.1, memory_threshold=0.5)
+    assert [(r['stage'], r['metric']) for r in regressions] == [('calc_ema', 'seconds'), ('calc_ema', 'peak_mb')]
+
+# ---------- TEST: main exit code ----------
+def test_main_exit_code(tmp_path):
+    output = tmp_path / 'results.json'
+    baseline = tmp_path / 'baseline.json'
+    args = ['--sizes', '200', '--stages', 'calc_sma', '--repeat', '1', '--output', str(output)]
+    assert main(args + ['--baseline', str(baseline), '--save-baseline']) == 0
+    assert json.loads(baseline.read_text())['results'][0]['stage'] == 'calc_sma'
+
+    # Pretend the baseline was far faster
+    report = json.loads(baseline.read_text())
+    report['results'][0]['seconds'] = 1e-12
+    baseline.write_text(json.dumps(report))
+    assert main(args + ['--baseline', str(baseline)]) == 1
@@ -0,0 +1,68 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from chunked_pipeline import run_chunked_pipeline
+from data_loader import import_stock_file, validate_and_prepare_data, fill_missing_dates
+from trading_strategy import run_backtest
+
+# Helper to write a CSV with gaps in the dates (every 7th day missing)
+def write_price_csv(path, periods=400):
+    rng = np.random.default_rng(5)
+    dates = pd.date_range('2020-01-01', periods=periods)
+    keep = np.arange(periods) % 7 != 6
+    prices = 100 + np.cumsum(rng.normal(0, 1, periods))
+    pd.DataFrame({'Date': dates[keep], 'Close': prices[keep], 'Volume': np.arange(periods)[keep]}).to_csv(path, index=False)
+
+# ---------- TEST: run_chunked_pipeline ----------
+@pytest.mark.parametrize('method,fill_dates', [('EMA', False), ('SMA', True)])
+def test_chunked_pipeline_matches_in_memory_run(tmp_path, method, fill_dates):
+    source = tmp_path / "prices.csv"
+    write_price_csv(source)
+    output = tmp_path / "out" / "annotated.csv"
+
+    trades, profit, buy_hold = run_chunked_pipeline(str(source), str(output), method=method,
+                                                    chunksize=37, fill_dates=fill_dates)
+
+    df = validate_and_prepare_data(import_stock_file(str(source)), verbose=False)
+    if fill_dates:
+        df = fill_missing_dates(df)
+    expected_df, expected_trades, expected_profit, expected_buy_hold = run_backtest(df, method)
+
+    assert profit == expected_profit
+    assert buy_hold == expected_buy_hold
+    assert trades['action'].tolist() == expected_trades['action'].tolist()
+    assert trades['date'].tolist() == expected_trades['date'].tolist()
+
+    written = pd.read_csv(output, index_col='date', parse_dates=True)
+    assert written.index.equals(expected_df.index)
+    assert list(written.columns) == list(expected_df.columns)
+    np.testing.assert_allclose(written[f'Histogram_{method}'], expected_df[f'Histogram_{method}'].astype(float),
+                               rtol=1e-9, atol=1e-9)
+    assert written['trade_action'].fillna('').tolist() == expected_df['trade_action'].fillna('').tolist()
+
+def test_chunked_pipeline_rejects_unsorted_file(tmp_path):
+    source = tmp_path / "prices.csv"
+    dates = pd.date_range('2024-01-01', periods=10)[::-1]
+    pd.DataFrame({'date': dates, 'price': np.arange(10)}).to_csv(source, index=False)
+
+    with pytest.raises(ValueError):
+        run_chunked_pipeline(str(source), str(tmp_path / "out.csv"), chunksize=4)
+
+def test_chunked_pipeline_parquet_output(tmp_path):
+    pytest.importorskip('pyarrow')
+    source = tmp_path / "prices.csv"
+    write_price_csv(source)
+
+    run_chunked_pipeline(str(source), str(tmp_path / "out.csv"), chunksize=50)
+    run_chunked_pipeline(str(source), str(tmp_path / "out.parquet"), chunksize=50)
+
+    from_csv = pd.read_csv(tmp_path / "out.csv", index_col='date', parse_dates=True)
+    from_parquet = pd.read_parquet(tmp_path / "out.parquet")
+    assert from_parquet.index.equals(from_csv.index)
+    assert from_parquet['trade_action'].fillna('').tolist() == from_csv['trade_action'].fillna('').tolist()
+    np.testing.assert_allclose(from_parquet['Histogram_EMA'], from_csv['Histogram_EMA'], rtol=1e-9)
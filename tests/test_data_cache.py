@@ -0,0 +1,110 @@
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+import data_cache
+from data_cache import load_stock_file, invalidate_cache, evict_cache, cache_size
+from data_loader import import_stock_file, validate_and_prepare_data
+
+# Helper to write a small CSV price file
+def write_csv(path, periods=50, start=100):
+    dates = pd.date_range('2024-01-01', periods=periods)
+    pd.DataFrame({'Date': dates[::-1].strftime('%Y-%m-%d'), 'Close': np.arange(periods) + start}).to_csv(path, index=False)
+
+# ---------- TEST: load_stock_file ----------
+@pytest.mark.parametrize('mmap', [False, True])
+def test_cached_load_matches_uncached(tmp_path, mmap):
+    path = tmp_path / "prices.csv"
+    write_csv(path)
+    expected = validate_and_prepare_data(import_stock_file(str(path)))
+    cache_dir = str(tmp_path / "cache")
+
+    first = load_stock_file(str(path), cache_dir=cache_dir, mmap=mmap)
+    second = load_stock_file(str(path), cache_dir=cache_dir, mmap=mmap)
+
+    pd.testing.assert_frame_equal(first, expected)
+    pd.testing.assert_frame_equal(second, expected)
+
+def test_cache_hit_skips_parsing(tmp_path, monkeypatch):
+    path = tmp_path / "prices.csv"
+    write_csv(path)
+    cache_dir = str(tmp_path / "cache")
+    load_stock_file(str(path), cache_dir=cache_dir)
+
+    def fail(_):
+        raise AssertionError("file should not be parsed again")
+    monkeypatch.setattr(data_cache, 'import_stock_file', fail)
+
+    # Touching the file changes mtime but not the content hash
+    os.utime(path, ns=(0, 10 ** 9))
+    result = load_stock_file(str(path), cache_dir=cache_dir)
+    assert len(result) == 50
+
+def test_changed_file_is_reloaded(tmp_path):
+    path = tmp_path / "prices.csv"
+    cache_dir = str(tmp_path / "cache")
+    write_csv(path, start=100)
+    load_stock_file(str(path), cache_dir=cache_dir)
+
+    write_csv(path, start=500)
+    result = load_stock_file(str(path), cache_dir=cache_dir)
+    assert result['price'].iloc[-1] == 500
+
+def test_concurrent_hits_on_one_entry(tmp_path):
+    path = tmp_path / "prices.csv"
+    write_csv(path)
+    cache_dir = str(tmp_path / "cache")
+    expected = load_stock_file(str(path), cache_dir=cache_dir)
+
+    # Every hit rewrites meta.json, each through its own temporary file
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: load_stock_file(str(path), cache_dir=cache_dir), range(32)))
+    for result in results:
+        pd.testing.assert_frame_equal(result, expected)
+    entry = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+    assert sorted(os.listdir(entry)) == ['col0.npy', 'index.npy', 'meta.json']
+
+# ---------- TEST: invalidate_cache / evict_cache ----------
+def test_invalidate_and_evict(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    for name in ['a.csv', 'b.csv']:
+        write_csv(tmp_path / name)
+        load_stock_file(str(tmp_path / name), cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 2
+
+    invalidate_cache(str(tmp_path / "a.csv"), cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    assert evict_cache(max_bytes=0, cache_dir=cache_dir) == 1
+    assert cache_size(cache_dir) == 0
+
+# ---------- TEST: time zones and text columns ----------
+def test_cache_keeps_time_zone_and_text_columns(tmp_path):
+    path = tmp_path / "intraday.csv"
+    dates = pd.date_range('2024-01-02 09:30', periods=5, freq='min', tz='America/New_York')
+    pd.DataFrame({'Date': dates.astype(str), 'Close': np.arange(5.0), 'note': ['a', None, 'c', 'd', 'e']}).to_csv(
+        path, index=False)
+    cache_dir = str(tmp_path / "cache")
+
+    first = load_stock_file(str(path), cache_dir=cache_dir, verbose=False)
+    second = load_stock_file(str(path), cache_dir=cache_dir, verbose=False)
+
+    pd.testing.assert_frame_equal(second, first)
+    assert str(second.index.tz) == 'UTC-05:00'
+    entry = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+    assert sorted(os.listdir(entry)) == ['col0.npy', 'col1.json', 'index.npy', 'meta.json']  # Nothing pickled
+
+def test_cache_entry_named_time_zone(tmp_path):
+    index = pd.date_range('2024-03-08 15:00', periods=3, freq='D', tz='America/New_York', name='date')
+    df = pd.DataFrame({'price': [1.0, 2.0, 3.0]}, index=index)
+    entry = str(tmp_path / "entry")
+
+    data_cache._save_entry(df, entry, {})
+    loaded = data_cache._load_entry(entry, data_cache._read_meta(entry), mmap=False)
+
+    pd.testing.assert_frame_equal(loaded, df, check_freq=False)
@@ -0,0 +1,110 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from incremental_indicators import RollingSMA, SeededEMA, IncrementalStrategy
+from indicators import calc_sma, calc_ema, calc_macd_histogram
+from trading_strategy import identify_trades
+
+# Helper to create a noisy price series with plenty of crossovers
+def create_price_df(periods=300):
+    rng = np.random.default_rng(11)
+    price = 100 + np.cumsum(rng.normal(0, 1, periods))
+    return pd.DataFrame({'price': price}, index=pd.date_range('2024-01-01', periods=periods))
+
+def as_float(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+# ---------- TEST: RollingSMA / SeededEMA ----------
+def test_rolling_sma_matches_calc_sma():
+    df = calc_sma(create_price_df(), 12)
+    sma = RollingSMA(12)
+    values = [sma.update(p) for p in df['price']]
+    np.testing.assert_array_equal(values, as_float(df['SMA12']))
+
+def test_rolling_sma_recovers_after_nan():
+    prices = create_price_df()['price'].to_numpy().copy()
+    prices[[20, 21, 70]] = np.nan
+    df = calc_sma(pd.DataFrame({'price': prices}), 12)
+
+    sma = RollingSMA(12)
+    values = [sma.update(p) for p in prices[:100]]
+    restored = RollingSMA.from_snapshot(json.loads(json.dumps(sma.snapshot(), allow_nan=False)))
+    values += restored.update_array(prices[100:]).tolist()
+
+    assert np.array_equal(values, df['SMA12'].to_numpy(), equal_nan=True)
+    assert not np.isnan(values[-1])
+
+def test_seeded_ema_matches_calc_ema():
+    df = calc_ema(create_price_df(), 26)
+    ema = SeededEMA(26)
+    values = [ema.update(p) for p in df['price']]
+    np.testing.assert_array_equal(values, as_float(df['EMA26']))
+
+# ---------- TEST: IncrementalStrategy ----------
+@pytest.mark.parametrize('method', ['EMA', 'SMA'])
+def test_incremental_strategy_matches_batch(method):
+    df = create_price_df()
+    batch = identify_trades(calc_macd_histogram(df.copy(), method), hist_col=f'Histogram_{method}')
+
+    strategy = IncrementalStrategy(method)
+    rows = strategy.update_many(df['price'])
+    stream = pd.DataFrame(rows, index=df.index)
+
+    for col in [f'{method}12', f'{method}26', f'MACD_{method}', f'MACD9_{method}', f'Histogram_{method}']:
+        np.testing.assert_array_equal(stream[col], as_float(batch[col]))
+
+    # The batch function forces a SELL on the last row, the stream reports it through close_position
+    trade_cols = ['trade_action', 'trade_price', 'entry_price', 'trade_id']
+    for col in trade_cols:
+        assert [row[col] for row in rows[:-1]] == batch[col].iloc[:-1].tolist()
+    forced = strategy.close_position()
+    if forced is not None:
+        assert batch['trade_action'].iloc[-1] == 'SELL'
+        assert forced['entry_price'] == batch['entry_price'].iloc[-1]
+
+def test_snapshot_restore_continues_identically():
+    prices = create_price_df()['price'].tolist()
+    full = IncrementalStrategy('EMA')
+    expected = full.update_many(prices)
+
+    first = IncrementalStrategy('EMA')
+    first.update_many(prices[:150])
+    state = json.loads(json.dumps(first.snapshot(), allow_nan=False))
+    restored = IncrementalStrategy.from_snapshot(state)
+
+    assert restored.update_many(prices[150:]) == expected[150:]
+
+def test_snapshot_during_warm_up_is_plain_json():
+    # NaN seed values, EMA and histogram are stored as None in every part of the state
+    strategy = IncrementalStrategy('EMA')
+    strategy.update_many([np.nan, 101.0, 102.5, 99.0])
+    state = json.loads(json.dumps(strategy.snapshot(), allow_nan=False))
+    assert state['macd']['short_ma']['seed_values'][0] is None
+    assert state['macd']['short_ma']['value'] is None and state['signal']['prev_hist'] is None
+
+    prices = create_price_df()['price'].tolist()
+    restored = IncrementalStrategy.from_snapshot(state)
+    pd.testing.assert_frame_equal(pd.DataFrame(restored.update_many(prices)),
+                                  pd.DataFrame(strategy.update_many(prices)))
+
+# ---------- TEST: update_array ----------
+@pytest.mark.parametrize('method', ['EMA', 'SMA'])
+def test_update_array_blocks_match_per_bar_updates(method):
+    prices = create_price_df()['price'].to_numpy()
+    per_bar = pd.DataFrame(IncrementalStrategy(method).update_many(prices))
+
+    blocks = IncrementalStrategy(method)
+    parts = [pd.DataFrame(blocks.update_array(prices[start:stop]))
+             for start, stop in [(0, 5), (5, 40), (40, 41), (41, 300)]]
+    result = pd.concat(parts, ignore_index=True)
+
+    for col in [f'{method}12', f'{method}26', f'MACD9_{method}', f'Histogram_{method}']:
+        np.testing.assert_array_equal(result[col], per_bar[col].astype(float))
+    assert result['trade_action'].tolist() == per_bar['trade_action'].tolist()
+    assert [v for v in result['trade_id'] if v is not None] == per_bar['trade_id'].dropna().tolist()
@@ -0,0 +1,87 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from indicator_bank import IndicatorBank, fingerprint, rolling_means
+from indicators import calc_sma, calc_ema, sma_array, ema_array
+
+def create_prices(periods=1000, seed=12):
+    rng = np.random.default_rng(seed)
+    return 100 + np.cumsum(rng.normal(0, 1, periods))
+
+# ---------- TEST: fingerprint ----------
+def test_fingerprint():
+    prices = create_prices()
+    assert fingerprint(prices) == fingerprint(prices.copy())
+    changed = prices.copy()
+    changed[500] += 1e-9
+    assert fingerprint(changed) != fingerprint(prices)
+    assert fingerprint(prices.astype(np.float32)) != fingerprint(prices)
+
+# ---------- TEST: rolling_means ----------
+def test_rolling_means_match_sma_array():
+    prices = create_prices()
+    prices[300:303] = np.nan
+    results = rolling_means(prices, [5, 12, 26, 200, 2000])
+    for period, sma in results.items():
+        np.testing.assert_allclose(sma, sma_array(prices, period), rtol=1e-12)
+        np.testing.assert_array_equal(np.isnan(sma), np.isnan(sma_array(prices, period)))
+
+# ---------- TEST: IndicatorBank ----------
+def test_bank_hits_and_exact_values():
+    prices = create_prices()
+    bank = IndicatorBank()
+    first = bank.get_many(prices, 'EMA', [12, 26])
+    again = bank.get_many(prices.copy(), 'ema', [26, 12])
+    assert bank.info()['misses'] == 2 and bank.info()['hits'] == 2
+    assert again[12] is first[12]
+    np.testing.assert_array_equal(first[26], ema_array(prices, 26))
+    with pytest.raises(ValueError):
+        first[12][0] = 1.0  # Cached arrays are read-only
+
+    df = pd.DataFrame({'price': prices})
+    expected = calc_sma(calc_ema(df.copy(), 12), 26)
+    result = bank.calc_sma(bank.calc_ema(df.copy(), 12), 26)
+    pd.testing.assert_frame_equal(result, expected)
+    assert bank.info()['hits'] == 3
+
+def test_bank_many_emas_match_ema_array():
+    prices = create_prices()
+    prices[:3] = np.nan
+    prices[500] = np.nan
+    results = IndicatorBank().get_many(prices, 'EMA', [3, 12, 26, 9, 2000])
+    for period, ema in results.items():
+        np.testing.assert_array_equal(ema, ema_array(prices, period))
+        assert ema.flags.c_contiguous
+
+def test_bank_inexact_sma_uses_rolling_means():
+    prices = create_prices()
+    bank = IndicatorBank(exact=False)
+    results = bank.get_many(prices, 'SMA', [10, 20, 50])
+    for period in (10, 20, 50):
+        np.testing.assert_allclose(results[period], sma_array(prices, period), rtol=1e-12)
+
+def test_bank_lru_eviction():
+    prices = create_prices()
+    bank = IndicatorBank(max_bytes=2 * prices.nbytes)
+    bank.get(prices, 'SMA', 5)
+    bank.get(prices, 'SMA', 10)
+    bank.get(prices, 'SMA', 5)   # 5 becomes the most recently used
+    bank.get(prices, 'SMA', 20)  # Drops 10
+    assert len(bank) == 2 and bank.nbytes <= bank.max_bytes
+    assert bank.info()['evictions'] == 1
+
+    hits = bank.hits
+    bank.get(prices, 'SMA', 5)
+    assert bank.hits == hits + 1
+    bank.get(prices, 'SMA', 10)
+    assert bank.misses == 4
+
+    # Too large to cache at all: still returned
+    tiny = IndicatorBank(max_bytes=10)
+    np.testing.assert_array_equal(tiny.get(prices, 'SMA', 5), sma_array(prices, 5))
+    assert len(tiny) == 0
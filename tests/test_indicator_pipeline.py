@@ -0,0 +1,43 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from indicator_pipeline import build_indicator_graph, compute_indicators
+from indicators import calc_ema, calc_macd_histogram
+
+# Helper to create a noisy price series
+def create_price_df(periods=200):
+    rng = np.random.default_rng(2)
+    price = 100 + np.cumsum(rng.normal(0, 1, periods))
+    return pd.DataFrame({'price': price}, index=pd.date_range('2024-01-01', periods=periods))
+
+# ---------- TEST: build_indicator_graph ----------
+def test_graph_computes_shared_inputs_once():
+    steps = build_indicator_graph(['Histogram_EMA', 'MACD_EMA', 'EMA12'])
+    names = [name for name, _ in steps]
+    assert names == ['EMA12', 'EMA26', 'MACD_EMA', 'MACD9_EMA', 'Histogram_EMA']
+
+def test_graph_rejects_unknown_column():
+    with pytest.raises(ValueError):
+        build_indicator_graph(['RSI14'])
+
+# ---------- TEST: compute_indicators ----------
+def test_compute_indicators_only_adds_requested_columns():
+    df = compute_indicators(create_price_df(), ['Histogram_EMA', 'Histogram_SMA'])
+    assert list(df.columns) == ['price', 'Histogram_EMA', 'Histogram_SMA']
+
+    expected = create_price_df()
+    for method in ['EMA', 'SMA']:
+        expected = calc_macd_histogram(expected, method)
+        assert df[f'Histogram_{method}'].equals(expected[f'Histogram_{method}'])
+
+def test_compute_indicators_custom_periods():
+    df = compute_indicators(create_price_df(), ['EMA50', 'MACD9_EMA'], short_period=5, long_period=35, signal_period=4)
+    expected = calc_ema(create_price_df(), 50)
+    expected = calc_macd_histogram(expected, 'EMA', 5, 35, 4)
+    assert df['EMA50'].equals(expected['EMA50'])
+    assert df['MACD9_EMA'].equals(expected['MACD9_EMA'])
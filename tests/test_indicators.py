@@ -11,7 +11,13 @@ from indicators import (
     calc_ema,
     calc_macd,
     calc_macd9,
-    compute_histogram
+    compute_histogram,
+    calc_macd_histogram,
+    sma_array,
+    ema_array,
+    sma_matrix,
+    ema_matrix,
+    calc_macd_histogram_matrix
 )
 
 # Helper to create consistent price data
@@ -62,4 +68,102 @@ def test_compute_histogram_output():
     df = calc_macd9(df, macd_key='MACD_EMA')
     df = compute_histogram(df, macd_key='MACD_EMA')
     assert 'Histogram_EMA' in df.columns
-    assert df['Histogram_EMA'].iloc[-1] == df['MACD_EMA'].iloc[-1] - df['MACD9_EMA'].iloc[-1]
\ No newline at end of file
+    assert df['Histogram_EMA'].iloc[-1] == df['MACD_EMA'].iloc[-1] - df['MACD9_EMA'].iloc[-1]
+
+# ---------- TEST: calc_macd_histogram ----------
+def test_calc_macd_histogram_matches_manual_chain():
+    manual = create_df()
+    manual = calc_sma(manual, 12)
+    manual = calc_sma(manual, 26)
+    manual = calc_macd(manual, method='SMA')
+    manual = calc_macd9(manual, macd_key='MACD_SMA')
+    manual = compute_histogram(manual, macd_key='MACD_SMA')
+
+    result = calc_macd_histogram(create_df(), method='SMA')
+    pd.testing.assert_series_equal(result['Histogram_SMA'], manual['Histogram_SMA'])
+
+# ---------- TEST: ema_array / sma_array kernels ----------
+def test_calc_ema_uses_nan_float_column_for_warm_up():
+    df = calc_ema(create_df(), 12)
+    assert df['EMA12'].dtype == np.float64
+    assert df['EMA12'].iloc[:11].isna().all()
+    assert df['EMA12'].iloc[11] == sum(range(100, 112)) / 12
+
+def test_ema_array_out_and_inplace_match_default():
+    values = np.random.default_rng(1).normal(100, 5, 500)
+    expected = ema_array(values, 26)
+
+    out = np.empty_like(values)
+    result = ema_array(values, 26, out=out)
+    assert result is out
+    np.testing.assert_array_equal(out, expected)
+
+    work = values.copy()
+    result = ema_array(work, 26, inplace=True)
+    assert result is work
+    np.testing.assert_array_equal(work, expected)
+
+def test_kernels_float32():
+    values = np.random.default_rng(1).normal(100, 5, 500)
+    ema = ema_array(values, 12, dtype=np.float32)
+    sma = sma_array(values, 12, dtype=np.float32)
+    assert ema.dtype == np.float32 and sma.dtype == np.float32
+    np.testing.assert_allclose(ema, ema_array(values, 12), rtol=1e-5)
+    np.testing.assert_allclose(sma, sma_array(values, 12), rtol=1e-5)
+
+def test_ema_array_shorter_than_period():
+    assert np.isnan(ema_array([1.0, 2.0], 5)).all()
+
+# ---------- TEST: dates x symbols matrix ----------
+def create_panel(starts=(0, 5, 37, 100, 290, 300)):
+    rng = np.random.default_rng(3)
+    periods = 300
+    panel = pd.DataFrame({f'S{i}': 100 + np.cumsum(rng.normal(0, 1, periods)) for i in range(len(starts))},
+                         index=pd.date_range('2020-01-01', periods=periods))
+    for col, start in zip(panel.columns, starts):
+        panel.loc[panel.index[:start], col] = np.nan
+    panel.iloc[120:125, 0] = np.nan  # Gap in the middle of one symbol
+    return panel, starts
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_matrix_kernels_match_each_column(dtype):
+    panel, starts = create_panel()
+    values = panel.to_numpy()
+    for period in [9, 26]:
+        ema = ema_matrix(values, period, dtype=dtype)
+        sma = sma_matrix(values, period, dtype=dtype)
+        assert ema.dtype == dtype
+        for j, start in enumerate(starts):
+            assert np.isnan(ema[:start, j]).all()
+            np.testing.assert_array_equal(ema[start:, j], ema_array(values[start:, j], period, dtype=dtype))
+            np.testing.assert_array_equal(sma[start:, j], sma_array(values[start:, j], period, dtype=dtype))
+
+    # 2-D input to the array kernels goes through the matrix functions
+    np.testing.assert_array_equal(ema_array(values, 12), ema_matrix(values, 12))
+    np.testing.assert_array_equal(sma_array(values, 12), sma_matrix(values, 12))
+
+def test_ema_matrix_period_per_column():
+    panel, starts = create_panel()
+    values = panel.to_numpy()
+    periods = [9, 26, 9, 12, 26, 5]
+    ema = ema_matrix(values, periods)
+    for j, period in enumerate(periods):
+        np.testing.assert_array_equal(ema[:, j], ema_matrix(values[:, [j]], period)[:, 0])
+    with pytest.raises(ValueError):
+        ema_matrix(values, [9, 26])
+
+@pytest.mark.parametrize('method', ['EMA', 'SMA'])
+def test_calc_macd_histogram_matrix_matches_single_series(method):
+    panel, starts = create_panel()
+    result = calc_macd_histogram_matrix(panel, method)
+    assert set(result) == {f'{method}12', f'{method}26', f'MACD_{method}', f'MACD9_{method}', f'Histogram_{method}'}
+
+    for col, start in zip(panel.columns, starts):
+        hist = result[f'Histogram_{method}'][col]
+        if start >= len(panel):
+            assert hist.isna().all()
+            continue
+        single = calc_macd_histogram(panel[[col]].iloc[start:].rename(columns={col: 'price'}), method)
+        for name, frame in result.items():
+            assert frame[col].iloc[:start].isna().all()
+            np.testing.assert_array_equal(frame[col].iloc[start:].to_numpy(), single[name].to_numpy())
@@ -0,0 +1,90 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import instrumentation
+from instrumentation import (stage, register_hook, unregister_hook, EventRecorder, JsonLinesHook, read_events,
+                             SamplingProfiler, summarize_events)
+import trading_strategy
+from trading_strategy import run_trading_strategy, run_backtest
+
+def create_price_df(periods=300):
+    rng = np.random.default_rng(2)
+    dates = pd.date_range('2020-01-01', periods=periods)
+    return pd.DataFrame({'price': 100 + np.cumsum(rng.normal(0, 1, periods))}, index=dates)
+
+# ---------- TEST: stage without hooks ----------
+def test_stage_without_hooks_is_noop():
+    with stage('anything', 10) as s:
+        s.rows = 5
+    assert stage('a') is stage('b')
+    assert stage('a').rows is None
+
+# ---------- TEST: stage event ----------
+def test_stage_event_fields():
+    recorder = EventRecorder()
+    with stage('step', hooks=[recorder], run_id='abc', strategy='EMA') as s:
+        time.sleep(0.01)
+        s.rows = 42
+    event, = recorder.events
+    assert event['event'] == 'stage'
+    assert event['stage'] == 'step'
+    assert event['run_id'] == 'abc'
+    assert event['rows'] == 42
+    assert event['strategy'] == 'EMA'
+    assert event['wall_time'] >= 0.01
+    assert event['cpu_time'] >= 0
+    assert event['error'] is None
+
+# ---------- TEST: stage error ----------
+def test_stage_records_error():
+    recorder = EventRecorder()
+    try:
+        with stage('fails', hooks=[recorder]):
+            raise ValueError("bad")
+    except ValueError:
+        pass
+    assert recorder.events[0]['error'] == 'ValueError: bad'
+
+# ---------- TEST: run_trading_strategy hooks ----------
+def test_run_trading_strategy_emits_stages(monkeypatch):
+    monkeypatch.setattr(trading_strategy, 'get_strategy_choice', lambda: 'EMA')
+    recorder = EventRecorder()
+    run_trading_strategy(create_price_df(), hooks=[recorder])
+    stages = recorder.to_frame()
+    assert stages['stage'].tolist() == ['indicators', 'identify_trades', 'get_executed_trades',
+                                        'calculate_trade_profit']
+    assert stages['run_id'].nunique() == 1
+
+# ---------- TEST: registered hooks ----------
+def test_registered_hook_and_json_lines(tmp_path):
+    path = tmp_path / 'events.jsonl'
+    hook = register_hook(JsonLinesHook(str(path)))
+    try:
+        run_backtest(create_price_df())
+        run_backtest(create_price_df(), 'SMA')
+    finally:
+        unregister_hook(hook)
+    assert instrumentation._HOOKS == []
+
+    events = read_events(str(path))
+    assert len(events) == 8
+    summary = summarize_events(events)
+    assert summary.loc['identify_trades', 'count'] == 2
+    assert summary.loc['indicators', 'rows_total'] == 600
+
+# ---------- TEST: sampling profiler ----------
+def test_sampling_profiler():
+    with SamplingProfiler(interval=0.001) as profiler:
+        end = time.perf_counter() + 0.1
+        while time.perf_counter() < end:
+            sum(range(1000))
+    assert profiler.samples > 0
+    assert profiler.top(1)[0][1] > 0
+    event = profiler.to_event('abc')
+    assert event['event'] == 'profile'
+    assert sum(event['stacks'].values()) == profiler.samples
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+import subprocess
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import indicators
+from kernels import rolling_mean, ewm_mean
+from indicators import calc_macd_histogram, macd_histogram_array
+from lazy_imports import LazyModule, lazy_module
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def random_series(seed, n=300):
+    rng = np.random.default_rng(seed)
+    values = 100 + rng.normal(0, 1, n).cumsum()
+    values[rng.random(n) < 0.05] = np.nan
+    values[:3] = np.nan
+    values[50:60] = values[50]  # constant run
+    return values
+
+# ---------- TEST: rolling_mean / ewm_mean ----------
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('period', [1, 2, 9, 26])
+def test_kernels_match_pandas_bit_for_bit(seed, period):
+    values = random_series(seed)
+
+    sma = rolling_mean(values, period)
+    ema = ewm_mean(values, period)
+
+    assert np.array_equal(sma, pd.Series(values).rolling(window=period).mean().to_numpy(), equal_nan=True)
+    assert np.array_equal(ema, pd.Series(values).ewm(span=period, adjust=False).mean().to_numpy(), equal_nan=True)
+
+def test_kernels_short_and_empty_input():
+    assert np.isnan(rolling_mean(np.array([1.0, 2.0]), 5)).all()
+    assert len(rolling_mean(np.array([]), 3)) == 0
+    assert len(ewm_mean(np.array([]), 3)) == 0
+
+# ---------- TEST: macd_histogram_array ----------
+@pytest.mark.parametrize('method', ['EMA', 'SMA'])
+def test_macd_histogram_array_kernels_match_dataframe_chain(monkeypatch, method):
+    prices = random_series(3)
+    df = calc_macd_histogram(pd.DataFrame({'price': prices}), method)
+
+    monkeypatch.setattr(indicators, '_use_kernels', lambda n_rows: True)
+    result = macd_histogram_array(prices, method)
+
+    for name, values in result.items():
+        assert np.array_equal(values, df[name].to_numpy(), equal_nan=True), name
+
+# ---------- TEST: lean imports ----------
+def test_core_modules_do_not_import_pandas():
+    code = (
+        "import sys, numpy as np\n"
+        "import batch_runner, trading_strategy\n"
+        "from indicators import macd_histogram_array\n"
+        "prices = 100 + np.sin(np.arange(200) / 5)\n"
+        "hist = macd_histogram_array(prices)['Histogram_EMA']\n"
+        "rows = trading_strategy.find_trade_events(hist, prices)[0]\n"
+        "print(len(rows) > 0, 'pandas' in sys.modules)\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert output.split() == ['True', 'False']
+
+def test_lazy_module_imports_on_first_use():
+    module = LazyModule('json')
+    assert 'not loaded' in repr(module)
+    assert module.dumps([1]) == '[1]'
+    assert 'not loaded' not in repr(module)
+    assert lazy_module('numpy') is np
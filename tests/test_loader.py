@@ -10,7 +10,11 @@ from data_loader import (
     import_stock_file,
     validate_and_prepare_data,
     fill_missing_dates,
-    export_stock_file
+    export_stock_file,
+    export_stock_file_async,
+    export_stock_chunks,
+    wait_for_exports,
+    load_stock_files
 )
 
 # ---------- TEST: import_stock_file ----------
@@ -67,6 +71,47 @@ def test_error_when_no_valid_columns():
     with pytest.raises(ValueError):
         validate_and_prepare_data(raw)
 
+# ---------- TEST: load_stock_files ----------
+def create_price_folder(folder):
+    pd.DataFrame({'Date': ['2024-01-01', '2024-01-02'], 'Close': [100.0, 101.0]}).to_csv(folder / "AAA.csv", index=False)
+    pd.DataFrame({'date': ['2024-01-02', '2024-01-03'], 'price': [50.0, 51.0]}).to_csv(folder / "BBB.csv", index=False)
+    pd.DataFrame({'Date': ['2024-01-01', '2024-01-03'], 'Price': [10.0, 12.0]}).to_excel(folder / "CCC.xlsx", index=False)
+    pd.DataFrame({'Date': ['2024-01-01'], 'Close': [20.0]}).to_excel(folder / "DDD.xlsx", index=False)
+    (folder / "BAD.csv").write_text("name,comment\nfoo,bar\n")
+    (folder / "notes.txt").write_text("not a price file")
+
+def test_load_stock_files_folder(tmp_path):
+    create_price_folder(tmp_path)
+
+    frames, errors = load_stock_files(str(tmp_path), max_threads=2, max_processes=2)
+
+    assert sorted(frames) == ['AAA', 'BBB', 'CCC', 'DDD']
+    assert list(errors) == ['BAD']
+    assert frames['AAA']['price'].tolist() == [100.0, 101.0]
+    assert frames['CCC'].index.tolist() == list(pd.to_datetime(['2024-01-01', '2024-01-03']))
+
+def test_load_stock_files_glob_panel(tmp_path):
+    create_price_folder(tmp_path)
+
+    panel, errors = load_stock_files(str(tmp_path / "*.csv"), panel=True)
+
+    assert list(panel.columns) == ['AAA', 'BBB']
+    assert len(panel) == 3 and panel.loc['2024-01-01', 'BBB'] != panel.loc['2024-01-01', 'BBB']  # NaN
+    assert list(errors) == ['BAD']
+
+def test_load_stock_files_same_name_in_two_folders(tmp_path):
+    for folder, price in [('2023', 1.0), ('2024', 2.0)]:
+        (tmp_path / folder).mkdir()
+        pd.DataFrame({'Date': ['2024-01-01'], 'Close': [price]}).to_csv(tmp_path / folder / "AAA.csv", index=False)
+
+    frames, errors = load_stock_files(str(tmp_path / "*" / "AAA.csv"))
+    first, second = str(tmp_path / "2023" / "AAA.csv"), str(tmp_path / "2024" / "AAA.csv")
+    assert sorted(frames) == [first, second] and errors == {}
+    assert frames[first]['price'].tolist() == [1.0] and frames[second]['price'].tolist() == [2.0]
+
+    with pytest.raises(ValueError):
+        load_stock_files([first, first])
+
 # ---------- TEST: fill_missing_dates ----------
 def test_fill_missing_dates():
     dates = pd.to_datetime(['2024-01-01', '2024-01-03'])
@@ -78,6 +123,81 @@ def test_fill_missing_dates():
     assert df_filled['price'].iloc[1] == 100
     assert pd.Timestamp('2024-01-02') in df_filled.index
 
+def create_business_day_df():
+    # Business days of January 2024 with two trading days missing (4th and 15th)
+    dates = pd.bdate_range('2024-01-01', '2024-01-31').delete([3, 10])
+    return pd.DataFrame({'price': range(len(dates)), 'Volume': 1.0}, index=dates.rename('date'))
+
+def test_fill_missing_dates_default_unchanged():
+    df = create_business_day_df()
+    expected = df.asfreq('D')
+    expected['price'] = expected['price'].ffill()
+    pd.testing.assert_frame_equal(fill_missing_dates(df), expected)
+
+def test_fill_missing_dates_keeps_rows_off_the_grid():
+    # Weekly grid anchored on Sundays: the business days in between must stay
+    df = create_business_day_df()
+    weekly = fill_missing_dates(df, freq='W')
+    assert set(df.index) <= set(weekly.index)
+    assert weekly.index.is_monotonic_increasing
+    assert pd.Timestamp('2024-01-07') in weekly.index
+    assert weekly.loc['2024-01-07', 'price'] == df.loc['2024-01-05', 'price']
+    assert weekly.loc[df.index, 'price'].tolist() == df['price'].tolist()
+
+def test_fill_missing_dates_business_calendar():
+    df = create_business_day_df()
+    filled = fill_missing_dates(df, calendar='business')
+    assert len(filled) == len(df) + 2
+    assert (filled.index.dayofweek < 5).all()
+    assert filled.loc['2024-01-04', 'price'] == filled.loc['2024-01-03', 'price']
+    assert pd.isna(filled.loc['2024-01-04', 'Volume'])
+    assert filled.index.name == 'date'
+
+    holiday = fill_missing_dates(df, calendar='business', holidays=['2024-01-15'])
+    assert pd.Timestamp('2024-01-15') not in holiday.index
+    assert len(holiday) == len(df) + 1
+
+    pd.testing.assert_frame_equal(fill_missing_dates(df, calendar='sessions'), df)
+    with pytest.raises(ValueError):
+        fill_missing_dates(df, calendar='weekly')
+
+def test_fill_missing_dates_intraday():
+    bars = pd.to_datetime(['2024-01-02 09:30', '2024-01-02 09:33', '2024-01-02 16:00',
+                           '2024-01-03 10:00', '2024-01-03 10:02', '2024-01-05 09:31'])
+    df = pd.DataFrame({'price': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]}, index=bars)
+
+    # Only between each day's first and last bar, no bars for the missing 4th or overnight
+    filled = fill_missing_dates(df, freq='min', calendar='sessions')
+    assert len(filled) == 391 + 3 + 1
+    assert filled.loc['2024-01-02 09:32', 'price'] == 1.0
+    assert filled.loc['2024-01-03 10:01', 'price'] == 4.0
+    assert pd.Timestamp('2024-01-02 16:01') not in filled.index
+
+    # Full session hours on every business day, keeping the bars that are off the hourly grid
+    hourly = fill_missing_dates(df, freq='h', calendar='business', session_start='09:30', session_end='16:00')
+    assert pd.Timestamp('2024-01-04 12:30') in hourly.index
+    assert hourly.loc['2024-01-04 12:30', 'price'] == 5.0
+    assert set(df.index) <= set(hourly.index)
+    assert hourly.index.is_monotonic_increasing
+
+def test_fill_missing_dates_intraday_time_zone():
+    bars = pd.to_datetime(['2024-03-08 09:30', '2024-03-08 09:33', '2024-03-08 16:00',
+                           '2024-03-11 10:00', '2024-03-11 10:02', '2024-03-12 09:31'])
+    naive = pd.DataFrame({'price': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]}, index=bars)
+    df = naive.tz_localize('America/New_York')
+
+    # Same bars on the local clock as for the naive index, across the daylight saving change of the 10th
+    for calendar in ['sessions', 'business', 'all']:
+        filled = fill_missing_dates(df, freq='min', calendar=calendar)
+        expected = fill_missing_dates(naive, freq='min', calendar=calendar).tz_localize('America/New_York')
+        pd.testing.assert_frame_equal(filled, expected)
+
+    hourly = fill_missing_dates(df, freq='h', calendar='business', session_start='09:30', session_end='16:00')
+    assert str(hourly.index.tz) == 'America/New_York'
+    assert pd.Timestamp('2024-03-11 12:30', tz='America/New_York') in hourly.index
+    assert set(df.index) <= set(hourly.index)
+    assert hourly.index.is_monotonic_increasing
+
 # ---------- TEST: export_stock_file ----------
 def test_export_stock_file_creates_file(tmp_path):
     df = pd.DataFrame({'price': [100, 101]}, index=pd.to_datetime(['2024-01-01', '2024-01-02']))
@@ -96,4 +216,72 @@ def test_export_stock_file_versions(tmp_path):
 
     assert os.path.exists(base_path)
     versioned_path = tmp_path / "test_output_1.csv"
-    assert os.path.exists(versioned_path)
\ No newline at end of file
+    assert os.path.exists(versioned_path)
+def test_export_stock_file_overwrite(tmp_path):
+    df = pd.DataFrame({'price': [100, 101]}, index=pd.to_datetime(['2024-01-01', '2024-01-02']))
+
+    base_path = tmp_path / "test_output.csv"
+    export_stock_file(df, str(base_path))
+    path = export_stock_file(df, str(base_path), overwrite=True)
+
+    assert path == str(base_path)
+    assert not os.path.exists(tmp_path / "test_output_1.csv")
+
+def test_export_stock_file_versions_fill_first_gap(tmp_path):
+    df = pd.DataFrame({'price': [100, 101]}, index=pd.to_datetime(['2024-01-01', '2024-01-02']))
+    for name in ["out.csv", "out_1.csv", "out_3.csv"]:
+        (tmp_path / name).write_text("x")
+
+    path = export_stock_file(df, str(tmp_path / "out.csv"))
+    assert path == str(tmp_path / "out_2.csv")
+
+def test_export_stock_file_binary_formats(tmp_path):
+    pytest.importorskip('pyarrow')
+    df = pd.DataFrame({'price': [100.0, 101.5]}, index=pd.to_datetime(['2024-01-01', '2024-01-02']))
+    df.index.name = 'date'
+
+    parquet = export_stock_file(df, str(tmp_path / "out.parquet"), compression='zstd')
+    pd.testing.assert_frame_equal(pd.read_parquet(parquet), df)
+
+    feather = export_stock_file(df, str(tmp_path / "out.feather"))
+    pd.testing.assert_frame_equal(pd.read_feather(feather).set_index('date'), df)
+
+def test_export_stock_file_pickle(tmp_path):
+    df = pd.DataFrame({'price': [100.0, 101.5]}, index=pd.to_datetime(['2024-01-01', '2024-01-02']))
+    path = export_stock_file(df, str(tmp_path / "out.pkl"))
+    pd.testing.assert_frame_equal(pd.read_pickle(path), df)
+
+def test_export_stock_file_async_matches_sync(tmp_path):
+    df = pd.DataFrame({'price': [100.0, 101.5]}, index=pd.to_datetime(['2024-01-01', '2024-01-02']))
+
+    first = export_stock_file_async(df, str(tmp_path / "out.csv"))
+    second = export_stock_file_async(df, str(tmp_path / "out.csv"))
+    df['price'] = 0  # the background export keeps its own copy
+    paths = wait_for_exports()
+
+    assert paths == [str(tmp_path / "out.csv"), str(tmp_path / "out_1.csv")]
+    assert first.result() == paths[0] and second.result() == paths[1]
+    sync = export_stock_file(pd.DataFrame({'price': [100.0, 101.5]}, index=df.index), str(tmp_path / "sync.csv"))
+    assert open(paths[0]).read() == open(sync).read()
+
+@pytest.mark.parametrize('name,compression', [('out.csv', None), ('out.csv', 'gzip'), ('out.csv', 'bz2'),
+                                              ('out.csv', 'xz'), ('out.parquet', None)])
+def test_export_stock_chunks(tmp_path, name, compression):
+    if name.endswith('.parquet'):
+        pytest.importorskip('pyarrow')
+    df = pd.DataFrame({'price': range(10)}, index=pd.date_range('2024-01-01', periods=10, name='date'))
+    chunks = [df.iloc[i:i + 3] for i in range(0, 10, 3)]
+
+    path = export_stock_chunks(chunks, str(tmp_path / name), compression=compression)
+
+    if name.endswith('.parquet'):
+        result = pd.read_parquet(path)
+    else:
+        result = pd.read_csv(path, index_col='date', parse_dates=True, compression=compression)
+    pd.testing.assert_frame_equal(result, df, check_freq=False)
+
+def test_export_stock_chunks_unsupported_csv_compression(tmp_path):
+    df = pd.DataFrame({'price': [1.0]}, index=pd.date_range('2024-01-01', periods=1, name='date'))
+    with pytest.raises(ValueError, match='Unsupported CSV compression'):
+        export_stock_chunks([df], str(tmp_path / "out.csv"), compression='zip')
+    assert not os.path.exists(tmp_path / "out.csv")
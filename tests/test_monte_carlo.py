@@ -0,0 +1,60 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from monte_carlo import simulate_paths, histogram_paths, trade_paths, run_monte_carlo
+from trading_strategy import run_backtest
+
+def create_price_df(periods=400, seed=8):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2019-01-01', periods=periods)
+    return pd.DataFrame({'price': 100 * np.exp(np.cumsum(rng.normal(0, 0.01, periods)))}, index=dates)
+
+# ---------- TEST: simulate_paths ----------
+def test_simulate_paths_shape_and_start():
+    prices = create_price_df()['price'].to_numpy()
+    for simulation in ['bootstrap', 'gbm']:
+        paths = simulate_paths(prices, 50, simulation=simulation, block_size=5, rng=1)
+        assert paths.shape == (50, 400)
+        assert np.allclose(paths[:, 0], prices[0])
+        assert (paths > 0).all()
+    np.testing.assert_array_equal(simulate_paths(prices, 5, 30, rng=2), simulate_paths(prices, 5, 30, rng=2))
+    with pytest.raises(ValueError):
+        simulate_paths(prices, 5, simulation='other')
+
+# ---------- TEST: paths match run_backtest ----------
+@pytest.mark.parametrize('method', ['EMA', 'SMA'])
+def test_paths_match_single_backtests(method):
+    paths = simulate_paths(create_price_df()['price'].to_numpy(), 40, block_size=3, rng=5)
+    hist = histogram_paths(paths, method)
+    results = trade_paths(paths, hist, fee=0.002)
+
+    for i in range(len(paths)):
+        df, trades, profit, buy_hold = run_backtest(pd.DataFrame({'price': paths[i]}), method, fee=0.002)
+        np.testing.assert_array_equal(hist[:, i], df[f'Histogram_{method}'].to_numpy())
+        assert results['profit'][i] == pytest.approx(profit, abs=1e-9)
+        assert results['buy_hold'][i] == buy_hold
+        assert results['n_trades'][i] == len(trades)
+
+def test_n_trades_counts_trade_rows():
+    paths = np.array([[10.0, 10.0, 11.0, 12.0, 13.0], [10.0, 10.0, 11.0, 12.0, 13.0]])
+    hist = np.array([[np.nan, np.nan], [-1.0, -1.0], [1.0, -1.0], [2.0, -1.0], [3.0, 1.0]])
+    # Path 0: BUY, then SELL forced on the last row. Path 1: a BUY on the last row becomes a lone SELL row.
+    assert trade_paths(paths, hist)['n_trades'].tolist() == [2, 1]
+
+# ---------- TEST: run_monte_carlo ----------
+def test_run_monte_carlo_batches():
+    df = create_price_df()
+    results, summary = run_monte_carlo(df, n_paths=250, batch_size=100, seed=11)
+    assert len(results) == 250
+    assert list(summary.index) == ['profit', 'buy_hold', 'excess_profit']
+    assert summary.loc['profit', 'mean'] == pytest.approx(results['profit'].mean())
+    assert 0 <= summary['beat_buy_hold'].iloc[0] <= 1
+    np.testing.assert_allclose(results['excess_profit'], results['profit'] - results['buy_hold'])
+
+    again, _ = run_monte_carlo(df, n_paths=250, batch_size=100, seed=11)
+    pd.testing.assert_frame_equal(again, results)
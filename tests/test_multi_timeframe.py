@@ -0,0 +1,95 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from indicators import calc_macd_histogram
+from multi_timeframe import (period_codes, aggregate_bars, align_to_base, multi_timeframe_histograms,
+                             add_timeframe_histograms, timeframe_agreement)
+
+def create_business_day_prices(periods=900, seed=4):
+    # 900 business days end on Tuesday 2021-06-15, in the middle of every timeframe's last period
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2018-01-03', periods=periods, name='date')
+    return pd.DataFrame({'price': 100 + np.cumsum(rng.normal(0, 1, periods))}, index=index)
+
+# ---------- TEST: aggregate_bars ----------
+def test_aggregate_bars_matches_resample():
+    df = create_business_day_prices()
+    bars = aggregate_bars(df, ('W', 'M', 'Q', 'Y'))
+
+    for timeframe, rule in [('W', 'W'), ('M', 'ME'), ('Q', 'QE'), ('Y', 'YE')]:
+        expected = df['price'].resample(rule).last().dropna()
+        assert bars[timeframe]['close'].tolist() == expected.iloc[:-1].tolist()  # Running period left out
+        assert bars[timeframe]['bar_of_row'][-1] == len(expected) - 1
+
+def test_aggregate_bars_last_period():
+    # Ends on Friday 2021-06-11: the week is over, the month is not
+    df = create_business_day_prices().loc[:'2021-06-11']
+    bars = aggregate_bars(df, ('W', 'M'))
+    assert bars['W']['end_rows'][-1] == len(df) - 1
+    assert bars['M']['end_rows'][-1] < len(df) - 1
+
+    # Ends on Wednesday 2021-06-30: the month is over
+    month_end = create_business_day_prices(periods=911)
+    assert month_end.index[-1] == pd.Timestamp('2021-06-30')
+    assert aggregate_bars(month_end, ('M',))['M']['end_rows'][-1] == len(month_end) - 1
+
+def test_period_codes_use_local_time():
+    # Midnight in Tokyo is still the previous day (and month) in UTC
+    local = pd.DatetimeIndex(['2024-01-31 23:30', '2024-02-01 00:30', '2024-02-05 00:30'])
+    aware = local.tz_localize('Asia/Tokyo')
+    expected = period_codes(local, ('W', 'M'))
+    for timeframe, codes in period_codes(aware, ('W', 'M')).items():
+        assert codes.tolist() == expected[timeframe].tolist()
+    assert expected['M'][0] != expected['M'][1] and expected['W'][1] != expected['W'][2]
+
+# ---------- TEST: multi_timeframe_histograms ----------
+@pytest.mark.parametrize('method', ['EMA', 'SMA'])
+def test_histograms_match_resampled_pipeline(method):
+    df = create_business_day_prices()
+    histograms = multi_timeframe_histograms(df, ('W', 'M'), method, short_period=5, long_period=10, signal_period=3)
+
+    base = calc_macd_histogram(df.copy(), method, 5, 10, 3)[f'Histogram_{method}'].to_numpy()
+    assert np.array_equal(histograms['base'], base, equal_nan=True)
+
+    weekly = calc_macd_histogram(df['price'].resample('W').last().dropna().to_frame(), method, 5, 10, 3)
+    week_end_rows = np.flatnonzero(np.diff(df.index.to_period('W').asi8, append=-1) != 0)
+    expected = weekly[f'Histogram_{method}'].to_numpy()
+    assert np.array_equal(histograms['W'][week_end_rows[:-1]], expected[:-1], equal_nan=True)
+
+    # The running week shows the last completed one until it is over (no repainting)
+    running_week = histograms['W'][week_end_rows[-2] + 1:]
+    assert np.array_equal(running_week, np.full(len(running_week), expected[-2]), equal_nan=True)
+
+def test_no_lookahead():
+    df = create_business_day_prices()
+    before = multi_timeframe_histograms(df)
+
+    changed = df.copy()
+    changed.iloc[600:, 0] += 50  # Only prices from row 600 on change
+    after = multi_timeframe_histograms(changed)
+
+    for timeframe in ['base', 'W', 'M']:
+        assert np.array_equal(before[timeframe][:600], after[timeframe][:600], equal_nan=True)
+
+def test_align_to_base_uses_completed_bars():
+    # Bars: rows 0-2, 3-4, 5
+    aligned = align_to_base([10.0, 20.0, 30.0], np.array([0, 0, 0, 1, 1, 2]), np.array([2, 4, 5]))
+    assert np.isnan(aligned[:2]).all()
+    assert aligned[2:].tolist() == [10.0, 10.0, 20.0, 30.0]
+
+def test_add_timeframe_histograms_columns():
+    df = create_business_day_prices(300)
+    result = add_timeframe_histograms(df, ('W',), 'SMA')
+    assert result is df
+    assert 'Histogram_SMA_W' in df.columns and len(df.columns) == 2
+
+# ---------- TEST: timeframe_agreement ----------
+def test_timeframe_agreement():
+    agreement = timeframe_agreement({'base': np.array([1.0, -1.0, 1.0, np.nan]),
+                                     'W': np.array([2.0, -3.0, -1.0, 1.0])})
+    assert agreement.tolist() == [1, -1, 0, 0]
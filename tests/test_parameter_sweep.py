@@ -0,0 +1,43 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from parameter_sweep import build_parameter_grid, sweep_parameters
+from trading_strategy import run_backtest
+
+# Helper to create a noisy price series with plenty of crossovers
+def create_price_df(periods=300):
+    rng = np.random.default_rng(7)
+    price = 100 + np.cumsum(rng.normal(0, 1, periods))
+    return pd.DataFrame({'price': price}, index=pd.date_range('2024-01-01', periods=periods))
+
+# ---------- TEST: build_parameter_grid ----------
+def test_build_parameter_grid_skips_invalid_periods():
+    grid = build_parameter_grid(short_periods=(5, 30), long_periods=(26,), signal_periods=(9,), methods=('ema',))
+    assert grid == [('EMA', 5, 26, 9)]
+
+# ---------- TEST: sweep_parameters ----------
+@pytest.mark.parametrize('max_workers', [0, 2])
+def test_sweep_matches_single_backtest(max_workers):
+    df = create_price_df()
+    results = sweep_parameters(df, short_periods=(8, 12), long_periods=(26,), signal_periods=(9,),
+                               fees=(0.001, 0.00125), max_workers=max_workers)
+
+    assert len(results) == 8
+    assert results['rank'].tolist() == list(range(1, 9))
+    assert results['profit'].is_monotonic_decreasing
+
+    for method in ('EMA', 'SMA'):
+        _, trades, profit, buy_hold = run_backtest(df.copy(), method, 12, 26, 9, fee=0.00125)
+        row = results[(results['method'] == method) & (results['short_period'] == 12) & (results['fee'] == 0.00125)]
+        assert row['profit'].iloc[0] == profit
+        assert row['buy_hold'].iloc[0] == buy_hold
+        assert row['n_trades'].iloc[0] == len(trades)
+
+def test_sweep_rejects_empty_grid():
+    with pytest.raises(ValueError):
+        sweep_parameters(create_price_df(), short_periods=(30,), long_periods=(26,), max_workers=0)
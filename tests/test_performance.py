@@ -0,0 +1,63 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from performance import equity_curve, trade_pnl, performance_summary
+from indicators import calc_macd_histogram
+from trading_strategy import identify_trades, get_executed_trades, calculate_trade_profit
+
+def create_annotated_df(periods=800, seed=6):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2020-01-01', periods=periods)
+    df = pd.DataFrame({'price': 100 + np.cumsum(rng.normal(0, 1, periods))}, index=dates)
+    return identify_trades(calc_macd_histogram(df, 'EMA'))
+
+# ---------- TEST: equity_curve ----------
+def test_equity_curve_ends_at_profit():
+    df = create_annotated_df()
+    profit, _ = calculate_trade_profit(get_executed_trades(df), df)
+    curve = equity_curve(df)
+    assert curve['equity'].iloc[-1] == profit
+    assert curve['position'].iloc[-1] == 0
+    assert (curve['drawdown'] <= 0).all()
+
+    # Holding exactly between each BUY and its SELL
+    holding = df['trade_action'].ffill().eq('BUY')
+    np.testing.assert_array_equal(curve['position'].to_numpy(), holding.to_numpy().astype(np.int8))
+
+# ---------- TEST: trade_pnl ----------
+def test_trade_pnl_sums_to_profit():
+    df = create_annotated_df()
+    trades = get_executed_trades(df)
+    pnl = trade_pnl(df, trades, fee=0.002)
+    profit, _ = calculate_trade_profit(trades, df, fee=0.002)
+    assert len(pnl) == (trades['action'] == 'SELL').sum()
+    assert pnl['pnl'].sum() == pytest.approx(profit)
+    assert (pnl['exit_date'] > pnl['entry_date']).all()
+    first = pnl.iloc[0]
+    assert first['pnl'] == round(first['exit_price'] * 0.998, 2) - round(first['entry_price'], 2)
+
+# ---------- TEST: performance_summary ----------
+def test_performance_summary():
+    df = create_annotated_df()
+    summary, curve, pnl = performance_summary(df, periods_per_year=365)
+    profit, buy_hold = calculate_trade_profit(get_executed_trades(df), df)
+    assert summary['profit'] == profit
+    assert summary['buy_hold'] == buy_hold
+    assert summary['n_trades'] == len(pnl)
+    assert summary['max_drawdown'] == curve['drawdown'].min()
+    assert 0 < summary['exposure'] < 1
+    assert -1 <= summary['max_drawdown_pct'] <= 0
+
+# ---------- TEST: no trades ----------
+def test_no_trades():
+    df = pd.DataFrame({'price': np.full(50, 10.0)}, index=pd.date_range('2021-01-01', periods=50))
+    df = identify_trades(calc_macd_histogram(df, 'SMA'), hist_col='Histogram_SMA')
+    summary, curve, pnl = performance_summary(df)
+    assert summary['profit'] == 0
+    assert (curve['equity'] == 0).all()
+    assert pnl.empty
@@ -0,0 +1,111 @@
+import sys
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+import result_cache
+from result_cache import cached_backtest, result_key, evict_results, clear_results
+from trading_strategy import run_backtest
+
+def create_prices(periods=300, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'price': 100 + np.cumsum(rng.normal(0, 1, periods))},
+                        index=pd.date_range('2020-01-01', periods=periods))
+
+def entries(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith('.npz'))
+
+# ---------- TEST: cached_backtest ----------
+def test_cached_backtest_matches_and_reuses(tmp_path, monkeypatch):
+    df = create_prices()
+    expected = run_backtest(df.copy(), 'SMA', fee=0.002)
+
+    first = cached_backtest(df.copy(), 'SMA', fee=0.002, cache_dir=str(tmp_path))
+    monkeypatch.setattr(result_cache, 'run_backtest', lambda *args, **kwargs: pytest.fail("recomputed"))
+    second = cached_backtest(df.copy(), 'SMA', fee=0.002, cache_dir=str(tmp_path))
+
+    for result in (first, second):
+        pd.testing.assert_frame_equal(result[0], expected[0])
+        pd.testing.assert_frame_equal(result[1], expected[1])
+        assert result[2:] == expected[2:]
+    assert len(entries(tmp_path)) == 1
+
+def test_result_key_changes_with_data_and_settings():
+    df = create_prices()
+    key = result_key(df)
+    assert key == result_key(df.copy())
+    assert key != result_key(df, fee=0.002)
+    assert key != result_key(df, 'SMA')
+    assert key != result_key(df, annotate=False)
+
+    changed = df.copy()
+    changed.iloc[10, 0] += 0.01
+    assert key != result_key(changed)
+    shifted = df.copy()
+    shifted.index = shifted.index + pd.Timedelta(days=1)
+    assert key != result_key(shifted)
+
+def test_damaged_entry_is_recomputed(tmp_path):
+    df = create_prices()
+    cached_backtest(df.copy(), cache_dir=str(tmp_path))
+    (tmp_path / entries(tmp_path)[0]).write_bytes(b'not an npz file')
+
+    _, _, profit, _ = cached_backtest(df.copy(), cache_dir=str(tmp_path))
+    assert profit == run_backtest(df.copy())[2]
+
+def test_entry_round_trip_keeps_types(tmp_path):
+    df = create_prices()
+    df.index = df.index.tz_localize('America/New_York').rename('date')
+    expected = run_backtest(df.copy())
+    cached_backtest(df.copy(), cache_dir=str(tmp_path))
+    result = cached_backtest(df.copy(), cache_dir=str(tmp_path))
+
+    pd.testing.assert_frame_equal(result[0], expected[0])
+    pd.testing.assert_frame_equal(result[1], expected[1])
+    for col in ['trade_action', 'trade_price', 'entry_price', 'trade_id']:
+        assert result[0][col].map(type).tolist() == expected[0][col].map(type).tolist()
+    assert [type(value) for value in result[2:]] == [type(value) for value in expected[2:]]
+
+def test_pickled_entry_is_never_loaded(tmp_path):
+    df = create_prices()
+    cached_backtest(df.copy(), cache_dir=str(tmp_path))
+    path = tmp_path / entries(tmp_path)[0]
+    np.savez(path, meta=np.array([{'payload': 1}], dtype=object))  # Only readable by unpickling
+
+    _, _, profit, _ = cached_backtest(df.copy(), cache_dir=str(tmp_path))
+    assert profit == run_backtest(df.copy())[2]
+
+# ---------- TEST: evict_results ----------
+def test_evict_results_by_age_and_size(tmp_path):
+    for seed in range(3):
+        cached_backtest(create_prices(seed=seed), cache_dir=str(tmp_path))
+    oldest = entries(tmp_path)[0]
+    past = time.time() - 3600
+    os.utime(tmp_path / oldest, (past, past))
+
+    assert evict_results(max_age=60, cache_dir=str(tmp_path)) == 1
+    assert oldest not in entries(tmp_path)
+
+    size = os.path.getsize(tmp_path / entries(tmp_path)[0])
+    assert evict_results(max_bytes=size, max_age=None, cache_dir=str(tmp_path)) == 1
+    assert clear_results(str(tmp_path)) == 1
+    assert entries(tmp_path) == []
+
+# ---------- TEST: many processes ----------
+def _cached_profit(args):
+    cache_dir, seed = args
+    return cached_backtest(create_prices(seed=seed), cache_dir=cache_dir)[2]
+
+def test_cache_shared_between_processes(tmp_path):
+    tasks = [(str(tmp_path), seed % 2) for seed in range(8)]
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        profits = list(pool.map(_cached_profit, tasks))
+
+    assert profits == [run_backtest(create_prices(seed=seed % 2))[2] for seed in range(8)]
+    assert len(entries(tmp_path)) == 2
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.tmp-')]
@@ -3,10 +3,12 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import numpy as np
 import pandas as pd
 import pytest
 from trading_strategy import (
     identify_trades,
+    find_trades,
     get_executed_trades,
     calculate_trade_profit
 )
@@ -46,4 +48,109 @@ def test_calculate_trade_profit_correct_total():
     profit, buy_hold = calculate_trade_profit(trades_df, df, fee=0.00125)
     
     assert isinstance(profit, float)
-    assert isinstance(buy_hold, float)
\ No newline at end of file
+    assert isinstance(buy_hold, float)
+
+# ---------- TEST: identify_trades (vectorized vs loop) ----------
+def create_random_df(seed, periods=500):
+    rng = np.random.default_rng(seed)
+    price = 100 + np.cumsum(rng.normal(0, 1, periods))
+    hist = rng.normal(0, 1, periods)
+    hist[:30] = np.nan
+    index = pd.date_range(start='2024-01-01', periods=periods)
+    return pd.DataFrame({'price': price, 'Histogram_EMA': hist}, index=index)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_identify_trades_vectorized_matches_loop(seed):
+    df = create_random_df(seed)
+    fast = identify_trades(df.copy(), hist_col='Histogram_EMA')
+    slow = identify_trades(df.copy(), hist_col='Histogram_EMA', vectorized=False)
+    cols = ['trade_action', 'trade_price', 'entry_price', 'trade_id']
+    pd.testing.assert_frame_equal(fast[cols], slow[cols])
+    for col in cols:
+        assert fast[col].map(type).tolist() == slow[col].map(type).tolist()
+
+def test_identify_trades_profit_matches_loop_three_decimals():
+    # Rounding to 2 decimals depends on the element type, so the columns must hold np.float64 like the loop
+    for seed in range(40):
+        df = create_random_df(seed)
+        df['price'] = df['price'].round(3)
+        fast = identify_trades(df.copy(), hist_col='Histogram_EMA')
+        slow = identify_trades(df.copy(), hist_col='Histogram_EMA', vectorized=False)
+        assert (calculate_trade_profit(get_executed_trades(fast), df)
+                == calculate_trade_profit(get_executed_trades(slow), df))
+
+def test_identify_trades_forced_sell_replaces_buy_on_last_row():
+    df = create_test_df_with_macd_hist().iloc[:3]
+    fast = identify_trades(df.copy(), hist_col='Histogram_EMA')
+    slow = identify_trades(df.copy(), hist_col='Histogram_EMA', vectorized=False)
+    assert fast['trade_action'].iloc[-1] == 'SELL'
+    assert fast['trade_action'].tolist() == slow['trade_action'].tolist()
+    assert fast['entry_price'].tolist() == slow['entry_price'].tolist()
+
+# ---------- TEST: find_trades / TradeLog ----------
+def test_find_trades_compact_log_matches_annotations():
+    df = create_random_df(3)
+    log = find_trades(df, hist_col='Histogram_EMA')
+    annotated = identify_trades(df.copy(), hist_col='Histogram_EMA', vectorized=False)
+
+    assert log.records.dtype['action'] == np.int8
+    assert log.nbytes == len(log) * log.records.dtype.itemsize
+
+    expected = get_executed_trades(annotated)
+    result = get_executed_trades(log)
+    assert result['action'].tolist() == expected['action'].tolist()
+    assert result['price'].tolist() == expected['price'].tolist()
+    assert result['entry_price'].tolist() == expected['entry_price'].tolist()
+    assert result['trade_id'].tolist() == expected['trade_id'].tolist()
+    assert result['date'].tolist() == expected['date'].tolist()
+
+    cols = ['trade_action', 'trade_price', 'entry_price', 'trade_id']
+    expanded = log.annotate(df.copy())
+    pd.testing.assert_frame_equal(expanded[cols], annotated[cols])
+    for col in ['trade_price', 'entry_price']:
+        assert {type(value) for value in expanded[col].dropna()} == {np.float64}
+
+def test_trade_log_categorical_frame():
+    log = find_trades(create_test_df_with_macd_hist(), hist_col='Histogram_EMA')
+    trades = log.to_frame()
+    assert isinstance(trades['action'].dtype, pd.CategoricalDtype)
+    assert list(trades['action'].cat.categories) == ['BUY', 'SELL']
+
+# ---------- TEST: calculate_trade_profit (vectorized vs loop) ----------
+def calculate_trade_profit_loop(trades, df, fee=0.00125):
+    # Original row-by-row implementation, kept as the reference
+    profit = 0
+    buy_price = None
+    for i in range(len(trades)):
+        if trades['action'].iloc[i] == 'BUY':
+            buy_price = trades['price'].iloc[i]
+            profit -= round(buy_price, 2)
+        elif trades['action'].iloc[i] == 'SELL' and buy_price is not None:
+            profit += round(trades['price'].iloc[i] * (1 - fee), 2)
+            buy_price = None
+    buy_hold = round(((df['price'].iloc[-1] * (1 - fee)) - df['price'].iloc[0]), 2)
+    return profit, buy_hold
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_calculate_trade_profit_matches_loop(seed):
+    df = identify_trades(create_random_df(seed, periods=2000))
+    trades = get_executed_trades(df)
+    assert calculate_trade_profit(trades, df, fee=0.002) == calculate_trade_profit_loop(trades, df, fee=0.002)
+
+def test_calculate_trade_profit_irregular_sequences():
+    rng = np.random.default_rng(9)
+    df = pd.DataFrame({'price': [10.0, 12.0]})
+    for _ in range(200):
+        n = rng.integers(0, 8)
+        trades = pd.DataFrame({'action': rng.choice(['BUY', 'SELL', None], size=n),
+                               'price': np.round(rng.uniform(1, 500, size=n), 3)})
+        expected = calculate_trade_profit_loop(trades, df)
+        assert calculate_trade_profit(trades, df) == expected
+        # Object price column of Python floats: rounds as np.float64, same as the float column
+        trades['price'] = trades['price'].astype(object)
+        assert calculate_trade_profit(trades, df) == expected
+
+    # No counted trade: integer 0 as before
+    no_trades = pd.DataFrame({'action': ['SELL'], 'price': [5.0]})
+    profit, _ = calculate_trade_profit(no_trades, df)
+    assert profit == 0 and isinstance(profit, int)
@@ -0,0 +1,86 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from walk_forward import make_folds, run_walk_forward
+from indicators import calc_macd_histogram
+from trading_strategy import find_trade_events, calculate_trade_profit
+
+def create_price_df(periods=600, seed=4):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2018-01-01', periods=periods)
+    return pd.DataFrame({'price': 100 + np.cumsum(rng.normal(0, 1, periods))}, index=dates)
+
+# ---------- TEST: make_folds ----------
+def test_make_folds_rolling_and_anchored():
+    assert make_folds(10, 4, 3) == [(0, 4, 4, 7), (3, 7, 7, 10)]
+    assert make_folds(10, 4, 3, anchored=True) == [(0, 4, 4, 7), (0, 7, 7, 10)]
+    assert make_folds(9, 4, 3, step=2) == [(0, 4, 4, 7), (2, 6, 6, 9), (4, 8, 8, 9)]
+    assert make_folds(4, 4, 3) == []
+    with pytest.raises(ValueError):
+        make_folds(10, 0, 3)
+    with pytest.raises(ValueError):
+        make_folds(100, 10, 10, step=0)
+
+def test_overlapping_out_of_sample_windows_refused():
+    with pytest.raises(ValueError, match='step must be at least test_size'):
+        run_walk_forward(create_price_df(), 200, 100, step=50, methods=('EMA',), max_workers=0)
+
+# ---------- TEST: single parameter set matches full-history indicators ----------
+def test_single_parameter_set_matches_full_history():
+    df = create_price_df()
+    trades, folds, profit, buy_hold = run_walk_forward(df, 200, 100, methods=('EMA',), max_workers=0)
+    assert len(folds) == 4
+    assert (folds['method'] == 'EMA').all()
+
+    full = calc_macd_histogram(df.copy(), 'EMA')
+    hist = full['Histogram_EMA'].to_numpy(dtype=float)
+    prices = df['price'].to_numpy()
+    for fold, (start, end) in enumerate([(200, 300), (300, 400), (400, 500), (500, 600)]):
+        state = {'prev_hist': hist[start - 1], 'action': 'BUY', 'last_buy_price': None, 'trade_id': 0}
+        rows, actions, _, _ = find_trade_events(hist[start:end], prices[start:end], state)
+        fold_trades = trades[trades['fold'] == fold]
+        assert fold_trades['action'].tolist() == actions
+        assert fold_trades['date'].tolist() == list(df.index[[row + start for row in rows]])
+
+    expected_profit, expected_buy_hold = calculate_trade_profit(trades, df.iloc[200:600])
+    assert profit == expected_profit
+    assert buy_hold == expected_buy_hold
+    # Trade ids keep counting across folds
+    assert trades.groupby('trade_id').size().max() <= 2
+    assert trades['trade_id'].is_monotonic_increasing
+
+# ---------- TEST: best in-sample parameter set is picked ----------
+def test_picks_best_in_sample_and_parallel_matches():
+    df = create_price_df()
+    args = dict(train_size=250, test_size=100, short_periods=(5, 12), long_periods=(26, 40))
+    trades, folds, profit, buy_hold = run_walk_forward(df, max_workers=0, **args)
+    assert folds['n_trades'].sum() == len(trades)
+
+    # In-sample profit of every parameter set on its own, the picked one must be the best
+    single = []
+    for method in ('EMA', 'SMA'):
+        for short in (5, 12):
+            for long in (26, 40):
+                single.append(run_walk_forward(df, methods=(method,), max_workers=0, train_size=250, test_size=100,
+                                               short_periods=(short,), long_periods=(long,))[1])
+    best = np.max([s['in_sample_profit'].to_numpy() for s in single], axis=0)
+    np.testing.assert_array_equal(folds['in_sample_profit'].to_numpy(), best)
+
+    parallel = run_walk_forward(df, max_workers=2, **args)
+    pd.testing.assert_frame_equal(parallel[0], trades)
+    pd.testing.assert_frame_equal(parallel[1], folds)
+    assert parallel[2:] == (profit, buy_hold)
+
+# ---------- TEST: no lookahead ----------
+def test_no_lookahead():
+    df = create_price_df()
+    _, folds, _, _ = run_walk_forward(df, 200, 100, short_periods=(5, 12), max_workers=0)
+    changed = df.copy()
+    changed.iloc[400:, 0] = changed.iloc[400:, 0] * 3
+    _, changed_folds, _, _ = run_walk_forward(changed, 200, 100, short_periods=(5, 12), max_workers=0)
+    pd.testing.assert_frame_equal(changed_folds.iloc[:2], folds.iloc[:2])
@@ -0,0 +1,110 @@
+# Compact storage of executed trades
+#
+# identify_trades used to add four object columns ('trade_action', 'trade_price', 'entry_price', 'trade_id')
+# to every row of the main DataFrame, although trades only happen on a few rows.
+# TradeLog keeps just the trade events in one typed NumPy record array:
+#   row (int64), action (int8 code, 0 = BUY, 1 = SELL), price (float64), entry_price (float64), trade_id (int32)
+# and expands to the DataFrame layouts only when asked:
+# 1. to_frame: the trades table returned by get_executed_trades
+# 2. annotate: the four annotation columns on the main DataFrame, as identify_trades adds them
+
+import numpy as np
+
+from lazy_imports import lazy_module
+
+pd = lazy_module('pandas')
+
+ACTIONS = ['BUY', 'SELL']
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+TRADE_DTYPE = np.dtype([
+    ('row', np.int64),
+    ('action', np.int8),
+    ('price', np.float64),
+    ('entry_price', np.float64),
+    ('trade_id', np.int32),
+])
+
+class TradeLog:
+    """
+    Sparse, typed record of the trades made on one price series.
+    :param records: Structured array with dtype TRADE_DTYPE, in row order
+    :param index: Index of the price DataFrame the rows refer to (gives the trade dates)
+    """
+    def __init__(self, records, index):
+        self.records = records
+        self.index = index
+
+    @classmethod
+    def from_events(cls, rows, actions, prices, entry_prices, trade_ids, index):
+        """
+        Builds a TradeLog from parallel sequences, e.g. the output of find_trade_events.
+        :param actions: 'BUY'/'SELL' strings or their action codes
+        """
+        records = np.empty(len(rows), dtype=TRADE_DTYPE)
+        records['row'] = rows
+        records['action'] = [ACTION_CODES.get(action, action) for action in actions]
+        records['price'] = prices
+        records['entry_price'] = entry_prices
+        records['trade_id'] = trade_ids
+        return cls(records, index)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the trade records in bytes.
+        """
+        return self.records.nbytes
+
+    @property
+    def dates(self):
+        return self.index[self.records['row']]
+
+    @property
+    def actions(self):
+        """
+        Trade actions as a categorical with categories BUY and SELL.
+        """
+        return pd.Categorical.from_codes(self.records['action'], categories=ACTIONS)
+
+    def to_frame(self, categorical=True):
+        """
+        Expands the log to the trades table returned by get_executed_trades.
+        :param categorical: Keep 'action' as a categorical column, or use plain strings like get_executed_trades
+        :return: DataFrame with columns action, price, entry_price, trade_id, date
+        """
+        actions = self.actions
+        return pd.DataFrame({
+            'action': actions if categorical else np.asarray(actions, dtype=object),
+            'price': self.records['price'],
+            'entry_price': self.records['entry_price'],
+            'trade_id': self.records['trade_id'],
+            'date': self.dates,
+        })
+
+    def annotate(self, df):
+        """
+        Adds the trade annotation columns to the main DataFrame, same layout as identify_trades:
+        object columns with None on rows without a trade.
+        :return: DataFrame with columns 'trade_action', 'trade_price', 'entry_price', 'trade_id' added
+        """
+        rows = self.records['row']
+        n = len(df)
+        trade_action = np.full(n, None, dtype=object)
+        trade_price = np.full(n, None, dtype=object)
+        entry_price = np.full(n, None, dtype=object)
+        trade_id = np.full(n, None, dtype=object)
+
+        trade_action[rows] = np.asarray(self.actions, dtype=object)
+        trade_price[rows] = list(self.records['price'])  # np.float64 objects, as stored by the original loop
+        entry_price[rows] = list(self.records['entry_price'])
+        trade_id[rows] = self.records['trade_id'].tolist()
+
+        df['trade_action'] = trade_action
+        df['trade_price'] = trade_price
+        df['entry_price'] = entry_price
+        df['trade_id'] = trade_id
+        return df
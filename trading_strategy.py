@@ -2,11 +2,22 @@
 # 
 # 1. Get user input indicating whether to use Simple Moving Average (SMA) or Exponential Moving Average (EMA)
 # 2. Identify trades using a DataFrame with computed indicators and stores transactions in a DataFrame
+#    (or, with find_trades, in a compact TradeLog without touching the DataFrame;
+#    the state machine itself is kernels.find_trade_events, which needs only NumPy)
 # 3. Extracting the trades from the main Dataframe and storing them in a separate DataFrame
-# 4. Calculate profits by looping through all executed trades, and comparing the total profits with the buy-hold strategy
-# 5. Running the entire pipeline and printing the results
+# 4. Calculate profits from the cash flow of all executed trades, and comparing the total profits with the buy-hold strategy
+# 5. Running the entire pipeline and printing the results (each step can be timed with instrumentation hooks)
+# 6. Running the pipeline for one parameter set without prompting or printing (for scripts and batch runs)
 
-import pandas as pd
+import numpy as np
+
+from indicators import calc_macd_histogram
+from instrumentation import stage, emit, has_hooks, new_run_id, SamplingProfiler
+from kernels import find_trade_events
+from lazy_imports import lazy_module
+from trade_log import TradeLog
+
+pd = lazy_module('pandas')
 
 def get_strategy_choice():
     """
@@ -21,11 +32,35 @@ def get_strategy_choice():
             print('Please enter a valid response.')
             strategy = input("Select strategy ('EMA' or 'SMA'): ").strip().upper()
 
-def identify_trades(df, hist_col='Histogram_EMA'):
+def identify_trades(df, hist_col='Histogram_EMA', vectorized=True):
     """
-    Annotates the main DataFrame with trade actions based on MACD histogram crossover by looping through series.
+    Annotates the main DataFrame with trade actions based on MACD histogram crossover.
     Adds columns: 'trade_action', 'trade_price', 'entry_price', 'trade_id'
     Does not compute profit or advanced features (keeps it light for ML or visualization).
+    :param hist_col: Name of the MACD histogram column used for the crossovers
+    :param vectorized: True to use the NumPy engine, False to use the original row-by-row loop as a reference
+    """
+    if not vectorized:
+        return _identify_trades_loop(df, hist_col=hist_col)
+
+    return find_trades(df, hist_col=hist_col).annotate(df)
+
+def find_trades(df, hist_col='Histogram_EMA'):
+    """
+    Finds the trades of the MACD histogram crossover strategy without annotating the DataFrame.
+    Same trades as identify_trades, stored compactly (one typed record per trade).
+    :param hist_col: Name of the MACD histogram column used for the crossovers
+    :return: TradeLog (use .to_frame() for the trades table, .annotate(df) for the annotation columns)
+    """
+    hist = pd.to_numeric(df[hist_col], errors='coerce').to_numpy(dtype=float)
+    prices = df['price'].to_numpy()
+    rows, actions, entry_prices, trade_ids = find_trade_events(hist, prices)
+    return TradeLog.from_events(rows, actions, prices[rows], entry_prices, trade_ids, df.index)
+
+def _identify_trades_loop(df, hist_col='Histogram_EMA'):
+    """
+    Reference implementation of identify_trades that loops through the DataFrame row by row.
+    Kept to check the NumPy engine against the original behaviour.
     """
 
     # Initialize trade annotation columns
@@ -82,7 +117,11 @@ def get_executed_trades(df):
     """
     Extracts only rows where a trade was executed.
     Returns a DataFrame with columns: date, action, price, trade_id
+    :param df: DataFrame annotated by identify_trades, or a TradeLog from find_trades
     """
+    if isinstance(df, TradeLog):
+        return df.to_frame(categorical=False)
+
     trades = df[df['trade_action'].notna()][
         ['trade_action', 'trade_price', 'entry_price', 'trade_id']
     ].copy()
@@ -100,6 +139,34 @@ def get_executed_trades(df):
 
     return trades
 
+def trade_legs(trades, fee=0.00125):
+    """
+    Cash flow of each trade, as counted by calculate_trade_profit.
+    A BUY pays its price rounded to 2 decimals, a SELL right after a BUY receives its price after fee rounded
+    to 2 decimals, and any other row (e.g. a SELL with no open BUY) is not counted.
+    :param trades: Trades table with 'action' and 'price' columns, as from get_executed_trades
+    :param fee: Transaction fee for selling
+    :return: (legs, counted) float array of cash flows (0 where not counted) and boolean array of counted rows
+    """
+    actions = trades['action'].to_numpy()
+    prices = trades['price'].to_numpy()
+    is_buy = actions == 'BUY'
+    is_sell = actions == 'SELL'
+
+    # A SELL counts when the last BUY/SELL before it was a BUY
+    traded = np.flatnonzero(is_buy | is_sell)
+    counted = is_buy.copy()
+    after_buy = np.zeros(len(traded), dtype=bool)
+    after_buy[1:] = is_buy[traded[:-1]]
+    counted[traded[is_sell[traded] & after_buy]] = True
+
+    # round on each leg (only a few values) as np.float64, like the np.float64 prices of the original loop,
+    # so an object column holding Python floats gives the same profit
+    amounts = np.where(is_buy, -prices, prices * (1 - fee)).astype(np.float64)
+    legs = np.zeros(len(trades))
+    legs[counted] = [round(amount, 2) for amount in amounts[counted]]
+    return legs, counted
+
 def calculate_trade_profit(trades, df, fee=0.00125):
     """
     Calculates total profit from trade actions.
@@ -107,19 +174,10 @@ def calculate_trade_profit(trades, df, fee=0.00125):
     :param fee: Transaction fee for selling
     Returns: (buy_sell_profit, buy_hold_profit)
     """
-    profit = 0
-    net_sell = 0
-    buy_price = None
+    legs, counted = trade_legs(trades, fee)
 
-    for i in range(len(trades)):
-        if trades['action'].iloc[i] == 'BUY':
-            buy_price = trades['price'].iloc[i]
-            profit -= round(buy_price, 2)
-        elif trades['action'].iloc[i] == 'SELL' and buy_price is not None:
-            sell_price = trades['price'].iloc[i]
-            net_sell = sell_price * (1 - fee)
-            profit += round(net_sell, 2)
-            buy_price = None
+    # Running sum in trade order, so the total is the same float as adding the legs one by one
+    profit = np.cumsum(legs[counted])[-1] if counted.any() else 0
 
     # Buy-Hold: first price to last price
     first_price = df['price'].iloc[0]
@@ -128,14 +186,20 @@ def calculate_trade_profit(trades, df, fee=0.00125):
 
     return profit, buy_hold_profit
 
-def run_trading_strategy(df, fee=0.00125):
+def run_trading_strategy(df, fee=0.00125, hooks=None, profile=False, strategy=None):
     """
     Runs the full strategy selection, trading simulation, and profit comparison.
-    1. User selects SMA or EMA
-    2. Trades are identified and annotated into the DataFrame
-    3. Executed trades are extracted
-    4. Profits from Buy-Sell vs Buy-Hold are compared
-    5. Results are printed
+    1. User selects SMA or EMA (unless strategy is given)
+    2. Indicators are calculated if the histogram column is missing
+    3. Trades are identified and annotated into the DataFrame
+    4. Executed trades are extracted
+    5. Profits from Buy-Sell vs Buy-Hold are compared
+    6. Results are printed
+    Each step emits a 'stage' event (wall time, CPU time, rows, memory delta) to the instrumentation hooks.
+    :param hooks: Extra hooks for this run, on top of those registered with instrumentation.register_hook
+    :param profile: Capture a sampling profile of the run, emitted as a 'profile' event
+                    (the busiest functions are printed when there are no hooks)
+    :param strategy: 'EMA' or 'SMA' to run without prompting, None to ask the user
     :returns: DataFrame of trades
     """
     from trading_strategy import (
@@ -146,22 +210,44 @@ def run_trading_strategy(df, fee=0.00125):
     )
 
     # Step 1: User selects strategy
-    strategy = get_strategy_choice()
+    if strategy is None:
+        strategy = get_strategy_choice()
+    elif strategy.upper() not in ['SMA', 'EMA']:
+        raise ValueError(f"Unsupported strategy: {strategy}. Use 'EMA' or 'SMA'.")
     suffix = strategy.upper()
     hist_col = f'Histogram_{suffix}'
+    run_id = new_run_id() if has_hooks(hooks) else None
+    profiler = SamplingProfiler().start() if profile else None
 
     print(f"\nRunning {strategy} strategy using '{hist_col}'...\n")
 
-    # Step 2: Identify trades and annotate DataFrame
-    df = identify_trades(df, hist_col=hist_col)
+    # Step 2: Calculate the indicators if they are not there yet
+    if hist_col not in df.columns:
+        with stage('indicators', len(df), hooks, run_id, strategy=suffix):
+            df = calc_macd_histogram(df, suffix)
+
+    # Step 3: Identify trades and annotate DataFrame
+    with stage('identify_trades', len(df), hooks, run_id, strategy=suffix):
+        df = identify_trades(df, hist_col=hist_col)
 
-    # Step 3: Extract trades
-    trades = get_executed_trades(df)
+    # Step 4: Extract trades
+    with stage('get_executed_trades', len(df), hooks, run_id, strategy=suffix):
+        trades = get_executed_trades(df)
 
-    # Step 4: Calculate profits
-    profit, buy_hold = calculate_trade_profit(trades, df, fee=fee)
+    # Step 5: Calculate profits
+    with stage('calculate_trade_profit', len(trades), hooks, run_id, strategy=suffix):
+        profit, buy_hold = calculate_trade_profit(trades, df, fee=fee)
 
-    # Step 5: Print results
+    if profiler is not None:
+        profiler.stop()
+        if has_hooks(hooks):
+            emit(profiler.to_event(run_id), hooks)
+        else:
+            print("🔬 Busiest functions:")
+            for location, count in profiler.top():
+                print(f"{count:6d}  {location}")
+
+    # Step 6: Print results
     print("🛒 Trade Actions:")
     print(trades)
 
@@ -176,4 +262,30 @@ def run_trading_strategy(df, fee=0.00125):
     else:
         print("⚖️ Both strategies performed equally.")
 
-    return trades   # Return DataFrame of trades to allow for export
\ No newline at end of file
+    return trades   # Return DataFrame of trades to allow for export
+
+def run_backtest(df, strategy='EMA', short_period=12, long_period=26, signal_period=9, fee=0.00125, annotate=True,
+                 hooks=None):
+    """
+    Runs indicators, trade identification and profit calculation for one parameter set.
+    Unlike run_trading_strategy it never prompts and prints nothing, so it can be used in scripts.
+    :param df: DataFrame with a 'price' column
+    :param strategy: 'EMA' or 'SMA'
+    :param fee: Transaction fee for selling
+    :param annotate: Add the trade annotation columns to df (False keeps only the compact trade log)
+    :param hooks: Extra instrumentation hooks for this run, on top of the registered ones
+    :return: (DataFrame with indicators, trades DataFrame, buy_sell_profit, buy_hold_profit)
+    """
+    strategy = strategy.upper()
+    run_id = new_run_id() if has_hooks(hooks) else None
+    with stage('indicators', len(df), hooks, run_id, strategy=strategy):
+        df = calc_macd_histogram(df, strategy, short_period, long_period, signal_period)
+    with stage('identify_trades', len(df), hooks, run_id, strategy=strategy):
+        trade_log = find_trades(df, hist_col=f'Histogram_{strategy}')
+        if annotate:
+            trade_log.annotate(df)
+    with stage('get_executed_trades', len(df), hooks, run_id, strategy=strategy):
+        trades = get_executed_trades(trade_log)
+    with stage('calculate_trade_profit', len(trades), hooks, run_id, strategy=strategy):
+        profit, buy_hold = calculate_trade_profit(trades, df, fee=fee)
+    return df, trades, profit, buy_hold
@@ -0,0 +1,157 @@
+# Functions for walk-forward optimization of the MACD parameters
+#
+# 1. Defining rolling (or anchored) in-sample/out-of-sample folds over the rows of a price series
+# 2. Calculating the indicators of each parameter set once on the whole history, on a process pool
+#    (every fold reads its window from that single series, so the warm-up is never recomputed)
+# 3. Scoring every parameter set on each in-sample window and picking the best one per fold
+# 4. Trading the picked parameters on the following out-of-sample window
+# 5. Stitching the out-of-sample trades together and comparing their profit with buy-hold
+
+import numpy as np
+import pandas as pd
+
+from parameter_sweep import build_parameter_grid, map_over_prices, histogram_frame
+from trading_strategy import find_trade_events, get_executed_trades, calculate_trade_profit
+from trade_log import TradeLog
+
+def make_folds(n_rows, train_size, test_size, step=None, anchored=False):
+    """
+    Splits n_rows rows into consecutive walk-forward folds.
+    :param train_size: Number of in-sample rows (the minimum number if anchored)
+    :param test_size: Number of out-of-sample rows following each in-sample window
+    :param step: Rows the windows move forward by, test_size by default (out-of-sample windows then do not overlap)
+    :param anchored: Start every in-sample window at row 0 (expanding window) instead of rolling it
+    :return: List of (train_start, train_end, test_start, test_end) row positions, ends excluded
+    """
+    if train_size < 1 or test_size < 1:
+        raise ValueError("train_size and test_size must be at least 1.")
+    if step is None:
+        step = test_size
+    if step < 1:
+        raise ValueError("step must be at least 1.")
+
+    folds = []
+    train_end = train_size
+    while train_end < n_rows:
+        train_start = 0 if anchored else train_end - train_size
+        test_end = min(train_end + test_size, n_rows)
+        folds.append((train_start, train_end, train_end, test_end))
+        train_end += step
+    return folds
+
+def _window_trades(hist, prices, start, end):
+    """
+    Runs the trade state machine on rows start to end, entering flat and closing any position on the last row.
+    The histogram value just before the window is carried in, so a crossing on the first row still counts.
+    :return: Tuple of lists (rows, actions, entry_prices, trade_ids), rows relative to the whole series
+    """
+    state = {'prev_hist': hist[start - 1] if start > 0 else np.nan, 'action': 'BUY',
+             'last_buy_price': None, 'trade_id': 0}
+    rows, actions, entry_prices, trade_ids = find_trade_events(hist[start:end], prices[start:end], state)
+    return [row + start for row in rows], actions, entry_prices, trade_ids
+
+def _window_profit(events, prices, start, end, fee):
+    """
+    Buy-sell and buy-hold profit of the trades made in one window.
+    """
+    rows, actions, entry_prices, trade_ids = events
+    trades = pd.DataFrame({'action': actions, 'price': prices[rows]})
+    window = pd.DataFrame({'price': prices[[start, end - 1]]})
+    return calculate_trade_profit(trades, window, fee=fee)
+
+def _run_walk_forward_set(task):
+    """
+    Calculates the indicators of one parameter set on the whole shared price series and trades every fold window.
+    :param task: Tuple (method, short_period, long_period, signal_period, folds, fee)
+    :return: List with one dictionary per fold: in-sample profit, out-of-sample events and profit
+    """
+    method, short, long, signal, folds, fee = task
+    work = histogram_frame(method, short, long, signal)
+    hist = pd.to_numeric(work[f'Histogram_{method}'], errors='coerce').to_numpy(dtype=float)
+    prices = work['price'].to_numpy()
+
+    results = []
+    for train_start, train_end, test_start, test_end in folds:
+        in_sample = _window_trades(hist, prices, train_start, train_end)
+        out_of_sample = _window_trades(hist, prices, test_start, test_end)
+        results.append({
+            'in_sample_profit': _window_profit(in_sample, prices, train_start, train_end, fee)[0],
+            'events': out_of_sample,
+            'oos_profit': _window_profit(out_of_sample, prices, test_start, test_end, fee)[0],
+        })
+    return results
+
+def run_walk_forward(df, train_size, test_size, step=None, anchored=False, short_periods=(12,), long_periods=(26,),
+                     signal_periods=(9,), methods=('EMA', 'SMA'), fee=0.00125, price_col='price',
+                     max_workers=None, chunksize=None):
+    """
+    Walk-forward optimization: on each fold the parameter set with the best in-sample profit
+    is traded on the following out-of-sample window.
+    Indicators are calculated on the whole history once per parameter set (in parallel), so each
+    window starts with fully warmed-up indicators that only use earlier prices.
+    Positions are opened flat at the start of every out-of-sample window and closed on its last row.
+    :param df: DataFrame with a price column and a date index
+    :param train_size: Number of in-sample rows per fold (see make_folds)
+    :param test_size: Number of out-of-sample rows per fold
+    :param step: Rows the windows move forward by, test_size by default (smaller steps are refused)
+    :param fee: Transaction fee for selling
+    :param max_workers: Number of worker processes, 0 runs everything in the current process
+    :return: (trades, folds, profit, buy_hold)
+             trades: stitched out-of-sample trades as from get_executed_trades, with a 'fold' column
+             folds: one row per fold with its dates, picked parameters, in-sample and out-of-sample profit
+             profit, buy_hold: calculate_trade_profit of the stitched trades over the out-of-sample span
+    """
+    if step is not None and step < test_size:
+        raise ValueError("step must be at least test_size: overlapping out-of-sample windows "
+                         "would trade the same rows twice in the stitched results.")
+    folds = make_folds(len(df), train_size, test_size, step, anchored)
+    if not folds:
+        raise ValueError("Not enough rows for one fold: need more than train_size rows.")
+    grid = build_parameter_grid(short_periods, long_periods, signal_periods, methods)
+    if not grid:
+        raise ValueError("Parameter grid is empty. Short periods must be shorter than long periods.")
+
+    tasks = [(method, short, long, signal, folds, fee) for method, short, long, signal in grid]
+    prices = df[price_col].to_numpy(dtype=float)
+    per_set = map_over_prices(_run_walk_forward_set, tasks, prices, max_workers, chunksize)
+
+    trade_frames = []
+    fold_rows = []
+    trade_id_offset = 0
+    for i, (train_start, train_end, test_start, test_end) in enumerate(folds):
+        # First parameter set with the highest in-sample profit
+        scores = [results[i]['in_sample_profit'] for results in per_set]
+        best = int(np.argmax(scores))
+        method, short, long, signal = grid[best]
+        picked = per_set[best][i]
+
+        rows, actions, entry_prices, trade_ids = picked['events']
+        log = TradeLog.from_events(rows, actions, prices[rows], entry_prices,
+                                   [trade_id + trade_id_offset for trade_id in trade_ids], df.index)
+        trades = get_executed_trades(log)
+        trades.insert(0, 'fold', i)
+        trade_frames.append(trades)
+        if trade_ids:
+            trade_id_offset += max(trade_ids) + 1
+
+        window = df.iloc[[test_start, test_end - 1]]
+        fold_rows.append({
+            'fold': i,
+            'train_start': df.index[train_start],
+            'train_end': df.index[train_end - 1],
+            'test_start': df.index[test_start],
+            'test_end': df.index[test_end - 1],
+            'method': method,
+            'short_period': short,
+            'long_period': long,
+            'signal_period': signal,
+            'in_sample_profit': scores[best],
+            'oos_profit': picked['oos_profit'],
+            'oos_buy_hold': calculate_trade_profit(trades.iloc[:0], window, fee=fee)[1],
+            'n_trades': len(trades),
+        })
+
+    trades = pd.concat(trade_frames, ignore_index=True)
+    span = df.iloc[folds[0][2]:folds[-1][3]]
+    profit, buy_hold = calculate_trade_profit(trades, span, fee=fee)
+    return trades, pd.DataFrame(fold_rows), profit, buy_hold